@@ -0,0 +1,177 @@
+import os
+import time
+import threading
+from collections import deque
+
+from response_cache import visualization_cache, analysis_cache, make_key, visualization_key
+from geo_index import geo_index_cache
+
+# --- Admission Control Configuration ---
+# Costs are in "typical request" units: a cold /api/visualizations call with
+# limit=20 costs about 2. The budget is the total cost allowed in flight per
+# instance; work beyond it waits in a bounded queue or is shed.
+ADMISSION_COST_BUDGET = float(os.getenv('ADMISSION_COST_BUDGET', 60))
+ADMISSION_MAX_REQUEST_COST = float(os.getenv('ADMISSION_MAX_REQUEST_COST', ADMISSION_COST_BUDGET / 2))
+ADMISSION_CLIENT_SHARE = float(os.getenv('ADMISSION_CLIENT_SHARE', 0.5))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 32))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 3))
+
+# endpoint -> (base cost, cost per requested entity)
+ENDPOINT_COSTS = {
+    'visualizations': (1.0, 0.05),
+    'analysis': (4.0, 0.02),
+    'chat': (2.0, 0.0),
+    'geo': (0.5, 0.02),
+}
+# A request answered from a warm cache costs this fraction of a cold one
+CACHED_COST_FACTOR = 0.1
+
+
+def _as_limit(limit, default):
+    try:
+        return max(1, int(limit))
+    except (TypeError, ValueError):
+        return default
+
+
+def estimate_cost(endpoint, city_name=None, country_code=None, limit=20, output='figure'):
+    """
+    Estimated cost of one request from the endpoint, the limit and the cache
+    state. The cache is checked under the key the endpoint itself uses, so
+    `output` ('figure' or 'data') matters for visualizations.
+    """
+    if endpoint == 'bundle':
+        return (estimate_cost('visualizations', city_name, country_code, limit)
+                + estimate_cost('analysis', city_name, country_code, limit))
+
+    base, per_entity = ENDPOINT_COSTS[endpoint]
+    cost = base + per_entity * _as_limit(limit, 20)
+    if endpoint == 'visualizations':
+        cached = visualization_cache.get(visualization_key(city_name, country_code, limit, output))
+    else:
+        cache = {'analysis': analysis_cache, 'geo': geo_index_cache}.get(endpoint)
+        cached = cache.get(make_key(city_name, country_code, limit)) if cache is not None else None
+    if cached is not None:
+        cost *= CACHED_COST_FACTOR
+    return round(cost, 3)
+
+
+class AdmissionRejected(Exception):
+    """A request was shed; `status` is 429 (this client) or 503 (this instance)."""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    def __init__(self, cost, client):
+        self.cost = cost
+        self.client = client
+
+
+class AdmissionController:
+    """
+    Keeps the estimated cost of in-flight requests under a per-instance budget.
+
+    Requests that do not fit wait in a FIFO queue (bounded in length and wait
+    time), so a cheap request never jumps ahead of an expensive one that has
+    waited longer. Rejections:
+      * 429 - the request alone is too expensive, or its client already holds
+              more than its share of the budget
+      * 503 - the instance is saturated (queue full or the wait timed out)
+    """
+
+    def __init__(self, budget=ADMISSION_COST_BUDGET, max_request_cost=ADMISSION_MAX_REQUEST_COST,
+                 client_share=ADMISSION_CLIENT_SHARE, max_queue=ADMISSION_MAX_QUEUE,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.budget = budget
+        self.max_request_cost = max_request_cost
+        self.client_share = client_share
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._in_flight_cost = 0.0
+        self._in_flight = 0
+        self._client_cost = {}
+        self._avg_duration = 1.0  # moving average, for Retry-After
+        self._stats = {'admitted': 0, 'queued': 0, 'shed_429': 0, 'shed_503': 0}
+
+    def _fits(self, ticket):
+        return self._in_flight_cost + ticket.cost <= self.budget or self._in_flight == 0
+
+    def _retry_after(self):
+        return max(1.0, self._avg_duration * (len(self._queue) + 1) / max(1, self._in_flight))
+
+    def _reject(self, status, message, retry_after=None):
+        self._stats[f'shed_{status}'] += 1
+        print(f"[ADMISSION] 🚦 Shedding request ({status}): {message}")
+        return AdmissionRejected(status, message, retry_after)
+
+    def _start(self, ticket):
+        self._in_flight_cost += ticket.cost
+        self._in_flight += 1
+        self._client_cost[ticket.client] = self._client_cost.get(ticket.client, 0.0) + ticket.cost
+        self._stats['admitted'] += 1
+        ticket.started = time.monotonic()
+
+    def acquire(self, cost, client=None):
+        """Admit a request of the given cost, waiting in the queue if needed. Returns a ticket."""
+        ticket = AdmissionTicket(cost, client)
+        with self._condition:
+            if cost > self.max_request_cost:
+                raise self._reject(429, f"Request cost {cost:.1f} exceeds the per-request limit "
+                                        f"{self.max_request_cost:.1f}; reduce 'limit'")
+            if client is not None and self._client_cost.get(client, 0.0) + cost > self.client_share * self.budget:
+                raise self._reject(429, "Too many expensive requests in flight from this client",
+                                   self._retry_after())
+            if not self._queue and self._fits(ticket):
+                self._start(ticket)
+                return ticket
+            if len(self._queue) >= self.max_queue:
+                raise self._reject(503, "Server is at capacity", self._retry_after())
+
+            self._queue.append(ticket)
+            self._stats['queued'] += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self._queue[0] is not ticket or not self._fits(ticket):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._reject(503, "Server is at capacity", self._retry_after())
+                    self._condition.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+            self._start(ticket)
+            return ticket
+
+    def release(self, ticket):
+        with self._condition:
+            self._in_flight_cost = max(0.0, self._in_flight_cost - ticket.cost)
+            self._in_flight -= 1
+            remaining = self._client_cost.get(ticket.client, 0.0) - ticket.cost
+            if remaining > 1e-9:
+                self._client_cost[ticket.client] = remaining
+            else:
+                self._client_cost.pop(ticket.client, None)
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - ticket.started)
+            self._condition.notify_all()
+
+    def snapshot(self):
+        """Gauges for autoscaling: in-flight work, queue depth and utilization."""
+        with self._condition:
+            return dict(
+                self._stats,
+                in_flight=self._in_flight,
+                in_flight_cost=round(self._in_flight_cost, 2),
+                queue_depth=len(self._queue),
+                queued_cost=round(sum(ticket.cost for ticket in self._queue), 2),
+                cost_budget=self.budget,
+                utilization=round(self._in_flight_cost / self.budget, 3) if self.budget else 0.0,
+            )
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,126 @@
+"""
+NumPy-backed aggregation kernels shared by the chart builders.
+
+Inputs are plain sequences (lists, tuples, arrays); missing numeric values
+are passed as NaN. Every kernel makes a fixed number of vectorized passes, so
+cost stays flat per entity as cities grow to thousands of places.
+"""
+import numpy as np
+
+
+def as_float_array(values):
+    """Float array from a sequence of numbers and NaN/None for missing values."""
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+
+def group_count_mean(keys, values):
+    """
+    Group `values` by `keys` (first-seen key order).
+    Returns (group_keys, counts, means): counts include members with missing
+    values, means ignore them and are 0.0 for groups without any value.
+    """
+    values = as_float_array(values)
+    # Factorize keys in one pass; codes follow first-seen order
+    index = {}
+    codes = np.fromiter((index.setdefault(key, len(index)) for key in keys), dtype=np.intp, count=len(values))
+    group_keys = list(index)
+
+    valid = ~np.isnan(values)
+    counts = np.bincount(codes, minlength=len(group_keys))
+    valid_counts = np.bincount(codes[valid], minlength=len(group_keys))
+    sums = np.bincount(codes[valid], weights=values[valid], minlength=len(group_keys))
+    means = np.divide(sums, valid_counts, out=np.zeros(len(group_keys)), where=valid_counts > 0)
+
+    return group_keys, counts, means
+
+
+def histogram(values, bins=10, value_range=None):
+    """Fixed-width histogram of the non-missing values. Returns (edges, counts)."""
+    values = as_float_array(values)
+    values = values[~np.isnan(values)]
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return edges, counts
+
+
+def band_counts(values, upper_bounds):
+    """
+    Count values per band: band i holds upper_bounds[i-1] < v <= upper_bounds[i],
+    with a final open band above the last bound (len(upper_bounds) + 1 counts).
+    """
+    values = as_float_array(values)
+    values = values[~np.isnan(values)]
+    bands = np.searchsorted(np.asarray(upper_bounds, dtype=float), values, side='left')
+    return np.bincount(bands, minlength=len(upper_bounds) + 1)
+
+
+def top_k(values, k):
+    """
+    Indices of the k largest non-missing values, largest first; ties keep
+    their original order (same result as a stable descending sort).
+    """
+    values = as_float_array(values)
+    candidates = np.flatnonzero(~np.isnan(values))
+    if k <= 0 or candidates.size == 0:
+        return []
+    if candidates.size > k:
+        # Partial selection: everything above the k-th largest value, then ties in index order
+        threshold = np.partition(values[candidates], candidates.size - k)[candidates.size - k]
+        above = candidates[values[candidates] > threshold]
+        ties = candidates[values[candidates] == threshold][:k - above.size]
+        candidates = np.concatenate([above, ties])
+    order = np.lexsort((candidates, -values[candidates]))
+    return candidates[order].tolist()
+
+
+def grid_edges(low, high, bins, pad=1e-6):
+    """
+    `bins` + 1 evenly spaced edges from low to high. A zero-width range (all
+    points on one line or in one spot) is widened by `pad` on each side, so the
+    edges still increase and np.histogram2d accepts them.
+    """
+    if not high > low:
+        low, high = low - pad, high + pad
+    return np.linspace(low, high, bins + 1)
+
+
+def grid_bin(x, y, bins=40, weights=None):
+    """
+    2-D fixed-grid binning of points (bins as for np.histogram2d).
+    Returns (x_centers, y_centers, counts, weight_means) of the non-empty
+    cells; weight_means ignore missing weights (0.0 for cells without any)
+    and are None without weights.
+    """
+    x = as_float_array(x)
+    y = as_float_array(y)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    cells = np.nonzero(counts)
+    x_centers = ((x_edges[:-1] + x_edges[1:]) / 2)[cells[0]]
+    y_centers = ((y_edges[:-1] + y_edges[1:]) / 2)[cells[1]]
+
+    weight_means = None
+    if weights is not None:
+        weights = as_float_array(weights)[valid]
+        weighted = ~np.isnan(weights)
+        sums, _, _ = np.histogram2d(x[weighted], y[weighted], bins=[x_edges, y_edges], weights=weights[weighted])
+        weighted_counts, _, _ = np.histogram2d(x[weighted], y[weighted], bins=[x_edges, y_edges])
+        weight_means = np.divide(sums[cells], weighted_counts[cells], out=np.zeros(len(cells[0])),
+                                 where=weighted_counts[cells] > 0)
+    return x_centers, y_centers, counts[cells].astype(int), weight_means
+
+
+def top_n_labels(labels, n, other='Other'):
+    """
+    Keep the n-1 most frequent labels (first-seen order on ties) and relabel
+    the rest as `other`, so at most n groups remain. Labels are returned
+    unchanged when there are n or fewer distinct values.
+    """
+    index = {}
+    for label in labels:
+        index[label] = index.get(label, 0) + 1
+    if len(index) <= n:
+        return list(labels)
+    counts = list(index.values())
+    keep = {list(index)[i] for i in top_k(counts, n - 1)}
+    return [label if label in keep else other for label in labels]
@@ -1,19 +1,24 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, g, Response, stream_with_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import json
 import os
 import uuid
 import sys
+import queue
+import threading
+import contextvars
+import functools
 
 # Test imports one by one to identify issues
 print("🔍 Testing imports...")
 
 try:
     print("📊 Testing visualizations import...")
-    from visualizations import QlooVisualizer
-    print("✅ QlooVisualizer imported successfully")
+    from visualizations import generate_city_visualizations, stream_city_visualizations, get_city_geo_index, get_city_snapshot
+    print("✅ visualizations imported successfully")
 except Exception as e:
-    print(f"❌ Failed to import QlooVisualizer: {e}")
+    print(f"❌ Failed to import visualizations: {e}")
     sys.exit(1)
 
 try:
@@ -26,10 +31,105 @@ except Exception as e:
 
 print("✅ All imports successful!")
 
+# Prefetch hot cities in the background so the first users after a deploy hit a warm cache
+from cache_warmup import start_warmup
+warmup_job = start_warmup()
+
 app = Flask(__name__, static_folder='static', static_url_path='')
 CORS(app, origins=["*"])  # Enable CORS for all origins in production
 
+# Number of reverse proxies in front of the app whose X-Forwarded-For hop is trusted
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+if TRUSTED_PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)
+
+from retry_policy import start_deadline, clear_deadline, remaining_budget
+from speculative_analysis import speculative_analyzer
+from bulkhead import LLM_BULKHEAD, QLOO_BULKHEAD, BulkheadFull
+from admission import admission_controller, estimate_cost, AdmissionRejected
+from chart_data import CHART_DATA_SCHEMA, encode as encode_chart_data
+from qloo_analysis import QLOO_UNAVAILABLE_ERRORS
+
+@app.before_request
+def begin_request_deadline():
+    """Give every request a total time budget shared by all upstream retries"""
+    g.deadline_token = start_deadline()
+
+@app.teardown_request
+def end_request_deadline(exc=None):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        clear_deadline(token)
+
+def error_response(result):
+    """Turn an error result into a response; open circuits become a fast 503 with Retry-After"""
+    if result.get("retry_after") is not None:
+        response = jsonify({'error': result['error']})
+        response.headers['Retry-After'] = str(max(1, int(result['retry_after'] + 0.5)))
+        return response, 503
+    return jsonify({'error': result['error']}), 500
+
+def unavailable_retry_after(error):
+    """Seconds until an unavailable upstream is worth retrying (at least one)"""
+    return getattr(error, 'retry_after', None) or 1.0
+
+def unavailable_response(error):
+    """Qloo unavailable and nothing cached: a 503 with Retry-After instead of an empty result"""
+    return error_response({'error': str(error), 'retry_after': unavailable_retry_after(error)})
+
+def guarded_by(bulkhead):
+    """Run an endpoint inside a bulkhead slot; a saturated bulkhead is a fast 503"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with bulkhead.slot():
+                    return view(*args, **kwargs)
+            except BulkheadFull as e:
+                print(f"[BULKHEAD] 🚧 {e}")
+                return error_response({'error': str(e), 'retry_after': e.retry_after})
+        return wrapper
+    return decorator
+
+def client_id():
+    """
+    Client identity for per-client admission shares. X-Forwarded-For is only
+    honoured through ProxyFix (TRUSTED_PROXY_COUNT), never read directly.
+    """
+    return request.remote_addr or 'unknown'
+
+def admitted(endpoint, default_limit=20):
+    """
+    Admit an endpoint call only if its estimated cost fits the instance budget.
+    Shed requests get 429 (client) or 503 (instance) with Retry-After; the
+    cost is released when the response, including a stream, is closed.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True) or {}
+            output = data.get('format', request.args.get('format', 'figure'))
+            cost = estimate_cost(endpoint, data.get('city'), data.get('country'), data.get('limit', default_limit), output)
+            try:
+                ticket = admission_controller.acquire(cost, client_id())
+            except AdmissionRejected as e:
+                response = jsonify({'error': str(e)})
+                if e.retry_after is not None:
+                    response.headers['Retry-After'] = str(max(1, int(e.retry_after + 0.5)))
+                return response, e.status
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except Exception:
+                admission_controller.release(ticket)
+                raise
+            response.call_on_close(lambda: admission_controller.release(ticket))
+            return response
+        return wrapper
+    return decorator
+
 @app.route('/api/visualizations', methods=['POST'])
+@admitted('visualizations')
+@guarded_by(QLOO_BULKHEAD)
 def generate_visualizations():
     # Generate unique request ID for tracking
     request_id = str(uuid.uuid4())[:8]
@@ -39,56 +139,227 @@ def generate_visualizations():
         city = data.get('city')
         country = data.get('country')
         limit = data.get('limit', 20)
+        # 'figure' (Plotly JSON, default) or 'data' (data-only chart specs)
+        output = data.get('format', request.args.get('format', 'figure'))
         print(f"[{request_id}] 🔍 NEW REQUEST - City: {city}, Country: {country}, Limit: {limit}")
         
-        # Create a FRESH instance for each request to prevent caching issues
-        visualizer = QlooVisualizer()
-        print(f"[{request_id}] ✅ Created fresh QlooVisualizer instance")
-        
-        # Fetch Qloo API data ONCE
-        print(f"[{request_id}] 📡 Fetching brands data for {city}, {country}...")
-        from qloo_analysis import get_brands
-        raw_brands = get_brands(city, country, limit)
-        
-        # Debug: Check brands data content
-        if raw_brands and 'results' in raw_brands and 'entities' in raw_brands['results']:
-            brand_names = [brand.get('name', 'Unknown') for brand in raw_brands['results']['entities'][:3]]
-            print(f"[{request_id}] 📊 Brands data received: {len(raw_brands['results']['entities'])} brands")
-            print(f"[{request_id}] 📊 First 3 brands: {brand_names}")
-        else:
-            print(f"[{request_id}] ⚠️ No valid brands data received")
+        if output not in ('figure', 'data'):
+            return jsonify({'error': f"Unknown format '{output}'"}), 400
         
-        print(f"[{request_id}] 📡 Fetching places data for {city}, {country}...")
-        from qloo_analysis import get_places
-        raw_places = get_places(city, country, limit)
-        
-        # Debug: Check places data content
-        if raw_places and 'results' in raw_places and 'entities' in raw_places['results']:
-            place_names = [place.get('name', 'Unknown') for place in raw_places['results']['entities'][:3]]
-            print(f"[{request_id}] 🏢 Places data received: {len(raw_places['results']['entities'])} places")
-            print(f"[{request_id}] 🏢 First 3 places: {place_names}")
-        else:
-            print(f"[{request_id}] ⚠️ No valid places data received")
-        
-        # Set the pre-fetched data in the visualizer
-        print(f"[{request_id}] 🔄 Setting data in visualizer...")
-        visualizer.set_data(raw_brands, raw_places)
-        
-        # Now generate all visualizations using the pre-fetched data
-        print(f"[{request_id}] 🎨 Generating visualizations...")
-        viz_data = visualizer.generate_all_visualizations(city, country, limit)
-        print(f"[{request_id}] ✅ Generated visualizations for {city}, {country}")
+        # Fetch Qloo data and build the charts (served from cache when warm)
+        viz_data = generate_city_visualizations(city, country, limit, log_prefix=f"[{request_id}]", output=output)
         
         # Debug: Check what visualizations were generated
         viz_keys = list(viz_data.keys()) if viz_data else []
         print(f"[{request_id}] 📈 Generated visualizations: {viz_keys}")
         
+        # Users usually open the analysis panel next - start it in the background (opt-in)
+        if viz_data and not viz_data.get('stale') and not viz_data.get('partial'):
+            speculative_analyzer.submit(city, country)
+        
+        if output == 'data':
+            # Thin clients apply their own presentation
+            payload = {
+                'schema': CHART_DATA_SCHEMA,
+                'city': city,
+                'country': country,
+                'stale': bool(viz_data.pop('stale', False)),
+                'partial': bool(viz_data.pop('partial', False)),
+                'charts': viz_data
+            }
+            body, mimetype = encode_chart_data(payload)
+            return Response(body, mimetype=mimetype)
+        
         return jsonify(viz_data)
+    except QLOO_UNAVAILABLE_ERRORS as e:
+        print(f"[{request_id}] ⚡ Qloo unavailable: {e}")
+        return unavailable_response(e)
     except Exception as e:
         print(f"[{request_id}] ❌ Exception: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/visualizations/stream', methods=['POST'])
+@admitted('visualizations')
+def stream_visualizations():
+    """
+    Progressive variant of /api/visualizations: each chart is sent as soon as
+    it is built, cheapest first, then a `complete` event lists the delivered
+    and failed charts. NDJSON by default; Server-Sent Events when the client
+    sends `Accept: text/event-stream`.
+    """
+    request_id = str(uuid.uuid4())[:8]
+    
+    data = request.get_json() or {}
+    city = data.get('city')
+    country = data.get('country')
+    limit = data.get('limit', 20)
+    use_sse = 'text/event-stream' in request.headers.get('Accept', '')
+    print(f"[{request_id}] 🌊 STREAMING REQUEST - City: {city}, Country: {country}, Limit: {limit}")
+    
+    def encode(event):
+        if use_sse:
+            return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        return json.dumps(event) + '\n'
+    
+    def generate():
+        event = None
+        try:
+            with QLOO_BULKHEAD.slot():
+                for event in stream_city_visualizations(city, country, limit, log_prefix=f"[{request_id}]"):
+                    yield encode(event)
+        except BulkheadFull as e:
+            print(f"[BULKHEAD] 🚧 {e}")
+            yield encode({'type': 'complete', 'charts': [], 'failed': [], 'error': str(e), 'retry_after': e.retry_after})
+            return
+        except QLOO_UNAVAILABLE_ERRORS as e:
+            print(f"[{request_id}] ⚡ Qloo unavailable: {e}")
+            yield encode({'type': 'complete', 'charts': [], 'failed': [], 'error': str(e),
+                          'retry_after': unavailable_retry_after(e)})
+            return
+        except Exception as e:
+            print(f"[{request_id}] ❌ Streaming Exception: {e}")
+            yield encode({'type': 'complete', 'charts': [], 'failed': [], 'error': str(e)})
+            return
+        
+        # Users usually open the analysis panel next - start it in the background (opt-in)
+        if event and event.get('charts') and not event.get('stale') and not event.get('partial'):
+            speculative_analyzer.submit(city, country)
+    
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+@app.route('/api/geo', methods=['POST'])
+@admitted('geo')
+@guarded_by(QLOO_BULKHEAD)
+def geo_viewport():
+    """
+    Places of a city inside a map viewport, from the city's spatial index:
+    individual points for sparse viewports, grid cell aggregates (count and
+    average rating) once there are more than `max_points`.
+    Body: {city, country, limit, bounds: {south, west, north, east}, max_points, bins}
+    """
+    request_id = str(uuid.uuid4())[:8]
+    
+    data = request.get_json() or {}
+    city = data.get('city')
+    country = data.get('country')
+    limit = data.get('limit', 20)
+    try:
+        bounds = data.get('bounds') or {}
+        viewport = [float(bounds[side]) if bounds.get(side) is not None else None
+                    for side in ('south', 'west', 'north', 'east')]
+        options = {key: int(data[key]) for key in ('max_points', 'bins') if data.get(key) is not None}
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f"Invalid viewport: {e}"}), 400
+    print(f"[{request_id}] 🗺️ GEO REQUEST - City: {city}, Country: {country}, Bounds: {viewport}")
+    
+    try:
+        index, stale = get_city_geo_index(city, country, limit, log_prefix=f"[{request_id}]")
+        result = index.query(*viewport, **options)
+        result.update(city=city, country=country, stale=stale, unlocated=index.unlocated)
+        return jsonify(result)
+    except QLOO_UNAVAILABLE_ERRORS as e:
+        print(f"[{request_id}] ⚡ Qloo unavailable: {e}")
+        return unavailable_response(e)
+    except Exception as e:
+        print(f"[{request_id}] ❌ Geo Exception: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/city-bundle', methods=['POST'])
+@admitted('bundle')
+def city_bundle():
+    """
+    Charts and business analysis for one city from a single Qloo fetch.
+    Streams NDJSON: a `visualizations` event as soon as the charts are built,
+    then an `analysis` event when the LLM analysis is ready. With
+    `stream_sections`, the analysis sections are generated in parallel and an
+    `analysis_section` event precedes the final analysis for each one.
+    An unexpected failure is reported as an `error` event; the stream always
+    ends with a `done` event.
+    """
+    request_id = str(uuid.uuid4())[:8]
+    
+    data = request.get_json() or {}
+    city = data.get('city')
+    country = data.get('country')
+    limit = data.get('limit', 20)
+    stream_sections = bool(data.get('stream_sections'))
+    print(f"[{request_id}] 📦 City Bundle Request - City: {city}, Country: {country}, Limit: {limit}")
+    
+    def generate():
+        try:
+            yield from generate_events()
+        except QLOO_UNAVAILABLE_ERRORS as e:
+            print(f"[{request_id}] ⚡ Qloo unavailable: {e}")
+            yield json.dumps({'type': 'error', 'error': str(e), 'retry_after': unavailable_retry_after(e)}) + '\n'
+        except Exception as e:
+            print(f"[{request_id}] ❌ City Bundle Exception: {e}")
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+        yield json.dumps({'type': 'done'}) + '\n'
+    
+    def generate_events():
+        # Each phase holds a slot in its own dependency's bulkhead
+        try:
+            with QLOO_BULKHEAD.slot():
+                # Fetch Qloo API data ONCE for both consumers (shared with other requests for the city)
+                snapshot = get_city_snapshot(city, country, limit, log_prefix=f"[{request_id}]")
+                
+                try:
+                    viz_data = generate_city_visualizations(city, country, limit, log_prefix=f"[{request_id}]", city_data=snapshot)
+                    yield json.dumps({'type': 'visualizations', 'data': viz_data}) + '\n'
+                except Exception as e:
+                    print(f"[{request_id}] ❌ Visualization Exception: {e}")
+                    yield json.dumps({'type': 'visualizations', 'error': str(e)}) + '\n'
+        except BulkheadFull as e:
+            print(f"[BULKHEAD] 🚧 {e}")
+            yield json.dumps({'type': 'visualizations', 'error': str(e), 'retry_after': e.retry_after}) + '\n'
+            return
+        
+        try:
+            with LLM_BULKHEAD.slot():
+                yield from generate_analysis(snapshot)
+        except BulkheadFull as e:
+            print(f"[BULKHEAD] 🚧 {e}")
+            yield json.dumps({'type': 'analysis', 'error': str(e), 'retry_after': e.retry_after}) + '\n'
+    
+    def generate_analysis(snapshot):
+        print(f"[{request_id}] 🔄 Calling analyze_business_environment with shared data...")
+        if stream_sections:
+            # Parallel section generation; emit each section as soon as it is written
+            events = queue.Queue()
+            def run_analysis():
+                try:
+                    result = analyze_business_environment(
+                        city, country, limit, snapshot=snapshot, parallel=True,
+                        on_section=lambda title, text: events.put(('section', (title, text)))
+                    )
+                except Exception as e:
+                    result = {'error': str(e)}  # Never leave the stream waiting for 'done'
+                events.put(('done', result))
+            # Run in a copy of this request's context, so the worker keeps its deadline
+            ctx = contextvars.copy_context()
+            worker = threading.Thread(target=ctx.run, args=(run_analysis,), daemon=True)
+            worker.start()
+            while True:
+                kind, payload = events.get()
+                if kind == 'done':
+                    result = payload
+                    break
+                yield json.dumps({'type': 'analysis_section', 'section': payload[0], 'text': payload[1]}) + '\n'
+        else:
+            result = analyze_business_environment(city, country, limit, snapshot=snapshot)
+        if result.get("error"):
+            print(f"[{request_id}] ❌ ChatGPT Analysis Error: {result['error']}")
+            yield json.dumps({'type': 'analysis', 'error': result['error'], 'retry_after': result.get('retry_after')}) + '\n'
+        else:
+            print(f"[{request_id}] ✅ City bundle completed successfully")
+            yield json.dumps({'type': 'analysis', 'data': result}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/chatgpt-analysis', methods=['POST'])
+@admitted('analysis', default_limit=30)
+@guarded_by(LLM_BULKHEAD)
 def chatgpt_analysis():
     """Generate ChatGPT analysis of business environment"""
     request_id = str(uuid.uuid4())[:8]
@@ -101,15 +372,19 @@ def chatgpt_analysis():
         
         print(f"[{request_id}] 🤖 ChatGPT Analysis Request - City: {city}, Country: {country}, Limit: {limit}")
         
+        # Reuse a speculative analysis already in progress instead of duplicating it
+        speculative_analyzer.wait_for(city, country, limit, remaining_budget())
+        
         # Generate business environment analysis
         print(f"[{request_id}] 🔄 Calling analyze_business_environment...")
-        result = analyze_business_environment(city, country, limit)
+        with speculative_analyzer.interactive():
+            result = analyze_business_environment(city, country, limit)
         
         print(f"[{request_id}] 📊 Analysis result: {result}")
         
         if result.get("error"):
             print(f"[{request_id}] ❌ ChatGPT Analysis Error: {result['error']}")
-            return jsonify({'error': result['error']}), 500
+            return error_response(result)
         
         print(f"[{request_id}] ✅ ChatGPT Analysis completed successfully")
         return jsonify(result)
@@ -121,6 +396,8 @@ def chatgpt_analysis():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/chat-response', methods=['POST'])
+@admitted('chat')
+@guarded_by(LLM_BULKHEAD)
 def chat_response():
     """Get chat response from ChatGPT about business environment"""
     request_id = str(uuid.uuid4())[:8]
@@ -137,11 +414,12 @@ def chat_response():
         print(f"[{request_id}] 💬 Chat Request - City: {city}, Country: {country}, Message: {message[:50]}...")
         
         # Get chat response
-        result = get_chat_response(message, city, country)
+        with speculative_analyzer.interactive():
+            result = get_chat_response(message, city, country, data.get('session_id'))
         
         if result.get("error"):
             print(f"[{request_id}] ❌ Chat Response Error: {result['error']}")
-            return jsonify({'error': result['error']}), 500
+            return error_response(result)
         
         print(f"[{request_id}] ✅ Chat Response generated successfully")
         return jsonify(result)
@@ -150,9 +428,59 @@ def chat_response():
         print(f"[{request_id}] ❌ Chat Response Exception: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/speculative-analysis/cancel', methods=['POST'])
+def cancel_speculative_analysis():
+    """Cancel a pending speculative analysis, e.g. when the user moves to another city"""
+    data = request.get_json() or {}
+    cancelled = speculative_analyzer.cancel(data.get('city'), data.get('country'), data.get('limit'))
+    return jsonify({'cancelled': cancelled})
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'GeoTaste API'})
+    from circuit_breaker import QLOO_BREAKER, OPENAI_BREAKER
+    from rate_limiter import QLOO_LIMITER
+    from llm_cache import llm_cache
+    from llm_metrics import llm_usage
+    from model_router import model_router
+    from chat_sessions import chat_sessions
+    from tag_taxonomy import tag_classifier
+    from city_snapshot import city_snapshots
+    return jsonify({
+        'status': 'healthy',
+        'service': 'GeoTaste API',
+        'upstreams': {
+            'qloo': QLOO_BREAKER.snapshot(),
+            'openai': OPENAI_BREAKER.snapshot()
+        },
+        'rate_limits': {
+            'qloo': QLOO_LIMITER.snapshot()
+        },
+        'speculative_analysis': speculative_analyzer.snapshot(),
+        'llm_cache': llm_cache.snapshot(),
+        'llm_usage': llm_usage.snapshot(),
+        'model_routes': model_router.snapshot(),
+        'chat_sessions': chat_sessions.snapshot(),
+        'bulkheads': {
+            'openai': LLM_BULKHEAD.snapshot(),
+            'qloo': QLOO_BULKHEAD.snapshot()
+        },
+        'admission': admission_controller.snapshot(),
+        'tag_classifier': tag_classifier.snapshot(),
+        'city_snapshots': city_snapshots.snapshot()
+    })
+
+@app.route('/api/load', methods=['GET'])
+def load_gauges():
+    """In-flight cost and queue depth gauges, for autoscaling"""
+    return jsonify(admission_controller.snapshot())
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Report ready once the cache warm-up has reached its threshold"""
+    progress = warmup_job.progress()
+    if warmup_job.is_ready():
+        return jsonify({'status': 'ready', 'warmup': progress})
+    return jsonify({'status': 'warming', 'warmup': progress}), 503
 
 @app.route('/api', methods=['GET'])
 def api_root():
@@ -161,7 +489,12 @@ def api_root():
         'version': '1.0.0',
         'endpoints': [
             '/api/health',
+            '/api/ready',
+            '/api/load',
             '/api/visualizations',
+            '/api/visualizations/stream',
+            '/api/geo',
+            '/api/city-bundle',
             '/api/chatgpt-analysis',
             '/api/chat-response'
         ]
@@ -0,0 +1,107 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# --- Bulkhead Configuration ---
+# Each upstream dependency gets its own bounded share of the server's request
+# threads, so slow OpenAI calls cannot starve the (normally fast) Qloo endpoints.
+LLM_MAX_CONCURRENT = int(os.getenv('LLM_MAX_CONCURRENT', 8))
+LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', 8))
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 2))
+QLOO_MAX_CONCURRENT = int(os.getenv('QLOO_MAX_CONCURRENT', 16))
+QLOO_MAX_QUEUE = int(os.getenv('QLOO_MAX_QUEUE', 16))
+QLOO_QUEUE_TIMEOUT = float(os.getenv('QLOO_QUEUE_TIMEOUT', 5))
+
+
+class BulkheadFull(Exception):
+    """Raised when a bulkhead has no free slot and its queue is full or timed out."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is at capacity; retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    """
+    Bounded concurrency for one dependency: at most `max_concurrent` callers
+    run at once, at most `max_queue` wait (up to `queue_timeout` seconds), and
+    everyone else is rejected immediately with BulkheadFull.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._avg_hold = 1.0  # moving average of slot hold time, for Retry-After
+        self._stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0, 'declined': 0}
+
+    def _retry_after(self):
+        return max(1.0, self._avg_hold * (self._waiting + 1) / max(1, self.max_concurrent))
+
+    def acquire(self, blocking=True):
+        """
+        Take a slot, waiting in the queue if needed. Returns the wait time.
+        With blocking=False, only a free slot nobody is queued for is taken;
+        otherwise BulkheadFull is raised at once (for low-priority work).
+        """
+        started = time.monotonic()
+        with self._condition:
+            if self._active < self.max_concurrent and self._waiting == 0:
+                self._active += 1
+                self._stats['admitted'] += 1
+                return 0.0
+            if not blocking:
+                self._stats['declined'] += 1
+                raise BulkheadFull(self.name, self._retry_after())
+            if self._waiting >= self.max_queue:
+                self._stats['rejected'] += 1
+                raise BulkheadFull(self.name, self._retry_after())
+
+            self._waiting += 1
+            self._stats['queued'] += 1
+            try:
+                deadline = started + self.queue_timeout
+                while self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timed_out'] += 1
+                        raise BulkheadFull(self.name, self._retry_after())
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._active += 1
+            self._stats['admitted'] += 1
+        return time.monotonic() - started
+
+    def release(self, held=None):
+        with self._condition:
+            self._active -= 1
+            if held is not None:
+                self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self, blocking=True):
+        """Hold a slot for the duration of the block; raises BulkheadFull when saturated."""
+        self.acquire(blocking)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def snapshot(self):
+        with self._condition:
+            return dict(self._stats, name=self.name, active=self._active, waiting=self._waiting,
+                        max_concurrent=self.max_concurrent, max_queue=self.max_queue,
+                        avg_hold_seconds=round(self._avg_hold, 2))
+
+
+LLM_BULKHEAD = Bulkhead('openai', LLM_MAX_CONCURRENT, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+QLOO_BULKHEAD = Bulkhead('qloo', QLOO_MAX_CONCURRENT, QLOO_MAX_QUEUE, QLOO_QUEUE_TIMEOUT)
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from qloo_analysis import get_brands, get_places, is_degraded
+from retry_policy import deadline_scope
+
+# --- Warm-up Configuration ---
+# Cities as "City:CC" pairs separated by ";" (e.g. "London:GB;New York:US"),
+# or a JSON file of [["London", "GB"], ...] via WARMUP_CITIES_FILE.
+WARMUP_CITIES = os.getenv('WARMUP_CITIES', '')
+WARMUP_CITIES_FILE = os.getenv('WARMUP_CITIES_FILE', '')
+WARMUP_CONCURRENCY = int(os.getenv('WARMUP_CONCURRENCY', 4))
+# Limits used by the frontend: charts request 20 entities, the analysis panel 30
+WARMUP_VISUALIZATION_LIMIT = int(os.getenv('WARMUP_VISUALIZATION_LIMIT', 20))
+WARMUP_ANALYSIS_LIMIT = int(os.getenv('WARMUP_ANALYSIS_LIMIT', 30))
+WARMUP_RENDER_VISUALIZATIONS = os.getenv('WARMUP_RENDER_VISUALIZATIONS', 'true').lower() == 'true'
+WARMUP_RUN_ANALYSIS = os.getenv('WARMUP_RUN_ANALYSIS', 'false').lower() == 'true'
+# Re-run the warm-up every N seconds (0 = only once at startup)
+WARMUP_INTERVAL_SECONDS = float(os.getenv('WARMUP_INTERVAL_SECONDS', 0))
+# Fraction of cities that must be warm before /api/ready reports ready
+WARMUP_READY_THRESHOLD = float(os.getenv('WARMUP_READY_THRESHOLD', 0.8))
+# Time budget per city, so a stuck upstream cannot stall the job
+WARMUP_CITY_DEADLINE_SECONDS = float(os.getenv('WARMUP_CITY_DEADLINE_SECONDS', 120))
+
+
+def load_warmup_cities():
+    """Return the configured hot cities as a list of (city, country_code) tuples."""
+    if WARMUP_CITIES_FILE:
+        try:
+            with open(WARMUP_CITIES_FILE) as f:
+                return [(city, country) for city, country in json.load(f)]
+        except (OSError, ValueError, TypeError) as e:
+            print(f"[WARMUP] ❌ Could not read {WARMUP_CITIES_FILE}: {e}")
+            return []
+
+    cities = []
+    for entry in WARMUP_CITIES.split(';'):
+        if ':' in entry:
+            city, country = entry.rsplit(':', 1)
+            cities.append((city.strip(), country.strip()))
+    return cities
+
+
+class WarmupJob:
+    """
+    Prefetches Qloo data (and optionally charts and analyses) for hot cities
+    so the first users after a deploy hit a warm cache.
+    """
+
+    def __init__(self, cities, concurrency=WARMUP_CONCURRENCY, render_visualizations=WARMUP_RENDER_VISUALIZATIONS,
+                 run_analysis=WARMUP_RUN_ANALYSIS, ready_threshold=WARMUP_READY_THRESHOLD,
+                 interval_seconds=WARMUP_INTERVAL_SECONDS):
+        self.cities = list(cities)
+        self.concurrency = max(1, concurrency)
+        self.render_visualizations = render_visualizations
+        self.run_analysis = run_analysis
+        self.ready_threshold = ready_threshold
+        self.interval_seconds = interval_seconds
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._rounds = 0
+        self._ever_warmed = 0
+        self._reset_round()
+
+    def _reset_round(self):
+        self._completed = 0
+        self._failed = []
+        self._started_at = None
+        self._finished_at = None
+
+    def warm_city(self, city, country):
+        """Warm every cache for one city. Returns True on success."""
+        with deadline_scope(WARMUP_CITY_DEADLINE_SECONDS):
+            brands = get_brands(city, country, WARMUP_VISUALIZATION_LIMIT)
+            places = get_places(city, country, WARMUP_VISUALIZATION_LIMIT)
+            ok = bool(brands and places) and not (is_degraded(brands) or is_degraded(places))
+
+            if WARMUP_ANALYSIS_LIMIT != WARMUP_VISUALIZATION_LIMIT:
+                ok = bool(get_brands(city, country, WARMUP_ANALYSIS_LIMIT)) and ok
+                ok = bool(get_places(city, country, WARMUP_ANALYSIS_LIMIT)) and ok
+
+            if ok and self.render_visualizations:
+                from visualizations import generate_city_visualizations
+                viz_data = generate_city_visualizations(city, country, WARMUP_VISUALIZATION_LIMIT, log_prefix="[WARMUP]")
+                ok = bool(viz_data) and not viz_data.get('stale') and not viz_data.get('partial')
+
+            if ok and self.run_analysis:
+                from chatgpt_analysis import analyze_business_environment
+                result = analyze_business_environment(city, country, WARMUP_ANALYSIS_LIMIT)
+                ok = not result.get('error') and not result.get('stale')
+        return ok
+
+    def run_once(self):
+        """Warm all configured cities with bounded concurrency."""
+        with self._lock:
+            self._reset_round()
+            self._started_at = time.time()
+        print(f"[WARMUP] 🔥 Warming {len(self.cities)} cities (concurrency {self.concurrency})")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="warmup") as executor:
+            futures = {executor.submit(self.warm_city, city, country): (city, country) for city, country in self.cities}
+            for future in as_completed(futures):
+                city, country = futures[future]
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    print(f"[WARMUP] ❌ {city}, {country}: {e}")
+                    ok = False
+                with self._lock:
+                    if ok:
+                        self._completed += 1
+                        self._ever_warmed = max(self._ever_warmed, self._completed)
+                    else:
+                        self._failed.append(f"{city}, {country}")
+                    done = self._completed + len(self._failed)
+                print(f"[WARMUP] {'✅' if ok else '⚠️'} {city}, {country} ({done}/{len(self.cities)})")
+
+        with self._lock:
+            self._finished_at = time.time()
+            self._rounds += 1
+        print(f"[WARMUP] 🏁 Warm-up round finished: {self._completed} warmed, {len(self._failed)} failed")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            if self.interval_seconds <= 0:
+                break
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        """Run the warm-up in a background thread (repeating if an interval is set)."""
+        if not self.cities or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="cache-warmup", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_ready(self):
+        """Ready once the warmed fraction reaches the threshold (always ready without cities)."""
+        if not self.cities:
+            return True
+        with self._lock:
+            return self._ever_warmed / len(self.cities) >= self.ready_threshold
+
+    def progress(self):
+        with self._lock:
+            total = len(self.cities)
+            return {
+                'cities': total,
+                'warmed': self._completed,
+                'failed': list(self._failed),
+                'rounds': self._rounds,
+                'fraction': round(self._completed / total, 3) if total else 1.0,
+                'ready_threshold': self.ready_threshold,
+                'started_at': self._started_at,
+                'finished_at': self._finished_at,
+            }
+
+
+warmup_job = WarmupJob(load_warmup_cities())
+
+
+def start_warmup():
+    """Start the configured warm-up job (no-op when no cities are configured)."""
+    if warmup_job.cities:
+        warmup_job.start()
+    return warmup_job
@@ -0,0 +1,103 @@
+"""
+Data-only chart specs for clients that apply their own presentation.
+
+Each chart is reduced to its aggregated series (category counts, rating
+values, top-N rows, scatter points); colorscales, fonts, hovertemplates and
+the layout template are left to the client. Numeric arrays are sent as typed
+arrays ({"dtype": "f8", "bdata": <base64>}, the same convention plotly.js
+accepts).
+"""
+import base64
+import json
+
+import numpy as np
+
+# Bump the major version on any breaking change to the chart layout below
+CHART_DATA_SCHEMA = 'geotaste.chart-data/1'
+
+# Trace properties that carry data; everything else is presentation
+SERIES_FIELDS = ('name', 'orientation', 'mode', 'x', 'y', 'labels', 'values', 'text', 'customdata', 'width', 'nbinsx')
+
+
+class TypedArray:
+    """A numeric series, encoded as a base64 typed array."""
+
+    def __init__(self, values):
+        array = np.asarray(values)
+        if array.dtype.kind in 'iu' and array.size and -2**31 <= array.min() and array.max() < 2**31:
+            array = array.astype('<i4')
+        else:
+            array = array.astype('<f8')
+        self.array = array
+
+    @property
+    def dtype(self):
+        return 'i4' if self.array.dtype.kind == 'i' else 'f8'
+
+    def to_json(self):
+        return {'dtype': self.dtype, 'bdata': base64.b64encode(self.array.tobytes()).decode('ascii')}
+
+
+def _is_numeric(values):
+    return bool(values) and all(
+        isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool)
+        for value in values
+    )
+
+
+def _series_value(value):
+    if hasattr(value, 'tolist'):  # numpy arrays and pandas Series
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        value = list(value)
+        return TypedArray(value) if _is_numeric(value) else value
+    return value
+
+
+def _title_text(title):
+    return title.get('text') if isinstance(title, dict) else title
+
+
+def trace_series(trace):
+    """Data fields of one trace dict, plus marker/text sizes and colour values when they are data."""
+    series = {'type': trace.get('type')}
+    for field in SERIES_FIELDS:
+        if field in trace:
+            series[field] = _series_value(trace[field])
+    if series['type'] == 'bar':
+        series.pop('text', None)  # Bar labels only restate the values
+
+    marker = trace.get('marker') or {}
+    for source, target in ((marker.get('size'), 'size'), ((trace.get('textfont') or {}).get('size'), 'size'),
+                           (marker.get('color'), 'color')):
+        value = _series_value(source)
+        if isinstance(value, TypedArray) and target not in series:
+            series[target] = value
+    return series
+
+
+def figure_data(figure):
+    """Data-only spec of a fast_figures.Figure (or anything with .data and .layout dicts)."""
+    layout = figure.layout
+    spec = {
+        'title': _title_text(layout.get('title')),
+        'series': [trace_series(trace) for trace in figure.data],
+    }
+    for axis in ('xaxis', 'yaxis'):
+        axis_title = _title_text((layout.get(axis) or {}).get('title'))
+        if axis_title:
+            spec[f'{axis[0]}_title'] = axis_title
+    return spec
+
+
+def _default(value):
+    if isinstance(value, TypedArray):
+        return value.to_json()
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def encode(payload):
+    """Encode a chart data payload. Returns (body, mimetype)."""
+    return json.dumps(payload, default=_default, separators=(',', ':')), 'application/json'
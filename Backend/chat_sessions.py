@@ -0,0 +1,112 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+# --- Chat Session Configuration ---
+CHAT_SESSION_TTL = float(os.getenv('CHAT_SESSION_TTL', 1800))
+CHAT_SESSION_MAX = int(os.getenv('CHAT_SESSION_MAX', 1000))
+# Turns kept verbatim; older turns are folded into a short summary
+CHAT_SESSION_MAX_TURNS = int(os.getenv('CHAT_SESSION_MAX_TURNS', 4))
+# Turns sent through one server-side response chain before it is restarted
+# from the analysis and the summarized history, so input tokens stay bounded
+CHAT_CHAIN_MAX_TURNS = int(os.getenv('CHAT_CHAIN_MAX_TURNS', 6))
+CHAT_RESPONSE_CHAINING = os.getenv('CHAT_RESPONSE_CHAINING', 'true').lower() == 'true'
+SUMMARY_MAX_CHARS = int(os.getenv('CHAT_SUMMARY_MAX_CHARS', 1200))
+
+
+def _clip(text, limit):
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + '...'
+
+
+class ChatSession:
+    """
+    Server-side state for one conversation: the analysis it is grounded in,
+    the last response id for response chaining, and a bounded turn history.
+    """
+
+    def __init__(self, session_id, city_name, country_code):
+        self.session_id = session_id
+        self.city_name = city_name
+        self.country_code = country_code
+        self.analysis = None
+        self.previous_response_id = None
+        self.chain_turns = 0
+        self.turns = []     # recent (user_message, reply) pairs
+        self.summary = ''   # compact digest of older turns
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def add_turn(self, user_message, reply, response_id=None):
+        self.turns.append((user_message, reply))
+        while len(self.turns) > CHAT_SESSION_MAX_TURNS:
+            old_message, old_reply = self.turns.pop(0)
+            line = f"- Q: {_clip(old_message, 120)} A: {_clip(old_reply, 200)}"
+            self.summary = (self.summary + "\n" + line).strip()[-SUMMARY_MAX_CHARS:]
+
+        if CHAT_RESPONSE_CHAINING and response_id:
+            self.previous_response_id = response_id
+            self.chain_turns += 1
+            if self.chain_turns >= CHAT_CHAIN_MAX_TURNS:
+                self.reset_chain()
+        else:
+            self.reset_chain()
+
+    def reset_chain(self):
+        self.previous_response_id = None
+        self.chain_turns = 0
+
+    def history_text(self):
+        """Summarized earlier turns plus the recent turns, for rebuilding a chain."""
+        parts = []
+        if self.summary:
+            parts.append(f"**EARLIER CONVERSATION (SUMMARY):**\n{self.summary}")
+        if self.turns:
+            recent = "\n".join(f"- Q: {message}\n  A: {reply}" for message, reply in self.turns)
+            parts.append(f"**RECENT CONVERSATION:**\n{recent}")
+        return "\n\n".join(parts)
+
+
+class ChatSessionStore:
+    """LRU + TTL store of chat sessions keyed by session id."""
+
+    def __init__(self, ttl=CHAT_SESSION_TTL, max_sessions=CHAT_SESSION_MAX):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def _evict(self, now):
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - session.last_used <= self.ttl:
+                break
+            del self._sessions[session_id]
+            self._evictions += 1
+
+    def get_or_create(self, session_id, city_name, country_code):
+        """
+        Return the session for `session_id`, creating one if it is unknown,
+        expired, or was started for a different city.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None or (session.city_name, session.country_code) != (city_name, country_code):
+                session = ChatSession(session_id or uuid.uuid4().hex, city_name, country_code)
+                self._sessions[session.session_id] = session
+            session.last_used = now
+            self._sessions.move_to_end(session.session_id)
+            self._evict(now)
+            return session
+
+    def snapshot(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), 'evictions': self._evictions}
+
+
+chat_sessions = ChatSessionStore()
@@ -1,27 +1,110 @@
 import json
 import os
+import time
+import heapq
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from openai import OpenAI
-from qloo_analysis import get_brands, get_places
+from qloo_analysis import get_brands, get_places, is_degraded, QLOO_UNAVAILABLE_ERRORS
+from retry_policy import OPENAI_RETRY
+from circuit_breaker import OPENAI_BREAKER, CircuitOpenError
+from response_cache import analysis_cache, make_key
+from llm_cache import llm_cache
+from llm_metrics import llm_usage
+from model_router import model_router
+from chat_sessions import chat_sessions
+from city_snapshot import city_snapshots
+from projection import declare_fields
 
-# Set up OpenAI client
-client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+# Set up OpenAI client (retries are handled by the shared retry policy)
+client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'), max_retries=0)
 
-def analyze_business_environment(city_name, country_code, limit=50):
+def create_response(**kwargs):
     """
-    Analyze the business environment of a place using ChatGPT based on Qloo data
+    Call client.responses.create with the shared retry policy, deadline budget
+    and OpenAI circuit breaker. Identical (model, prompt) requests are served
+    from the persistent LLM cache.
     """
+    model = kwargs.get('model')
+    prompt = {key: value for key, value in kwargs.items() if key != 'model'}
+    cached = llm_cache.get(model, prompt)
+    if cached is not None:
+        return cached
+
+    started = time.monotonic()
+    try:
+        response = OPENAI_RETRY.call(
+            lambda timeout: OPENAI_BREAKER.call(client.responses.create, timeout=timeout, **kwargs)
+        )
+    except Exception:
+        llm_usage.record_error(model)
+        raise
+    latency = time.monotonic() - started
+    llm_cache.set(model, prompt, response, latency)
+
+    input_tokens, cached_tokens, output_tokens = llm_usage.record(model, response, latency)
+    print(f"[ChatGPT] 🧮 {model}: {input_tokens} input tokens ({cached_tokens} cached), {output_tokens} output tokens in {latency:.1f}s")
+    return response
+
+def _stale_analysis(cache_key, error):
+    """Serve a stale cached analysis while upstreams fail, or report the error"""
+    stale = analysis_cache.get_stale(cache_key)
+    if stale is not None:
+        print(f"[ChatGPT Analysis] 🕰️ Serving stale cached analysis ({error})")
+        return dict(stale, stale=True)
+    result = {
+        "error": f"Analysis failed: {error}",
+        "analysis": None
+    }
+    if isinstance(error, CircuitOpenError):
+        result["retry_after"] = error.retry_after
+    elif isinstance(error, QLOO_UNAVAILABLE_ERRORS):
+        result["retry_after"] = getattr(error, 'retry_after', None) or 1.0
+    return result
+
+def analyze_business_environment(city_name, country_code, limit=50, brands_data=None, places_data=None,
+                                 parallel=None, on_section=None, snapshot=None):
+    """
+    Analyze the business environment of a place using ChatGPT based on Qloo data.
+    The data comes from `snapshot` (a shared CitySnapshot), else from
+    pre-fetched `brands_data`/`places_data` responses, else from the city's
+    shared snapshot, which is fetched and stored when it is not loaded.
+    With `parallel` (default: PARALLEL_ANALYSIS) the sections are generated
+    concurrently and `on_section(title, text)` is called as each one finishes.
+    """
+    cache_key = make_key(city_name, country_code, limit)
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        print(f"[ChatGPT Analysis] ♻️ Serving cached analysis for {city_name}, {country_code}")
+        return cached
+
+    # Fail fast instead of fetching Qloo data for an analysis that cannot be generated
+    if OPENAI_BREAKER.is_open():
+        return _stale_analysis(cache_key, CircuitOpenError(OPENAI_BREAKER.name, OPENAI_BREAKER.retry_after()))
+
     try:
         print(f"[ChatGPT Analysis] 🚀 Starting analysis for {city_name}, {country_code}")
         
-        # Fetch data from Qloo
-        print(f"[ChatGPT Analysis] 📡 Fetching brands data...")
-        brands_data = get_brands(city_name, country_code, limit)
-        
-        print(f"[ChatGPT Analysis] 📡 Fetching places data...")
-        places_data = get_places(city_name, country_code, limit)
+        # Read the shared city snapshot unless the data was handed in
+        if snapshot is None and (brands_data is None or places_data is None):
+            def fetch():
+                raw_brands, raw_places = brands_data, places_data
+                if raw_brands is None:
+                    print(f"[ChatGPT Analysis] 📡 Fetching brands data...")
+                    raw_brands = get_brands(city_name, country_code, limit)
+                if raw_places is None:
+                    print(f"[ChatGPT Analysis] 📡 Fetching places data...")
+                    raw_places = get_places(city_name, country_code, limit)
+                return raw_brands, raw_places
+            snapshot = city_snapshots.get_or_build(city_name, country_code, limit, fetch)
+        if snapshot is not None:
+            brands_data, places_data = snapshot.city_data
         
         if not brands_data or not places_data:
             print(f"[ChatGPT Analysis] ❌ Failed to fetch data from Qloo API")
+            stale = analysis_cache.get_stale(cache_key)
+            if stale is not None:
+                return dict(stale, stale=True)
             return {
                 "error": "Failed to fetch data from Qloo API",
                 "analysis": None
@@ -30,32 +113,49 @@ def analyze_business_environment(city_name, country_code, limit=50):
         print(f"[ChatGPT Analysis] ✅ Qloo data fetched successfully")
         
         # Extract key information from the data
-        brands = brands_data.get('results', {}).get('entities', [])
-        places = places_data.get('results', {}).get('entities', [])
+        if snapshot is not None:
+            brands, places = snapshot.brands, snapshot.places
+        else:
+            brands = brands_data.get('results', {}).get('entities', [])
+            places = places_data.get('results', {}).get('entities', [])
         
         print(f"[ChatGPT Analysis] 📊 Found {len(brands)} brands and {len(places)} places")
         
         # Prepare data summary for ChatGPT
         print(f"[ChatGPT Analysis] 🔄 Preparing data summary...")
         data_summary = prepare_data_summary(brands, places, city_name, country_code)
+        print(f"[ChatGPT Analysis] 📏 Data summary: ~{data_summary['estimated_tokens']} tokens")
         
-        # Create prompt for ChatGPT
+        # Create prompt for ChatGPT (static instructions are sent separately)
         print(f"[ChatGPT Analysis] 📝 Creating analysis prompt...")
-        prompt = create_analysis_prompt(data_summary, city_name, country_code)
+        analysis_input = create_analysis_input(data_summary, city_name, country_code)
         
-        print(f"[ChatGPT Analysis] 🤖 Sending request to ChatGPT...")
+        analysis = None
+        if PARALLEL_ANALYSIS if parallel is None else parallel:
+            print(f"[ChatGPT Analysis] 🧩 Generating {len(ANALYSIS_SECTIONS)} sections in parallel...")
+            try:
+                analysis = generate_analysis_sections(analysis_input, on_section)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                print(f"[ChatGPT Analysis] ⚠️ Parallel generation failed ({e}), falling back to a single call")
         
-        # Call ChatGPT using the latest API structure
-        response = client.responses.create(
-            model="gpt-4.1",
-            input=prompt
-        )
-        
-        analysis = response.output_text
+        if analysis is None:
+            print(f"[ChatGPT Analysis] 🤖 Sending request to ChatGPT...")
+            
+            # Call ChatGPT using the latest API structure
+            response = model_router.call(
+                "analysis",
+                create_response,
+                instructions=ANALYSIS_INSTRUCTIONS,
+                input=analysis_input
+            )
+            
+            analysis = response.output_text
         
         print(f"[ChatGPT Analysis] ✅ Analysis completed successfully, length: {len(analysis)}")
         
-        return {
+        result = {
             "success": True,
             "analysis": analysis,
             "city": city_name,
@@ -65,87 +165,165 @@ def analyze_business_environment(city_name, country_code, limit=50):
                 "places_count": len(places)
             }
         }
+        if brands_data.get('partial') or places_data.get('partial'):
+            result["partial"] = True  # Some Qloo pages were lost
+        if brands_data.get('stale') or places_data.get('stale'):
+            result["stale"] = True
+        if not (is_degraded(brands_data) or is_degraded(places_data)):
+            analysis_cache.set(cache_key, result)
+        return result
         
+    except (CircuitOpenError,) + QLOO_UNAVAILABLE_ERRORS as e:
+        print(f"[ChatGPT Analysis] ⚡ {e}")
+        return _stale_analysis(cache_key, e)
     except Exception as e:
         print(f"[ChatGPT Analysis] 💥 Exception: {str(e)}")
         print(f"[ChatGPT Analysis] 💥 Exception type: {type(e).__name__}")
         import traceback
         print(f"[ChatGPT Analysis] 💥 Full traceback: {traceback.format_exc()}")
-        return {
-            "error": f"Analysis failed: {str(e)}",
-            "analysis": None
-        }
+        return _stale_analysis(cache_key, e)
+
+# --- Data summary budget ---
+# Estimated tokens allowed for the market data lines of the analysis brief,
+# so prompt size stays flat whether a city was fetched with limit=20 or 2000.
+SUMMARY_TOKEN_BUDGET = int(os.getenv('SUMMARY_TOKEN_BUDGET', 400))
+SUMMARY_MAX_CATEGORIES = int(os.getenv('SUMMARY_MAX_CATEGORIES', 12))
+SUMMARY_MAX_EXAMPLES = int(os.getenv('SUMMARY_MAX_EXAMPLES', 5))
+
+# Entity fields read by the data summary; see projection.py
+declare_fields('brand', 'chatgpt_analysis', ['name', 'popularity', 'tags.name'])
+declare_fields('place', 'chatgpt_analysis', ['name', 'tags.name', 'properties.business_rating'])
+
+def estimate_tokens(text):
+    """Rough token count for English prompt text (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+def _tag_names(entity):
+    return [tag.get('name', '') for tag in entity.get('tags', [])]
+
+def _parse_rating(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
 
-def prepare_data_summary(brands, places, city_name, country_code):
+def prepare_data_summary(brands, places, city_name, country_code, token_budget=None):
     """
-    Prepare a summary of the Qloo data for ChatGPT analysis
+    Prepare a summary of the Qloo data for ChatGPT analysis.
+    Makes one pass over each entity list, keeps the top rated places and most
+    popular brands with heap-based top-k selection, then includes as many
+    category and example lines as fit in `token_budget` estimated tokens; a
+    section whose strongest line does not fit is left out.
     """
-    summary = {
-        "city": city_name,
-        "country": country_code,
-        "brands": [],
-        "places": [],
-        "brand_categories": {},
-        "place_categories": {},
-        "top_rated_places": [],
-        "popular_brands": []
-    }
+    token_budget = SUMMARY_TOKEN_BUDGET if token_budget is None else token_budget
+    k = SUMMARY_MAX_EXAMPLES
     
-    # Process brands
-    for brand in brands[:20]:  # Limit to top 20 for analysis
-        brand_info = {
-            "name": brand.get('name', 'Unknown'),
-            "popularity": brand.get('popularity', 0),
-            "categories": [tag.get('name', '') for tag in brand.get('tags', [])]
-        }
-        summary["brands"].append(brand_info)
-        
-        # Count categories
-        for category in brand_info["categories"]:
+    # Process brands: count categories and keep the most popular in one pass
+    brand_categories = {}
+    for brand in brands:
+        for category in _tag_names(brand):
             if category:
-                summary["brand_categories"][category] = summary["brand_categories"].get(category, 0) + 1
+                brand_categories[category] = brand_categories.get(category, 0) + 1
+    popular_brands = heapq.nlargest(k, brands, key=lambda brand: brand.get('popularity') or 0)
     
-    # Process places
-    for place in places[:20]:  # Limit to top 20 for analysis
-        properties = place.get('properties', {})
-        place_info = {
-            "name": place.get('name', 'Unknown'),
-            "rating": properties.get('business_rating', 'N/A'),
-            "categories": [tag.get('name', '') for tag in place.get('tags', [])],
-            "price_range": properties.get('price_range', 'N/A')
-        }
-        summary["places"].append(place_info)
-        
-        # Count categories
-        for category in place_info["categories"]:
+    # Process places: count categories and keep the top rated in one pass,
+    # parsing each rating once
+    place_categories = {}
+    rated_places = []
+    for index, place in enumerate(places):
+        for category in _tag_names(place):
             if category:
-                summary["place_categories"][category] = summary["place_categories"].get(category, 0) + 1
-    
-    # Get top rated places
-    rated_places = [p for p in places if p.get('properties', {}).get('business_rating') and p['properties']['business_rating'] != 'N/A']
-    rated_places.sort(key=lambda x: float(x['properties']['business_rating']), reverse=True)
+                place_categories[category] = place_categories.get(category, 0) + 1
+        rating = _parse_rating(place.get('properties', {}).get('business_rating'))
+        if rating is not None:
+            rated_places.append((rating, -index, place))
+    top_rated = [place for _, _, place in heapq.nlargest(k, rated_places, key=lambda item: item[:2])]
     
-    for place in rated_places[:5]:
-        summary["top_rated_places"].append({
+    candidates = {
+        "brand_categories": heapq.nlargest(SUMMARY_MAX_CATEGORIES, brand_categories.items(), key=lambda item: item[1]),
+        "place_categories": heapq.nlargest(SUMMARY_MAX_CATEGORIES, place_categories.items(), key=lambda item: item[1]),
+        "top_rated_places": [{
             "name": place.get('name', 'Unknown'),
             "rating": place.get('properties', {}).get('business_rating', 'N/A'),
-            "categories": [tag.get('name', '') for tag in place.get('tags', [])]
-        })
-    
-    # Get popular brands
-    popular_brands = sorted(brands, key=lambda x: x.get('popularity', 0), reverse=True)
-    for brand in popular_brands[:5]:
-        summary["popular_brands"].append({
+            "categories": _tag_names(place)
+        } for place in top_rated],
+        "popular_brands": [{
             "name": brand.get('name', 'Unknown'),
             "popularity": brand.get('popularity', 0),
-            "categories": [tag.get('name', '') for tag in brand.get('tags', [])]
-        })
+            "categories": _tag_names(brand)
+        } for brand in popular_brands],
+    }
+    line_formatters = {
+        "brand_categories": lambda item: format_category_line(*item),
+        "place_categories": lambda item: format_category_line(*item),
+        "top_rated_places": format_place_line,
+        "popular_brands": format_brand_line,
+    }
+    
+    # Fill the budget round-robin so every section gets its strongest lines first;
+    # a section stops at its first line that does not fit, so it stays a prefix
+    selected = {name: [] for name in candidates}
+    full = set()
+    used_tokens = 0
+    for rank in range(max(len(items) for items in candidates.values())):
+        for name, items in candidates.items():
+            if rank >= len(items) or name in full:
+                continue
+            cost = estimate_tokens(line_formatters[name](items[rank]))
+            if used_tokens + cost > token_budget:
+                full.add(name)
+                continue
+            selected[name].append(items[rank])
+            used_tokens += cost
     
-    return summary
+    return {
+        "city": city_name,
+        "country": country_code,
+        "brand_count": len(brands),
+        "place_count": len(places),
+        "brand_categories": dict(selected["brand_categories"]),
+        "place_categories": dict(selected["place_categories"]),
+        "top_rated_places": selected["top_rated_places"],
+        "popular_brands": selected["popular_brands"],
+        "estimated_tokens": used_tokens
+    }
 
-def create_analysis_prompt(data_summary, city_name, country_code):
+# Static instructions go first and are sent unchanged on every call, so the
+# provider can serve them from its prompt prefix cache. Everything that varies
+# per city comes after them.
+ANALYSIS_INSTRUCTIONS = """You are a senior business analyst specializing in market intelligence and location-based business insights. Your role is to provide direct, actionable business analysis without any introductory phrases or AI assistant language.
+
+**ANALYSIS REQUIREMENTS**
+
+You will receive a BUSINESS ENVIRONMENT ANALYSIS BRIEF with market data for one location. Provide a structured business environment analysis in the following format:
+
+**MARKET OVERVIEW**
+[Direct analysis of the business environment type and characteristics]
+
+**BUSINESS DIVERSITY**
+[Assessment of market diversity and sector distribution]
+
+**QUALITY METRICS**
+[Evaluation of business quality based on ratings and performance]
+
+**OPPORTUNITY LANDSCAPE**
+[Identification of market gaps and business opportunities]
+
+**COMPETITIVE DYNAMICS**
+[Analysis of market competition and positioning]
+
+**CONSUMER INSIGHTS**
+[Key insights about local consumer preferences and behavior]
+
+**EXECUTIVE SUMMARY**
+[2-3 key takeaways for business decision-makers]
+
+Write in a professional, direct tone suitable for executive briefings. Avoid any conversational phrases, introductions, or AI assistant language. Focus on actionable insights and data-driven conclusions. Target length: 350-450 words.
+"""
+
+def create_analysis_input(data_summary, city_name, country_code):
     """
-    Create a comprehensive prompt for ChatGPT analysis with improved system prompt
+    Create the variable part of the analysis prompt (the market data brief)
     """
     
     # Format the data for better presentation
@@ -154,12 +332,10 @@ def create_analysis_prompt(data_summary, city_name, country_code):
     top_places_str = format_top_places(data_summary['top_rated_places'])
     popular_brands_str = format_popular_brands(data_summary['popular_brands'])
     
-    prompt = f"""You are a senior business analyst specializing in market intelligence and location-based business insights. Your role is to provide direct, actionable business analysis without any introductory phrases or AI assistant language.
-
-**BUSINESS ENVIRONMENT ANALYSIS BRIEF**
+    return f"""**BUSINESS ENVIRONMENT ANALYSIS BRIEF**
 
 **Location:** {city_name}, {country_code}
-**Data Scope:** {len(data_summary['brands'])} brands, {len(data_summary['places'])} businesses analyzed
+**Data Scope:** {data_summary['brand_count']} brands, {data_summary['place_count']} businesses analyzed
 
 **MARKET DATA**
 
@@ -174,115 +350,206 @@ def create_analysis_prompt(data_summary, city_name, country_code):
 
 **Market Leaders:**
 {popular_brands_str}
+"""
 
-**ANALYSIS REQUIREMENTS**
+# --- Parallel section generation ---
+PARALLEL_ANALYSIS = os.getenv('PARALLEL_ANALYSIS', 'false').lower() == 'true'
+ANALYSIS_SECTION_CONCURRENCY = int(os.getenv('ANALYSIS_SECTION_CONCURRENCY', 6))
 
-Provide a structured business environment analysis in the following format:
+# (title, guidance) in report order; the last section is synthesized from the others
+ANALYSIS_SECTIONS = [
+    ("MARKET OVERVIEW", "Direct analysis of the business environment type and characteristics"),
+    ("BUSINESS DIVERSITY", "Assessment of market diversity and sector distribution"),
+    ("QUALITY METRICS", "Evaluation of business quality based on ratings and performance"),
+    ("OPPORTUNITY LANDSCAPE", "Identification of market gaps and business opportunities"),
+    ("COMPETITIVE DYNAMICS", "Analysis of market competition and positioning"),
+    ("CONSUMER INSIGHTS", "Key insights about local consumer preferences and behavior"),
+    ("EXECUTIVE SUMMARY", "2-3 key takeaways for business decision-makers"),
+]
 
-**MARKET OVERVIEW**
-[Direct analysis of the business environment type and characteristics]
+SECTION_INSTRUCTIONS = """You are a senior business analyst specializing in market intelligence and location-based business insights. You write one section of a business environment analysis at a time, based on a BUSINESS ENVIRONMENT ANALYSIS BRIEF.
 
-**BUSINESS DIVERSITY**
-[Assessment of market diversity and sector distribution]
+Write only the requested section body, without its heading, in a professional, direct tone suitable for executive briefings. Avoid any conversational phrases, introductions, or AI assistant language. Focus on actionable insights and data-driven conclusions. Target length: 50-70 words."""
 
-**QUALITY METRICS**
-[Evaluation of business quality based on ratings and performance]
+_section_executor = ThreadPoolExecutor(max_workers=ANALYSIS_SECTION_CONCURRENCY, thread_name_prefix="analysis-section")
 
-**OPPORTUNITY LANDSCAPE**
-[Identification of market gaps and business opportunities]
+def _generate_section(analysis_input, title, guidance, previous_sections=None):
+    """Generate one analysis section; the shared brief comes first so section calls share a prefix"""
+    section_input = analysis_input
+    if previous_sections:
+        section_input += "\n**ANALYSIS SO FAR**\n\n" + previous_sections + "\n"
+    section_input += f"\n**REQUESTED SECTION:** {title}\n[{guidance}]"
+    response = model_router.call(
+        "analysis",
+        create_response,
+        instructions=SECTION_INSTRUCTIONS,
+        input=section_input
+    )
+    return response.output_text.strip()
 
-**COMPETITIVE DYNAMICS**
-[Analysis of market competition and positioning]
+def generate_analysis_sections(analysis_input, on_section=None):
+    """
+    Map-reduce generation: every section except the EXECUTIVE SUMMARY is a
+    separate concurrent call; the summary is then synthesized from them.
+    Returns the assembled analysis in the same format as the single-call path.
+    """
+    *body_sections, (summary_title, summary_guidance) = ANALYSIS_SECTIONS
+    futures = {
+        _section_executor.submit(contextvars.copy_context().run, _generate_section, analysis_input, title, guidance): title
+        for title, guidance in body_sections
+    }
 
-**CONSUMER INSIGHTS**
-[Key insights about local consumer preferences and behavior]
+    texts = {}
+    try:
+        for future in as_completed(futures):
+            title = futures[future]
+            texts[title] = future.result()
+            if on_section:
+                on_section(title, texts[title])
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
 
-**EXECUTIVE SUMMARY**
-[2-3 key takeaways for business decision-makers]
+    body = "\n\n".join(f"**{title}**\n{texts[title]}" for title, _ in body_sections)
+    summary = _generate_section(analysis_input, summary_title, summary_guidance, previous_sections=body)
+    if on_section:
+        on_section(summary_title, summary)
+    return body + f"\n\n**{summary_title}**\n{summary}"
 
-Write in a professional, direct tone suitable for executive briefings. Avoid any conversational phrases, introductions, or AI assistant language. Focus on actionable insights and data-driven conclusions. Target length: 350-450 words.
-"""
-    
-    return prompt
+def create_analysis_prompt(data_summary, city_name, country_code):
+    """
+    Create the complete analysis prompt as a single string: the static
+    instructions followed by the variable market data
+    """
+    return ANALYSIS_INSTRUCTIONS + "\n" + create_analysis_input(data_summary, city_name, country_code)
+
+def format_category_line(category, count):
+    return f"• {category}: {count} businesses"
+
+def format_place_line(place):
+    rating = place.get('rating', 'N/A')
+    categories = ', '.join(place.get('categories', [])[:2])
+    return f"• {place['name']} (Rating: {rating}, Categories: {categories})"
+
+def format_brand_line(brand):
+    popularity = brand.get('popularity', 0)
+    popularity_pct = f"{popularity * 100:.1f}%" if popularity else "N/A"
+    categories = ', '.join(brand.get('categories', [])[:2])
+    return f"• {brand['name']} (Popularity: {popularity_pct}, Categories: {categories})"
 
 def format_categories(categories_dict):
-    """Format categories for better presentation"""
+    """Format categories for better presentation (already ranked by count)"""
     if not categories_dict:
         return "No category data available"
     
-    sorted_categories = sorted(categories_dict.items(), key=lambda x: x[1], reverse=True)
-    formatted = []
-    for category, count in sorted_categories[:8]:
-        formatted.append(f"• {category}: {count} businesses")
-    
-    return "\n".join(formatted)
+    return "\n".join(format_category_line(category, count) for category, count in categories_dict.items())
 
 def format_top_places(places):
     """Format top rated places for better presentation"""
     if not places:
         return "No rating data available"
     
-    formatted = []
-    for place in places[:3]:
-        rating = place.get('rating', 'N/A')
-        categories = ', '.join(place.get('categories', [])[:2])
-        formatted.append(f"• {place['name']} (Rating: {rating}, Categories: {categories})")
-    
-    return "\n".join(formatted)
+    return "\n".join(format_place_line(place) for place in places)
 
 def format_popular_brands(brands):
     """Format popular brands for better presentation"""
     if not brands:
         return "No brand data available"
     
-    formatted = []
-    for brand in brands[:3]:
-        popularity = brand.get('popularity', 0)
-        popularity_pct = f"{popularity * 100:.1f}%" if popularity else "N/A"
-        categories = ', '.join(brand.get('categories', [])[:2])
-        formatted.append(f"• {brand['name']} (Popularity: {popularity_pct}, Categories: {categories})")
-    
-    return "\n".join(formatted)
+    return "\n".join(format_brand_line(brand) for brand in brands)
+
+CHAT_INSTRUCTIONS = """You are a business intelligence specialist for the location named in the business context. Provide direct, professional responses without AI assistant language.
 
-def get_chat_response(user_message, city_name, country_code):
+Provide a concise, professional response (100-150 words) that directly addresses the user's question using the business analysis provided. If the question is outside the analysis scope, provide relevant business insights about the location. Write in a professional tone suitable for business communications."""
+
+def create_chat_input(analysis, user_message, city_name, country_code, history=None):
     """
-    Get a chat response from ChatGPT about the business environment
+    Create the variable part of a chat prompt, with the user's message last
     """
-    try:
-        # First, get the business environment analysis
-        analysis_result = analyze_business_environment(city_name, country_code)
-        
-        if analysis_result.get("error"):
-            return {
-                "error": analysis_result["error"],
-                "response": None
-            }
-        
-        # Create a context-aware response with improved prompt
-        context_prompt = f"""You are a business intelligence specialist for {city_name}, {country_code}. Provide direct, professional responses without AI assistant language.
+    history_block = f"{history}\n\n" if history else ""
+    return f"""**LOCATION:** {city_name}, {country_code}
 
 **BUSINESS CONTEXT:**
-{analysis_result['analysis']}
+{analysis}
 
-**USER INQUIRY:** {user_message}
+{history_block}**USER INQUIRY:** {user_message}"""
 
-Provide a concise, professional response (100-150 words) that directly addresses the user's question using the business analysis above. If the question is outside the analysis scope, provide relevant business insights about {city_name}. Write in a professional tone suitable for business communications."""
-        
-        response = client.responses.create(
-            model="gpt-4.1",
-            input=context_prompt
-        )
+def get_chat_response(user_message, city_name, country_code, session_id=None):
+    """
+    Get a chat response from ChatGPT about the business environment.
+    Turns are kept in a server-side session: the first turn sends the full
+    analysis context, later turns send only the new message chained to the
+    previous response. The chain is rebuilt from the analysis and a summarized
+    history when it gets long or cannot be continued.
+    """
+    session = chat_sessions.get_or_create(session_id, city_name, country_code)
+    try:
+        with session.lock:
+            # First, get the business environment analysis (once per session)
+            if session.analysis is None:
+                analysis_result = analyze_business_environment(city_name, country_code)
+                
+                if analysis_result.get("error"):
+                    return {
+                        "error": analysis_result["error"],
+                        "response": None,
+                        "retry_after": analysis_result.get("retry_after"),
+                        "session_id": session.session_id
+                    }
+                session.analysis = analysis_result['analysis']
+            
+            response = None
+            if session.previous_response_id:
+                # Incremental turn: only the new message, chained to the previous response
+                try:
+                    response = model_router.call(
+                        "chat",
+                        create_response,
+                        instructions=CHAT_INSTRUCTIONS,
+                        input=f"**USER INQUIRY:** {user_message}",
+                        previous_response_id=session.previous_response_id
+                    )
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    print(f"[ChatGPT Chat] ⚠️ Could not continue response chain ({e}), rebuilding context")
+                    session.reset_chain()
+            
+            if response is None:
+                # Create a context-aware response: static instructions first, then the
+                # per-city analysis, the conversation so far, and the user's message last
+                context_input = create_chat_input(
+                    session.analysis, user_message, city_name, country_code, history=session.history_text()
+                )
+                response = model_router.call(
+                    "chat",
+                    create_response,
+                    instructions=CHAT_INSTRUCTIONS,
+                    input=context_input
+                )
+            
+            session.add_turn(user_message, response.output_text, getattr(response, 'id', None))
         
         return {
             "success": True,
             "response": response.output_text,
-            "analysis": analysis_result['analysis']
+            "analysis": session.analysis,
+            "session_id": session.session_id
         }
         
+    except CircuitOpenError as e:
+        return {
+            "error": f"Chat response failed: {str(e)}",
+            "response": None,
+            "retry_after": e.retry_after,
+            "session_id": session.session_id
+        }
     except Exception as e:
         return {
             "error": f"Chat response failed: {str(e)}",
-            "response": None
+            "response": None,
+            "session_id": session.session_id
         }
 
 if __name__ == "__main__":
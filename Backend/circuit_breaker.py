@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+from collections import deque
+
+from retry_policy import classify_error, cut_short_by_caller
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} circuit is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker for one upstream.
+
+    CLOSED: calls pass through; outcomes are kept for `window_seconds`. Once at
+    least `minimum_calls` outcomes are recorded and the failure rate reaches
+    `failure_threshold`, the circuit opens.
+    OPEN: calls fail fast with CircuitOpenError for `open_seconds`.
+    HALF_OPEN: up to `half_open_probes` calls are let through; a success closes
+    the circuit, a failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=0.5, minimum_calls=10, window_seconds=60.0,
+                 open_seconds=30.0, half_open_probes=1, is_failure=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.is_failure = is_failure or (lambda exc: True)
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._outcomes = deque()  # (timestamp, succeeded)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+
+    def _prune(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def _open(self, now):
+        self._state = self.OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        print(f"[CIRCUIT] 🔴 {self.name} circuit opened for {self.open_seconds:.0f}s")
+
+    def retry_after(self):
+        """Seconds until an open circuit admits a probe (0 if not open)."""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def is_open(self):
+        """True while the circuit is open and still cooling down."""
+        return self.retry_after() > 0
+
+    def allow_request(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+                self._state = self.HALF_OPEN
+                self._probes_in_flight = 0
+                print(f"[CIRCUIT] 🟡 {self.name} circuit half-open, probing upstream")
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+                print(f"[CIRCUIT] 🟢 {self.name} circuit closed")
+                return
+            now = time.monotonic()
+            self._outcomes.append((now, True))
+            self._prune(now)
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == self.HALF_OPEN:
+                self._open(now)
+                return
+            if self._state == self.OPEN:
+                return
+            self._outcomes.append((now, False))
+            self._prune(now)
+            if len(self._outcomes) >= self.minimum_calls:
+                failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+                if failures / len(self._outcomes) >= self.failure_threshold:
+                    self._open(now)
+
+    def record_neutral(self):
+        """
+        An admitted call never reached the upstream (e.g. it was rate limited
+        locally): free its half-open probe slot without changing the state.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def call(self, fn, *args, **kwargs):
+        """Call `fn` through the breaker, raising CircuitOpenError while open."""
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self.retry_after())
+        return self.call_admitted(fn, *args, **kwargs)
+
+    def call_admitted(self, fn, *args, **kwargs):
+        """Call `fn` and record its outcome, after allow_request() admitted it."""
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            if cut_short_by_caller(exc):
+                # The caller's own latency budget ran out; it judges that itself
+                self.record_neutral()
+            elif self.is_failure(exc):
+                self.record_failure()
+            else:
+                # Client errors (bad request, auth) say nothing about upstream health
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        """Current state and window counts, for health reporting."""
+        with self._lock:
+            self._prune(time.monotonic())
+            failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+            return {
+                'state': self._state,
+                'calls': len(self._outcomes),
+                'failures': failures,
+            }
+
+
+def _is_upstream_failure(exc):
+    return classify_error(exc)[0]
+
+
+def _breaker_from_env(name, prefix):
+    return CircuitBreaker(
+        name,
+        failure_threshold=float(os.getenv(f'{prefix}_CIRCUIT_FAILURE_RATE', 0.5)),
+        minimum_calls=int(os.getenv(f'{prefix}_CIRCUIT_MIN_CALLS', 10)),
+        window_seconds=float(os.getenv(f'{prefix}_CIRCUIT_WINDOW_SECONDS', 60)),
+        open_seconds=float(os.getenv(f'{prefix}_CIRCUIT_OPEN_SECONDS', 30)),
+        is_failure=_is_upstream_failure,
+    )
+
+
+QLOO_BREAKER = _breaker_from_env('qloo', 'QLOO')
+OPENAI_BREAKER = _breaker_from_env('openai', 'OPENAI')
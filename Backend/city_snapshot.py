@@ -0,0 +1,199 @@
+"""
+Immutable per-city dataset snapshots, shared by every request for a city.
+
+A snapshot holds one (city, country, limit) Qloo fetch together with the
+parsed structures the charts and the analysis summary need (entity lists,
+tag classes, spatial index), built once and read concurrently without locks.
+Snapshots are evicted least-recently-used once their estimated memory
+exceeds CITY_SNAPSHOT_BUDGET_MB, and expire with the Qloo cache TTL.
+"""
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+from response_cache import make_key, QLOO_CACHE_TTL
+from tag_taxonomy import tag_classifier
+from geo_index import build_index
+
+# --- Snapshot Store Configuration ---
+CITY_SNAPSHOT_BUDGET_MB = float(os.getenv('CITY_SNAPSHOT_BUDGET_MB', 64))
+CITY_SNAPSHOT_TTL = float(os.getenv('CITY_SNAPSHOT_TTL', QLOO_CACHE_TTL))
+
+
+def estimate_size(value):
+    """Approximate in-memory size of a parsed JSON value, in bytes."""
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return size
+
+
+def _entities(raw):
+    return tuple((raw or {}).get('results', {}).get('entities', []))
+
+
+class CitySnapshot:
+    """
+    Read-only view of one city's Qloo data. The raw responses are shared, not
+    copied: consumers must treat them (and everything below) as immutable.
+    """
+
+    def __init__(self, city_name, country_code, limit, raw_brands, raw_places, place_classes=None):
+        self.city_name = city_name
+        self.country_code = country_code
+        self.limit = limit
+        self.key = make_key(city_name, country_code, limit)
+        self.brands_data = raw_brands
+        self.places_data = raw_places
+        self.brands = _entities(raw_brands)
+        self.places = _entities(raw_places)
+        self.stale = bool((raw_brands or {}).get('stale') or (raw_places or {}).get('stale'))
+        self.partial = bool((raw_brands or {}).get('partial') or (raw_places or {}).get('partial'))
+        self.complete = bool(raw_brands and raw_places)
+
+        # Derived structures, computed up front so readers never race to build them
+        if place_classes is None:
+            place_classes = (tag_classifier.classify_entity(place) for place in self.places)
+        self.place_classes = tuple(place_classes)
+        self.geo_index = build_index(raw_places)
+
+        self.nbytes = estimate_size(raw_brands) + estimate_size(raw_places)
+        self.created = time.monotonic()
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f"CitySnapshot is immutable (tried to set '{name}')")
+        super().__setattr__(name, value)
+
+    @property
+    def city_data(self):
+        """The (raw_brands, raw_places) pair, as returned by fetch_city_data."""
+        return self.brands_data, self.places_data
+
+
+class _PendingBuild:
+    def __init__(self):
+        self.done = threading.Event()
+        self.snapshot = None
+        self.error = None
+
+
+class CitySnapshotStore:
+    """
+    LRU store of city snapshots under a memory budget. Concurrent requests
+    for a city that is not loaded share a single fetch and build.
+    """
+
+    def __init__(self, max_bytes=CITY_SNAPSHOT_BUDGET_MB * 1024 * 1024, ttl=CITY_SNAPSHOT_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._snapshots = OrderedDict()
+        self._pending = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'shared_builds': 0, 'evictions': 0}
+
+    def _remove(self, key):
+        snapshot = self._snapshots.pop(key)
+        self._bytes -= snapshot.nbytes
+
+    def get(self, city_name, country_code, limit):
+        """Fresh snapshot of a city, or None."""
+        key = make_key(city_name, country_code, limit)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and time.monotonic() - snapshot.created > self.ttl:
+                self._remove(key)
+                snapshot = None
+            if snapshot is None:
+                self._stats['misses'] += 1
+                return None
+            self._snapshots.move_to_end(key)
+            self._stats['hits'] += 1
+            return snapshot
+
+    def publish(self, city_name, country_code, limit, raw_brands, raw_places, place_classes=None):
+        """
+        Build a snapshot from fetched data and store it. Snapshots of stale
+        data, of responses that lost pages (`partial`) or missing one of the
+        two queries, and snapshots larger than the whole budget, are returned
+        without being stored, so the next request fetches again.
+        `place_classes` reuses tag classes computed while the places streamed in.
+        """
+        snapshot = CitySnapshot(city_name, country_code, limit, raw_brands, raw_places, place_classes)
+        if snapshot.stale or snapshot.partial or not snapshot.complete or snapshot.nbytes > self.max_bytes:
+            return snapshot
+        with self._lock:
+            if snapshot.key in self._snapshots:
+                self._remove(snapshot.key)
+            self._snapshots[snapshot.key] = snapshot
+            self._bytes += snapshot.nbytes
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._snapshots)))
+                self._stats['evictions'] += 1
+        print(f"[SNAPSHOT] 📦 Stored {city_name}, {country_code} (limit {limit}): "
+              f"{len(snapshot.brands)} brands, {len(snapshot.places)} places, ~{snapshot.nbytes // 1024} KB")
+        return snapshot
+
+    def get_or_build(self, city_name, country_code, limit, fetch):
+        """
+        Snapshot of a city, calling `fetch()` -> (raw_brands, raw_places) when it
+        is not loaded. Callers arriving while a build is running wait for it.
+        """
+        snapshot = self.get(city_name, country_code, limit)
+        if snapshot is not None:
+            return snapshot
+
+        key = make_key(city_name, country_code, limit)
+        with self._lock:
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _PendingBuild()
+            else:
+                self._stats['shared_builds'] += 1
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.snapshot
+
+        try:
+            raw_brands, raw_places = fetch()
+            pending.snapshot = self.publish(city_name, country_code, limit, raw_brands, raw_places)
+            return pending.snapshot
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.done.set()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                cities=len(self._snapshots),
+                bytes=self._bytes,
+                budget_bytes=int(self.max_bytes),
+                building=len(self._pending),
+            )
+
+
+city_snapshots = CitySnapshotStore()
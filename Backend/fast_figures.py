@@ -0,0 +1,114 @@
+"""
+Validation-free stand-ins for the parts of plotly.graph_objects used by
+QlooVisualizer (Figure, Bar, Pie, Scatter, Histogram).
+
+Traces and layouts are plain dicts, so no property validators run while a
+chart is built. Figure.to_json() emits JSON equivalent to go.Figure.to_json()
+(default template, expanded titles and colorscales, numeric arrays as typed
+arrays), without the per-property type coercion.
+"""
+import plotly.io as pio
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+from _plotly_utils.basevalidators import ColorscaleValidator
+
+try:
+    from _plotly_utils.utils import convert_to_base64
+except ImportError:  # plotly < 6 sends arrays as plain lists
+    convert_to_base64 = None
+
+_templates = {}
+_colorscales = {}
+
+
+def default_template():
+    """Layout template go.Figure would embed (computed once per template name)."""
+    name = pio.templates.default
+    if name not in _templates:
+        _templates[name] = go.Figure().to_dict()['layout'].get('template')
+    return _templates[name]
+
+
+def named_colorscale(name):
+    """Expand a named colorscale ('Viridis') to its [[position, color], ...] list."""
+    if name not in _colorscales:
+        coerced = ColorscaleValidator('colorscale', 'marker').validate_coerce(name)
+        _colorscales[name] = [list(step) for step in coerced]
+    return _colorscales[name]
+
+
+def _clean(value):
+    """
+    Drop None properties and expand `title="..."` and named colorscales the
+    way the graph_objects validators do.
+    """
+    if isinstance(value, dict):
+        cleaned = {}
+        for key, item in value.items():
+            if item is None:
+                continue
+            if key == 'title' and isinstance(item, str):
+                item = {'text': item}
+            elif key == 'colorscale' and isinstance(item, str):
+                item = named_colorscale(item)
+            cleaned[key] = _clean(item)
+        return cleaned
+    if isinstance(value, tuple):
+        return [_clean(item) for item in value]
+    return value
+
+
+def _merge(target, updates):
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+def _trace(trace_type):
+    def build(**kwargs):
+        return dict(_clean(kwargs), type=trace_type)
+    build.__name__ = trace_type.capitalize()
+    return build
+
+
+Bar = _trace('bar')
+Pie = _trace('pie')
+Scatter = _trace('scatter')
+Histogram = _trace('histogram')
+
+
+class Figure:
+    """Minimal go.Figure look-alike: add_trace, update_layout, to_dict, to_json."""
+
+    def __init__(self, data=None, layout=None):
+        if isinstance(data, dict):
+            data = [data]
+        self.data = list(data or [])
+        self.layout = _clean(layout or {})
+
+    def add_trace(self, trace):
+        self.data.append(trace)
+        return self
+
+    def update_layout(self, dict1=None, **kwargs):
+        _merge(self.layout, _clean(dict(dict1 or {}, **kwargs)))
+        return self
+
+    def to_dict(self):
+        layout = dict(self.layout)
+        template = default_template()
+        if template is not None and 'template' not in layout:
+            layout = dict(template=template, **layout)
+        figure = {'data': [dict(trace) for trace in self.data], 'layout': layout}
+        if convert_to_base64 is not None:
+            convert_to_base64(figure)
+        return figure
+
+    def to_plotly_json(self):
+        return self.to_dict()
+
+    def to_json(self):
+        return to_json_plotly(self.to_dict())
@@ -0,0 +1,173 @@
+"""
+Spatial index of a city's places, built from the coordinates Qloo returns.
+
+Places are bucketed into a fixed lat/lon grid (GEO_CELL_DEGREES per cell), so
+a viewport query only visits the cells it overlaps. Small viewports return the
+individual places; crowded ones return grid aggregates (count and mean rating
+per cell), so map panning never ships every point.
+"""
+import os
+import math
+
+import numpy as np
+
+import aggregations
+from response_cache import ResponseCache, QLOO_CACHE_TTL
+from projection import declare_fields
+
+# --- Geo Index Configuration ---
+GEO_CELL_DEGREES = float(os.getenv('GEO_CELL_DEGREES', 0.01))  # ~1 km of latitude
+GEO_MAX_POINTS = int(os.getenv('GEO_MAX_POINTS', 500))  # above this, viewports are aggregated
+GEO_VIEWPORT_BINS = int(os.getenv('GEO_VIEWPORT_BINS', 32))
+
+# Entity fields read by the index; see projection.py
+declare_fields('place', 'geo_index', [
+    'name', 'tags.name', 'properties.business_rating', 'properties.geocode', 'location.lat', 'location.lon',
+    'location.lng', 'location.latitude', 'location.longitude'
+])
+
+
+def extract_coordinates(entity):
+    """(lat, lon) of a Qloo entity, or None when it has no usable location."""
+    location = entity.get('location') or entity.get('properties', {}).get('geocode') or {}
+    lat = location.get('lat', location.get('latitude'))
+    lon = location.get('lon', location.get('lng', location.get('longitude')))
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):  # Also rejects NaN
+        return None
+    return lat, lon
+
+
+def _rating(entity):
+    try:
+        return float(entity.get('properties', {}).get('business_rating'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _category(entity):
+    tags = entity.get('tags', [])
+    return tags[0].get('name', 'Other') if tags else 'Other'
+
+
+class GeoGridIndex:
+    """Fixed-grid index over the located places of one city."""
+
+    def __init__(self, entities, cell_degrees=GEO_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.names, self.categories, lats, lons, ratings = [], [], [], [], []
+        for entity in entities:
+            coordinates = extract_coordinates(entity)
+            if coordinates is None:
+                continue
+            lats.append(coordinates[0])
+            lons.append(coordinates[1])
+            ratings.append(_rating(entity))
+            self.names.append(entity.get('name', 'Unknown'))
+            self.categories.append(_category(entity))
+        self.unlocated = len(entities) - len(lats)
+        self.lat = np.array(lats, dtype=float)
+        self.lon = np.array(lons, dtype=float)
+        self.rating = aggregations.as_float_array(ratings)
+
+        # Bucket point indices by grid cell in one sort
+        rows = np.floor(self.lat / cell_degrees).astype(np.int64)
+        cols = np.floor(self.lon / cell_degrees).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        self.cells = {}
+        if order.size:
+            keys = np.column_stack([rows[order], cols[order]])
+            starts = np.flatnonzero(np.any(np.diff(keys, axis=0), axis=1)) + 1
+            for group in np.split(order, starts):
+                self.cells[(int(rows[group[0]]), int(cols[group[0]]))] = group
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def bounds(self):
+        """(south, west, north, east) of the located places, or None when there are none."""
+        if not len(self):
+            return None
+        return float(self.lat.min()), float(self.lon.min()), float(self.lat.max()), float(self.lon.max())
+
+    def viewport(self, south, west, north, east):
+        """Indices of the places inside a viewport; west > east crosses the antimeridian."""
+        if west > east:
+            return np.union1d(self.viewport(south, west, north, 180.0), self.viewport(south, -180.0, north, east))
+        row_range = range(math.floor(south / self.cell_degrees), math.floor(north / self.cell_degrees) + 1)
+        col_range = range(math.floor(west / self.cell_degrees), math.floor(east / self.cell_degrees) + 1)
+        if len(row_range) * len(col_range) > len(self.cells):
+            groups = [group for (row, col), group in self.cells.items() if row in row_range and col in col_range]
+        else:
+            groups = [self.cells[(row, col)] for row in row_range for col in col_range if (row, col) in self.cells]
+        if not groups:
+            return np.array([], dtype=np.intp)
+        candidates = np.sort(np.concatenate(groups))
+        inside = ((self.lat[candidates] >= south) & (self.lat[candidates] <= north)
+                  & (self.lon[candidates] >= west) & (self.lon[candidates] <= east))
+        return candidates[inside]
+
+    def points(self, indices):
+        return [
+            {
+                'name': self.names[i],
+                'category': self.categories[i],
+                'lat': float(self.lat[i]),
+                'lon': float(self.lon[i]),
+                'rating': None if np.isnan(self.rating[i]) else float(self.rating[i]),
+            }
+            for i in indices
+        ]
+
+    def density(self, indices, south, west, north, east, bins=GEO_VIEWPORT_BINS):
+        """Count and mean rating per non-empty cell of a bins x bins grid over the viewport."""
+        lons = self.lon[indices]
+        if west > east:  # Unwrap the antimeridian so the grid is contiguous
+            lons = np.where(lons < west, lons + 360.0, lons)
+            east += 360.0
+        lon_centers, lat_centers, counts, mean_ratings = aggregations.grid_bin(
+            lons, self.lat[indices], weights=self.rating[indices],
+            bins=[aggregations.grid_edges(west, east, bins), aggregations.grid_edges(south, north, bins)]
+        )
+        return [
+            {
+                'lat': round(float(lat), 6),
+                'lon': round(float((lon + 180.0) % 360.0 - 180.0), 6),
+                'count': int(count),
+                'avg_rating': round(float(rating), 2),
+            }
+            for lat, lon, count, rating in zip(lat_centers, lon_centers, counts, mean_ratings)
+        ]
+
+    def query(self, south=None, west=None, north=None, east=None, max_points=GEO_MAX_POINTS,
+              bins=GEO_VIEWPORT_BINS):
+        """
+        Places in a viewport (default: all of them) as individual `points`, or
+        as `cells` aggregates when there are more than `max_points`.
+        """
+        if south is None or west is None or north is None or east is None:
+            south, west, north, east = self.bounds or (0.0, 0.0, 0.0, 0.0)
+        indices = self.viewport(south, west, north, east)
+        result = {'count': int(indices.size), 'bounds': [south, west, north, east]}
+        if indices.size <= max_points:
+            result.update(mode='points', points=self.points(indices))
+        else:
+            result.update(mode='cells', cells=self.density(indices, south, west, north, east, bins))
+        return result
+
+    def snapshot(self):
+        return {'places': len(self), 'unlocated': self.unlocated, 'cells': len(self.cells)}
+
+
+def build_index(raw_places):
+    """GeoGridIndex of a Qloo places response (empty when there is no data)."""
+    entities = (raw_places or {}).get('results', {}).get('entities', [])
+    return GeoGridIndex(entities)
+
+
+# Indexes per (city, country, limit), refreshed with the Qloo data they are built from
+geo_index_cache = ResponseCache('geo_index', QLOO_CACHE_TTL, max_entries=int(os.getenv('GEO_INDEX_CACHE_SIZE', 128)))
@@ -0,0 +1,205 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+# --- LLM Cache Configuration ---
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'geotaste_llm_cache.sqlite3'))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', 86400))
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+
+
+def prompt_hash(prompt):
+    """SHA-256 of a prompt (a string, or any JSON-serializable message list)."""
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt, sort_keys=True, default=str)
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+class CachedUsage:
+    def __init__(self, input_tokens, output_tokens):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.total_tokens = input_tokens + output_tokens
+
+
+class CachedResponse:
+    """
+    Stand-in for an OpenAI response served from the cache. `id` is the id of
+    the original response, so a chat turn served from the cache can still be
+    chained with previous_response_id.
+    """
+
+    def __init__(self, output_text, input_tokens, output_tokens, id=None):
+        self.id = id
+        self.output_text = output_text
+        self.usage = CachedUsage(input_tokens, output_tokens)
+        self.status = 'completed'
+        self.cached = True
+
+
+class LLMResponseCache:
+    """
+    Exact-match cache of model outputs keyed by (model, hash of prompt),
+    persisted in a local SQLite file so it survives restarts and is shared by
+    worker processes. Only completed responses are stored, together with the
+    upstream response id so cached chat turns can be chained. Entries expire
+    after `ttl`; when the stored text exceeds `max_bytes`, expired and then
+    least recently used entries are evicted. The stored size is kept in a
+    one-row table by triggers, so checking it is a single-row read.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES, enabled=LLM_CACHE_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0,
+                       'input_tokens_saved': 0, 'output_tokens_saved': 0, 'latency_saved_seconds': 0.0}
+        if not enabled:
+            return
+        try:
+            self._connection().executescript(
+                "BEGIN IMMEDIATE;"
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, model TEXT, output_text TEXT, input_tokens INTEGER, output_tokens INTEGER, "
+                "latency REAL, size INTEGER, created REAL, last_access REAL, response_id TEXT);"
+                "CREATE TABLE IF NOT EXISTS llm_cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER);"
+                "INSERT OR IGNORE INTO llm_cache_size VALUES (0, (SELECT COALESCE(SUM(size), 0) FROM llm_cache));"
+                "CREATE TRIGGER IF NOT EXISTS llm_cache_added AFTER INSERT ON llm_cache BEGIN "
+                "UPDATE llm_cache_size SET total = total + NEW.size WHERE id = 0; END;"
+                "CREATE TRIGGER IF NOT EXISTS llm_cache_removed AFTER DELETE ON llm_cache BEGIN "
+                "UPDATE llm_cache_size SET total = total - OLD.size WHERE id = 0; END;"
+                "COMMIT;"
+            )
+            self._add_response_id_column()
+        except sqlite3.Error as e:
+            print(f"[LLM CACHE] ⚠️ Cache store {path} unavailable ({e}); caching disabled")
+            self.enabled = False
+
+    def _add_response_id_column(self):
+        """Stores created before response ids were cached get the column added"""
+        conn = self._connection()
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(llm_cache)")]
+        if 'response_id' not in columns:
+            try:
+                conn.execute("ALTER TABLE llm_cache ADD COLUMN response_id TEXT")
+            except sqlite3.OperationalError as e:
+                if 'duplicate column' not in str(e):  # Another process migrated it first
+                    raise
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA recursive_triggers = ON")  # INSERT OR REPLACE fires the delete trigger
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self._stats[name] += value
+
+    def key(self, model, prompt):
+        return f"{model}:{prompt_hash(prompt)}"
+
+    def get(self, model, prompt):
+        """Return a CachedResponse for an identical earlier prompt, or None."""
+        if not self.enabled:
+            return None
+        key = self.key(model, prompt)
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT output_text, input_tokens, output_tokens, latency, created, response_id FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[4] > self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._bump(misses=1)
+                return None
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"[LLM CACHE] ⚠️ Lookup failed: {e}")
+            return None
+
+        output_text, input_tokens, output_tokens, latency, _, response_id = row
+        self._bump(hits=1, input_tokens_saved=input_tokens, output_tokens_saved=output_tokens,
+                   latency_saved_seconds=latency)
+        print(f"[LLM CACHE] ♻️ Hit for {model} ({input_tokens + output_tokens} tokens, {latency:.1f}s saved)")
+        return CachedResponse(output_text, input_tokens, output_tokens, response_id)
+
+    def set(self, model, prompt, response, latency):
+        """Store a completed model response (anything with status, output_text and optional usage and id)."""
+        if not self.enabled or not getattr(response, 'output_text', None):
+            return
+        if getattr(response, 'status', None) != 'completed':
+            return  # Truncated or failed output must not be replayed
+        usage = getattr(response, 'usage', None)
+        input_tokens = getattr(usage, 'input_tokens', 0) or 0
+        output_tokens = getattr(usage, 'output_tokens', 0) or 0
+        output_text = response.output_text
+        size = len(output_text.encode('utf-8'))
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, output_text, input_tokens, output_tokens, latency, "
+                "size, created, last_access, response_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(model, prompt), model, output_text, input_tokens, output_tokens, latency, size, now, now,
+                 getattr(response, 'id', None))
+            )
+            self._bump(stores=1)
+            if self._total_size(conn) > self.max_bytes:
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"[LLM CACHE] ⚠️ Store failed: {e}")
+
+    def _total_size(self, conn):
+        return conn.execute("SELECT total FROM llm_cache_size WHERE id = 0").fetchone()[0]
+
+    def _evict(self, conn, now):
+        expired = conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,)).rowcount
+        total = self._total_size(conn)
+        evicted = max(0, expired)
+        if total > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC").fetchall()
+            doomed = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+            evicted += len(doomed)
+        if evicted:
+            self._bump(evictions=evicted)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['latency_saved_seconds'] = round(stats['latency_saved_seconds'], 2)
+        stats['enabled'] = self.enabled
+        if self.enabled:
+            try:
+                conn = self._connection()
+                entries = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+                size = self._total_size(conn)
+                stats.update(entries=entries, size_bytes=size)
+            except sqlite3.Error:
+                pass
+        return stats
+
+
+llm_cache = LLMResponseCache()
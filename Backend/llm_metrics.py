@@ -0,0 +1,88 @@
+import os
+import json
+import threading
+from collections import deque
+
+# USD per 1M tokens: (input, cached input, output). Override with MODEL_PRICES as JSON.
+MODEL_PRICES = {
+    'gpt-4.1': (2.00, 0.50, 8.00),
+    'gpt-4.1-mini': (0.40, 0.10, 1.60),
+    'gpt-4.1-nano': (0.10, 0.025, 0.40),
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv('MODEL_PRICES', '{}')).items()})
+
+LATENCY_SAMPLES = 200
+
+
+def estimate_cost(model, input_tokens, cached_tokens, output_tokens):
+    """Estimated USD cost of one call (0 for models without a known price)."""
+    input_price, cached_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0, 0.0))
+    uncached = max(0, input_tokens - cached_tokens)
+    return (uncached * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LLMUsageMetrics:
+    """
+    Per-model token, latency and cost accounting from the API usage data,
+    including how many input tokens were served from the provider's prompt
+    prefix cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._latencies = {}
+
+    def record(self, model, response, latency=None):
+        """Record one API response. Returns (input_tokens, cached_tokens, output_tokens)."""
+        usage = getattr(response, 'usage', None)
+        input_tokens = getattr(usage, 'input_tokens', 0) or 0
+        output_tokens = getattr(usage, 'output_tokens', 0) or 0
+        details = getattr(usage, 'input_tokens_details', None)
+        cached_tokens = getattr(details, 'cached_tokens', 0) or 0
+
+        with self._lock:
+            stats = self._models.setdefault(model, {
+                'calls': 0, 'errors': 0, 'input_tokens': 0, 'cached_input_tokens': 0, 'output_tokens': 0,
+                'cost_usd': 0.0,
+            })
+            stats['calls'] += 1
+            stats['input_tokens'] += input_tokens
+            stats['cached_input_tokens'] += cached_tokens
+            stats['output_tokens'] += output_tokens
+            stats['cost_usd'] += estimate_cost(model, input_tokens, cached_tokens, output_tokens)
+            if latency is not None:
+                self._latencies.setdefault(model, deque(maxlen=LATENCY_SAMPLES)).append(latency)
+        return input_tokens, cached_tokens, output_tokens
+
+    def record_error(self, model):
+        with self._lock:
+            stats = self._models.setdefault(model, {
+                'calls': 0, 'errors': 0, 'input_tokens': 0, 'cached_input_tokens': 0, 'output_tokens': 0,
+                'cost_usd': 0.0,
+            })
+            stats['errors'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            models = {model: dict(stats) for model, stats in self._models.items()}
+            latencies = {model: list(samples) for model, samples in self._latencies.items()}
+        for model, stats in models.items():
+            stats['cached_input_ratio'] = (
+                round(stats['cached_input_tokens'] / stats['input_tokens'], 3) if stats['input_tokens'] else 0.0
+            )
+            stats['cost_usd'] = round(stats['cost_usd'], 6)
+            samples = latencies.get(model, [])
+            stats['latency_p50_seconds'] = round(_percentile(samples, 0.5), 3)
+            stats['latency_p95_seconds'] = round(_percentile(samples, 0.95), 3)
+        return models
+
+
+llm_usage = LLMUsageMetrics()
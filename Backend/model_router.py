@@ -0,0 +1,137 @@
+import os
+import time
+import threading
+from collections import deque
+
+from circuit_breaker import CircuitOpenError
+from retry_policy import deadline_scope
+
+# --- Model Routing Configuration ---
+# Short chat replies go to a cheap, fast model; full analyses to gpt-4.1.
+CHAT_MODEL = os.getenv('CHAT_MODEL', 'gpt-4.1-mini')
+CHAT_FALLBACK_MODEL = os.getenv('CHAT_FALLBACK_MODEL', 'gpt-4.1-nano')
+CHAT_LATENCY_BUDGET = float(os.getenv('CHAT_LATENCY_BUDGET', 8))
+ANALYSIS_MODEL = os.getenv('ANALYSIS_MODEL', 'gpt-4.1')
+ANALYSIS_FALLBACK_MODEL = os.getenv('ANALYSIS_FALLBACK_MODEL', 'gpt-4.1-mini')
+ANALYSIS_LATENCY_BUDGET = float(os.getenv('ANALYSIS_LATENCY_BUDGET', 40))
+# Recent calls considered when deciding whether a primary model is healthy:
+# at most ROUTER_WINDOW calls, none older than ROUTER_WINDOW_SECONDS
+ROUTER_WINDOW = int(os.getenv('ROUTER_WINDOW', 20))
+ROUTER_WINDOW_SECONDS = float(os.getenv('ROUTER_WINDOW_SECONDS', 300))
+ROUTER_MIN_SAMPLES = int(os.getenv('ROUTER_MIN_SAMPLES', 5))
+ROUTER_ERROR_RATE = float(os.getenv('ROUTER_ERROR_RATE', 0.3))
+
+
+class ModelRoute:
+    """Primary/fallback model pair for one endpoint, with a latency budget for the primary."""
+
+    def __init__(self, purpose, primary, fallback, latency_budget):
+        self.purpose = purpose
+        self.primary = primary
+        self.fallback = fallback
+        self.latency_budget = latency_budget
+
+
+class ModelRouter:
+    """
+    Picks the model for each LLM call by purpose ("chat", "analysis").
+
+    The primary model gets `latency_budget` seconds; if it times out or errors,
+    the call is re-issued on the faster fallback model. While the primary's
+    recent p90 latency exceeds the budget, or its recent error rate is above
+    ROUTER_ERROR_RATE, calls go straight to the fallback. Outcomes older than
+    `window_seconds` are dropped, so a skipped primary is tried again once its
+    failures have aged out.
+
+    The latency budget is a soft deadline: a primary cut short by it counts
+    against the model here, not against the OpenAI circuit breaker.
+    """
+
+    def __init__(self, routes, window=ROUTER_WINDOW, min_samples=ROUTER_MIN_SAMPLES, error_rate=ROUTER_ERROR_RATE,
+                 window_seconds=ROUTER_WINDOW_SECONDS):
+        self.routes = {route.purpose: route for route in routes}
+        self.window = window
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._outcomes = {}  # model -> deque of (timestamp, latency, succeeded)
+
+    def _prune(self, outcomes, now):
+        while outcomes and now - outcomes[0][0] > self.window_seconds:
+            outcomes.popleft()
+
+    def _record(self, model, latency, succeeded):
+        with self._lock:
+            now = time.monotonic()
+            outcomes = self._outcomes.setdefault(model, deque(maxlen=self.window))
+            outcomes.append((now, latency, succeeded))
+            self._prune(outcomes, now)
+
+    def is_healthy(self, model, latency_budget):
+        with self._lock:
+            outcomes = self._outcomes.get(model, deque())
+            self._prune(outcomes, time.monotonic())
+            outcomes = list(outcomes)
+        if len(outcomes) < self.min_samples:
+            return True
+        failures = sum(1 for _, _, succeeded in outcomes if not succeeded)
+        if failures / len(outcomes) > self.error_rate:
+            return False
+        latencies = sorted(latency for _, latency, succeeded in outcomes if succeeded)
+        return not latencies or latencies[int(0.9 * (len(latencies) - 1))] <= latency_budget
+
+    def models_for(self, purpose):
+        """Models to try, in order, for a purpose."""
+        route = self.routes[purpose]
+        if route.fallback in (None, route.primary):
+            return [route.primary]
+        if not self.is_healthy(route.primary, route.latency_budget):
+            print(f"[ROUTER] 🔀 {route.primary} is slow or failing, routing {purpose} to {route.fallback}")
+            return [route.fallback]
+        return [route.primary, route.fallback]
+
+    def call(self, purpose, create, **kwargs):
+        """
+        Run `create(model=..., **kwargs)` on the routed model(s).
+        Returns the response of the first model that succeeds.
+        """
+        route = self.routes[purpose]
+        models = self.models_for(purpose)
+        for index, model in enumerate(models):
+            is_last = index == len(models) - 1
+            started = time.monotonic()
+            try:
+                if is_last:
+                    response = create(model=model, **kwargs)
+                else:
+                    with deadline_scope(route.latency_budget, soft=True):
+                        response = create(model=model, **kwargs)
+            except CircuitOpenError:
+                raise  # The whole upstream is down; another model will not help
+            except Exception as e:
+                self._record(model, time.monotonic() - started, False)
+                if is_last:
+                    raise
+                print(f"[ROUTER] ⚠️ {model} failed for {purpose} ({e}), falling back to {models[index + 1]}")
+                continue
+            if not getattr(response, 'cached', False):
+                self._record(model, time.monotonic() - started, True)
+            return response
+
+    def snapshot(self):
+        return {
+            purpose: {
+                'primary': route.primary,
+                'fallback': route.fallback,
+                'latency_budget_seconds': route.latency_budget,
+                'primary_healthy': self.is_healthy(route.primary, route.latency_budget),
+            }
+            for purpose, route in self.routes.items()
+        }
+
+
+model_router = ModelRouter([
+    ModelRoute('chat', CHAT_MODEL, CHAT_FALLBACK_MODEL, CHAT_LATENCY_BUDGET),
+    ModelRoute('analysis', ANALYSIS_MODEL, ANALYSIS_FALLBACK_MODEL, ANALYSIS_LATENCY_BUDGET),
+])
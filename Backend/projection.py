@@ -0,0 +1,94 @@
+"""
+Ingest-time field projection for Qloo insights responses.
+
+Each consumer declares the entity fields it reads as dotted paths
+('properties.business_rating'; list items share the path of their list, so
+'tags.name' keeps the name of every tag). Responses are trimmed to the union
+of the declared fields before they are cached, so a cached city holds only
+what is read. Declare fields at import time, before the first fetch.
+
+Set QLOO_PROJECTION=false, or fetch inside `raw_responses()`, to keep the
+full responses for debugging.
+"""
+import os
+import threading
+import contextlib
+import contextvars
+
+QLOO_PROJECTION = os.getenv('QLOO_PROJECTION', 'true').lower() == 'true'
+
+# Pseudo entity type for the response's `query` section
+QUERY = 'query'
+
+_declared = {}  # entity type -> {consumer: paths}
+_trees = {}
+_lock = threading.Lock()
+_raw = contextvars.ContextVar('qloo_raw_responses', default=False)
+
+
+def declare_fields(entity_type, consumer, paths):
+    """Register the fields `consumer` reads from entities of `entity_type` ('brand', 'place' or QUERY)."""
+    with _lock:
+        _declared.setdefault(entity_type, {})[consumer] = tuple(paths)
+        _trees.pop(entity_type, None)
+
+
+def field_tree(entity_type):
+    """Nested dict of the declared paths of an entity type; True marks a kept leaf."""
+    with _lock:
+        tree = _trees.get(entity_type)
+        if tree is None:
+            tree = {}
+            for paths in _declared.get(entity_type, {}).values():
+                for path in paths:
+                    node = tree
+                    *parents, leaf = path.split('.')
+                    for part in parents:
+                        child = node.get(part)
+                        if child is True:
+                            break
+                        node = node.setdefault(part, {})
+                    else:
+                        node[leaf] = True
+            _trees[entity_type] = tree
+        return tree
+
+
+def project(value, tree):
+    """Copy of `value` with only the fields in `tree`; lists are projected item by item."""
+    if tree is True:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def projection_enabled():
+    return QLOO_PROJECTION and not _raw.get()
+
+
+@contextlib.contextmanager
+def raw_responses():
+    """Fetch full, unprojected responses inside this block (cached separately)."""
+    token = _raw.set(True)
+    try:
+        yield
+    finally:
+        _raw.reset(token)
+
+
+def project_response(data, entity_type):
+    """Projected copy of an insights response for `entity_type`, or `data` itself when disabled."""
+    if not projection_enabled() or not isinstance(data, dict) or not _declared.get(entity_type):
+        return data
+    projected = {key: value for key, value in data.items() if key not in ('query', 'results')}
+    if 'query' in data:
+        projected['query'] = project(data['query'], field_tree(QUERY))
+    if isinstance(data.get('results'), dict):
+        results = dict(data['results'])
+        if isinstance(results.get('entities'), list):
+            results['entities'] = project(results['entities'], field_tree(entity_type))
+        projected['results'] = results
+    return projected
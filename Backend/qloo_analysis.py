@@ -1,251 +1,436 @@
-import requests
-import os
-import json
-import time
-
-# --- Qloo API Configuration ---
-API_KEY = os.getenv('QLOO_API_KEY', 'rZ4JDgPEmJBGYuLtY233M_l0Jxm0QdLXFs6N-6XYaA0') # Ensure this is your actual Qloo API Key
-URL = "https://hackathon.api.qloo.com/v2/insights"
-
-headers = {
-    "accept": "application/json",
-    "X-Api-Key": API_KEY
-}
-
-# --- Helper Function for Qloo API Request ---
-def get_brands(city_name, country_code, limit, signal_tags=None, signal_weight=1.0):
-    """
-    Helper function to make the API request.
-    """
-    params = {
-        "filter.type": "urn:entity:brand",
-        "filter.location.query": city_name,
-        "filter.geocode.country_code": country_code,
-        "take": limit,
-    }
-    if signal_tags:
-        if isinstance(signal_tags, str) and ',' in signal_tags:
-            params["signal.interests.tags"] = signal_tags.split(',')
-        else:
-            params["signal.interests.tags"] = signal_tags
-        params["signal.interests.tags.weight"] = signal_weight
-
-    print(f"[QLOO] 🔍 Fetching brands for: {city_name}, {country_code}, limit: {limit}")
-    print(f"[QLOO] 📡 API params: {params}")
-
-    try:
-        response = requests.get(URL, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Debug: Check what we got back
-        if data and 'results' in data and 'entities' in data['results']:
-            brand_names = [brand.get('name', 'Unknown') for brand in data['results']['entities'][:3]]
-            print(f"[QLOO] ✅ Brands API response: {len(data['results']['entities'])} brands")
-            print(f"[QLOO] 📊 First 3 brands: {brand_names}")
-        else:
-            print(f"[QLOO] ⚠️ No valid brands in API response")
-            print(f"[QLOO] 📄 Raw response: {data}")
-        
-        return data
-    except requests.exceptions.RequestException as e:
-        print(f"[QLOO] ❌ Error making Qloo API request: {e}")
-        return None
-    except json.JSONDecodeError:
-        print(f"[QLOO] ❌ Error decoding JSON from Qloo API response: {response.text}")
-        return None
-
-# (get_places function remains the same, so it's omitted for brevity)
-def get_places(city_name, country_code, limit, signal_tags=None, signal_weight=1.0, max_retries=3):
-    """
-    Helper function to make the Qloo API request with basic retry logic.
-    """
-    params = {
-        "filter.type": "urn:entity:place",
-        "filter.location.query": city_name,
-        "filter.geocode.country_code": country_code,
-        "take": limit,
-    }
-    if signal_tags:
-        if isinstance(signal_tags, str) and ',' in signal_tags:
-            params["signal.interests.tags"] = signal_tags.split(',')
-        else:
-            params["signal.interests.tags"] = signal_tags
-        params["signal.interests.tags.weight"] = signal_weight
-    else:
-        params.pop("signal.interests.tags", None)
-        params.pop("signal.interests.tags.weight", None)
-
-    print(f"[QLOO] 🔍 Fetching places for: {city_name}, {country_code}, limit: {limit}")
-    print(f"[QLOO] 📡 API params: {params}")
-
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(URL, headers=headers, params=params)
-            response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
-            data = response.json()
-            
-            # Debug: Check what we got back
-            if data and 'results' in data and 'entities' in data['results']:
-                place_names = [place.get('name', 'Unknown') for place in data['results']['entities'][:3]]
-                print(f"[QLOO] ✅ Places API response: {len(data['results']['entities'])} places")
-                print(f"[QLOO] 🏢 First 3 places: {place_names}")
-            else:
-                print(f"[QLOO] ⚠️ No valid places in API response")
-                print(f"[QLOO] 📄 Raw response: {data}")
-            
-            return data
-        except requests.exceptions.HTTPError as http_err:
-            print(f"[QLOO] ❌ HTTP error occurred during Qloo API request (Attempt {attempt+1}/{max_retries}): {http_err} - Status Code: {response.status_code}")
-            if response.status_code == 401 or response.status_code == 403:
-                print("[QLOO] 🔐 Authentication error (401/403). Please check your QLOO_API_KEY.")
-                return None # Don't retry on auth errors
-            if attempt < max_retries - 1:
-                sleep_time = 2 ** attempt # Exponential backoff
-                print(f"[QLOO] ⏳ Retrying in {sleep_time} seconds...")
-                time.sleep(sleep_time)
-            else:
-                print("[QLOO] ❌ Max retries reached for Qloo API request.")
-                return None
-        except requests.exceptions.RequestException as req_err:
-            print(f"[QLOO] ❌ Network/Request error occurred during Qloo API request (Attempt {attempt+1}/{max_retries}): {req_err}")
-            if attempt < max_retries - 1:
-                sleep_time = 2 ** attempt
-                print(f"[QLOO] ⏳ Retrying in {sleep_time} seconds...")
-                time.sleep(sleep_time)
-            else:
-                print("[QLOO] ❌ Max retries reached for Qloo API request.")
-                return None
-        except json.JSONDecodeError:
-            print(f"[QLOO] ❌ Error decoding JSON from Qloo API response (Attempt {attempt+1}/{max_retries}). Response text: {response.text}")
-            if attempt < max_retries - 1:
-                sleep_time = 2 ** attempt
-                print(f"[QLOO] ⏳ Retrying in {sleep_time} seconds...")
-                time.sleep(sleep_time)
-            else:
-                print("[QLOO] ❌ Max retries reached for Qloo API request.")
-                return None
-    return None # Return None if all retries fail
-    
-def format_brands_output(api_data):
-    """
-    Formats the JSON response from the get_brands function into a readable string.
-    This version is updated to handle the new API response structure.
-    """
-    if not api_data:
-        return "API response is empty."
-
-    # Safely get the list of entities from response['results']['entities']
-    # .get('results', {}) returns an empty dict if 'results' is not found
-    entities_list = api_data.get('results', {}).get('entities')
-
-    # Check if the entities list exists and is not empty
-    if not entities_list:
-        return "No brand data found in the API response."
-
-    output_parts = []
-    
-    # Try to create a header with the location name from the response
-    try:
-        # The location info is in the same place as before
-        location_info = api_data['query']['localities']['filter'][0]
-        location_name = location_info.get('name', 'Unknown Location')
-        header = f"===== Brand Recommendations for {location_name} ====="
-        output_parts.append(header)
-    except (KeyError, IndexError, TypeError):
-        output_parts.append("===== Brand Recommendations =====")
-
-    # Loop through each brand in the now correctly located entities_list
-    for i, brand in enumerate(entities_list):
-        name = brand.get('name', 'N/A')
-        
-        popularity_score = brand.get('popularity', 0)
-        popularity_percent = f"{popularity_score * 100:.2f}%"
-
-        properties = brand.get('properties', {})
-        description = properties.get('short_description', 'No description available.')
-        image_url = properties.get('image', {}).get('url', 'No image URL.')
-
-        tags_list = brand.get('tags', [])
-        tag_names = [tag.get('name') for tag in tags_list if tag.get('name')]
-        tags_str = ", ".join(tag_names) if tag_names else "No tags"
-
-        brand_str = (
-            f"--- {i+1}. {name} ---\n"
-            f"  - Popularity: {popularity_percent}\n"
-            f"  - Description: {description}\n"
-            f"  - Tags: {tags_str}\n"
-            f"  - Image URL: {image_url}"
-        )
-        output_parts.append(brand_str)
-
-    return "\n\n".join(output_parts)
-
-def get_formatted_place_data(city_name, country_code, limit=20):
-    """
-    Makes a Qloo API call for general 'place' entities and formats their details
-    into a list of strings. Does NOT include per-place LLM insights.
-    """
-    print(f"\n--- Fetching Raw Places for {city_name}, {country_code} (Limit: {limit}) ---")
-
-    data = get_places(city_name, country_code, limit) # Use the new get_places helper
-
-    formatted_outputs = []
-    all_places_raw_data = [] # To store raw data for general LLM call
-
-    if not data or 'results' not in data or 'entities' not in data['results']:
-        formatted_outputs.append(f"No entities found or error in API response for {city_name}, {country_code}. Please check QLOO_API_KEY and try again.")
-        return formatted_outputs, all_places_raw_data
-
-    for entity in data['results']['entities']:
-        all_places_raw_data.append(entity) # Store raw data
-        output_parts = []
-
-        output_parts.append(f"Name: {entity.get('name', 'N/A')}")
-        output_parts.append(f"ID: {entity.get('entity_id', 'N/A')}")
-
-        properties = entity.get('properties', {})
-
-        address = properties.get('address', 'N/A')
-        output_parts.append(f"Address: {address}")
-
-        rating = properties.get('business_rating', 'N/A')
-        output_parts.append(f"Rating: {rating}")
-
-        description = properties.get('description', 'N/A')
-        if description != 'N/A':
-            output_parts.append(f"Description: {description}")
-
-        tags = entity.get('tags', [])
-        if tags:
-            tag_names = [tag.get('name', 'N/A') for tag in tags]
-            tag_ids = [tag.get('id', 'N/A') for tag in tags]
-            output_parts.append(f"Tags (Names): {', '.join(tag_names)}")
-            output_parts.append(f"Tags (IDs): {', '.join(tag_ids)}")
-
-        keywords = properties.get('keywords', [])
-        if keywords:
-            keyword_names = [kw.get('name', 'N/A') for kw in keywords]
-            output_parts.append(f"Keywords: {', '.join(keyword_names)}")
-
-        formatted_outputs.append("\n".join(output_parts))
-        formatted_outputs.append("-" * 30) # Separator
-
-    return formatted_outputs, all_places_raw_data
-    
-# --- Main Execution Block ---
-if __name__ == "__main__":
-    formatted_places, raw_places = get_formatted_place_data("los angeles", "US", limit=5)
-    for place_output in formatted_places:
-        print(place_output)
-
-    # Get brand data for Birmingham
-    # birmingham_data = get_brands("Beijing", "CN", limit=50)
-
-    # # Check if we got data back before trying to format it
-    # if birmingham_data:
-    #     # Use the corrected function to format the output
-    #     formatted_output = format_brands_output(birmingham_data)
-    #     print(formatted_output)
-    # else:
+import requests
+import os
+import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from retry_policy import QLOO_RETRY, DeadlineExceeded
+from circuit_breaker import QLOO_BREAKER, CircuitOpenError
+from response_cache import qloo_cache, make_key
+from rate_limiter import QLOO_LIMITER, RateLimitExceeded
+from projection import declare_fields, project_response, projection_enabled, raw_responses, QUERY
+
+# --- Qloo API Configuration ---
+API_KEY = os.getenv('QLOO_API_KEY', 'rZ4JDgPEmJBGYuLtY233M_l0Jxm0QdLXFs6N-6XYaA0') # Ensure this is your actual Qloo API Key
+URL = "https://hackathon.api.qloo.com/v2/insights"
+
+headers = {
+    "accept": "application/json",
+    "X-Api-Key": API_KEY
+}
+
+# --- Pagination Configuration ---
+# Large `take` values are split into pages of this size and fetched concurrently.
+PAGE_SIZE = int(os.getenv('QLOO_PAGE_SIZE', 50))
+PAGE_WORKERS = int(os.getenv('QLOO_PAGE_WORKERS', 8))
+
+_page_executor = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix="qloo-page")
+
+# Qloo cannot be reached for this request (circuit open, rate limited, out of
+# time). fetch_insights raises these when it has no stale copy to serve, so
+# endpoints can answer 503 with Retry-After instead of an empty result.
+QLOO_UNAVAILABLE_ERRORS = (CircuitOpenError, RateLimitExceeded, DeadlineExceeded)
+
+# Fields read here (page de-duplication, location header); see projection.py
+declare_fields('brand', 'qloo_analysis', ['entity_id'])
+declare_fields('place', 'qloo_analysis', ['entity_id'])
+declare_fields(QUERY, 'qloo_analysis', ['localities.filter.name'])
+
+# --- Helper Functions for Qloo API Request ---
+def build_params(entity_type, city_name, country_code, take, signal_tags=None, signal_weight=1.0, page=None):
+    """
+    Build the insights query parameters for an entity type ("brand", "place", ...).
+    """
+    params = {
+        "filter.type": f"urn:entity:{entity_type}",
+        "filter.location.query": city_name,
+        "filter.geocode.country_code": country_code,
+        "take": take,
+    }
+    if page is not None and page > 1:
+        # Page 1 is the API default; leaving it out keeps single-page queries cache-compatible
+        params["page"] = page
+    if signal_tags:
+        if isinstance(signal_tags, str) and ',' in signal_tags:
+            params["signal.interests.tags"] = signal_tags.split(',')
+        else:
+            params["signal.interests.tags"] = signal_tags
+        params["signal.interests.tags.weight"] = signal_weight
+    return params
+
+def fetch_insights(params, max_retries=None):
+    """
+    Make a single Qloo insights request using the shared retry policy, the
+    client-side rate limiter and the Qloo circuit breaker. `max_retries` overrides the policy's attempt count.
+    Fresh responses are served from the cache; when the upstream fails (or its
+    circuit is open) a stale cached response is returned with `stale: True`.
+    Without a stale copy, QLOO_UNAVAILABLE_ERRORS are re-raised; other
+    failures return None.
+    Responses are projected to the fields their consumers declare (see
+    projection.py) before caching; raw responses are cached under their own key.
+    Returns the decoded JSON response or None on failure.
+    """
+    entity_type = params.get("filter.type", "").rsplit(":", 1)[-1]
+    cache_key = make_key(URL, params) if projection_enabled() else make_key(URL, params, 'raw')
+    cached = qloo_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    def attempt(timeout):
+        response = requests.get(URL, headers=headers, params=params, timeout=timeout)
+        if response.status_code == 429:
+            QLOO_LIMITER.drain() # Make every worker back off, not just this one
+        response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
+        return response.json()
+
+    def limited_attempt(timeout):
+        # Fail fast on an open circuit; only attempts that will go upstream take a token
+        if not QLOO_BREAKER.allow_request():
+            raise CircuitOpenError(QLOO_BREAKER.name, QLOO_BREAKER.retry_after())
+        try:
+            waited = QLOO_LIMITER.acquire()
+        except RateLimitExceeded:
+            QLOO_BREAKER.record_neutral()
+            raise
+        return QLOO_BREAKER.call_admitted(attempt, max(1.0, timeout - waited))
+
+    try:
+        data = project_response(QLOO_RETRY.call(limited_attempt, max_attempts=max_retries), entity_type)
+        qloo_cache.set(cache_key, data)
+        return data
+    except requests.exceptions.HTTPError as http_err:
+        status_code = http_err.response.status_code if http_err.response is not None else None
+        print(f"[QLOO] ❌ HTTP error occurred during Qloo API request: {http_err} - Status Code: {status_code}")
+        if status_code == 401 or status_code == 403:
+            print("[QLOO] 🔐 Authentication error (401/403). Please check your QLOO_API_KEY.")
+            return None # Stale data would hide a configuration problem
+    except json.JSONDecodeError as json_err:
+        print(f"[QLOO] ❌ Error decoding JSON from Qloo API response: {json_err}")
+    except requests.exceptions.RequestException as req_err:
+        print(f"[QLOO] ❌ Network/Request error occurred during Qloo API request: {req_err}")
+    except QLOO_UNAVAILABLE_ERRORS as fast_err:
+        print(f"[QLOO] ⌛ {fast_err}")
+        stale = qloo_cache.get_stale(cache_key)
+        if stale is None:
+            raise
+        print(f"[QLOO] 🕰️ Serving stale cached response")
+        return dict(stale, stale=True)
+
+    stale = qloo_cache.get_stale(cache_key)
+    if stale is not None:
+        print(f"[QLOO] 🕰️ Serving stale cached response")
+        return dict(stale, stale=True)
+    return None # Return None if all retries fail
+
+def _page_entities(data):
+    """Return the entity list of a response page, or None if the page is invalid."""
+    if not data or 'results' not in data or 'entities' not in data['results']:
+        return None
+    return data['results']['entities']
+
+class EntityStream:
+    """
+    Iterator over the entities of a paginated Qloo query.
+
+    All page requests are submitted when the stream is created, so several
+    streams can be in flight at once. Entities are yielded in page order as
+    soon as each page arrives, de-duplicated by `entity_id` and truncated to
+    `limit`. After iteration, `query` holds the `query` section of the first
+    page, `ok` tells whether the first page was fetched successfully,
+    `stale` whether any page was served from the stale cache and `partial`
+    whether a later page was lost (the entities are then truncated).
+    """
+
+    def __init__(self, entity_type, city_name, country_code, limit, signal_tags=None,
+                 signal_weight=1.0, page_size=None, max_retries=None):
+        self.entity_type = entity_type
+        self.limit = int(limit)
+        self.page_size = max(1, int(page_size or PAGE_SIZE))
+        self.query = None
+        self.ok = False
+        self.stale = False
+        self.partial = False
+
+        page_count = max(1, -(-self.limit // self.page_size))
+        take = min(self.limit, self.page_size)
+        print(f"[QLOO] 📑 Fetching {entity_type}s for: {city_name}, {country_code}, limit: {limit} in {page_count} page(s) of {take}")
+        self._futures = [
+            # Each page runs in a copy of the caller's context so it shares the request deadline
+            _page_executor.submit(
+                contextvars.copy_context().run,
+                fetch_insights,
+                build_params(entity_type, city_name, country_code, take, signal_tags, signal_weight, page=page),
+                max_retries,
+            )
+            for page in range(1, page_count + 1)
+        ]
+
+    def __iter__(self):
+        seen_ids = set()
+        yielded = 0
+        for page, future in enumerate(self._futures, start=1):
+            if yielded >= self.limit:
+                future.cancel()
+                continue
+            try:
+                data = future.result()
+            except Exception as e:
+                if page == 1:
+                    self._cancel_from(page)
+                    raise
+                print(f"[QLOO] ⚠️ Page {page} of {self.entity_type}s failed: {e}")
+                self.partial = True
+                continue
+            entities = _page_entities(data)
+            if entities is None:
+                print(f"[QLOO] ⚠️ Page {page} of {self.entity_type}s returned no valid entities")
+                if page == 1:
+                    # Nothing to return; don't leave the other pages running
+                    self._cancel_from(page)
+                    break
+                self.partial = True
+                continue
+            if page == 1:
+                self.ok = True
+                self.query = data.get('query')
+            if data.get('stale'):
+                self.stale = True
+            for entity in entities:
+                entity_id = entity.get('entity_id')
+                if entity_id is not None:
+                    if entity_id in seen_ids:
+                        continue
+                    seen_ids.add(entity_id)
+                yield entity
+                yielded += 1
+                if yielded >= self.limit:
+                    break
+            if len(entities) < self.page_size:
+                # Short page: the upstream has no more results
+                self._cancel_from(page)
+                break
+
+    def cancel(self):
+        """Cancel every page request that has not started yet."""
+        self._cancel_from(0)
+
+    def _cancel_from(self, page):
+        """Cancel the requests of the pages after `page` (1-based)."""
+        for remaining in self._futures[page:]:
+            remaining.cancel()
+
+def assemble_response(stream, on_entity=None):
+    """
+    Drain an EntityStream into the single-response shape returned by the
+    insights API (`{'query': ..., 'results': {'entities': [...]}}`).
+    `on_entity(entity)` is called for each entity as its page arrives, so
+    per-entity work overlaps the pages still in flight.
+    Returns None if the first page could not be fetched; responses missing
+    a later page carry `partial: True`.
+    """
+    entities = []
+    for entity in stream:
+        entities.append(entity)
+        if on_entity is not None:
+            on_entity(entity)
+    if not stream.ok:
+        return None
+    data = {"query": stream.query, "results": {"entities": entities}}
+    if stream.stale:
+        data["stale"] = True
+    if stream.partial:
+        data["partial"] = True
+    return data
+
+def is_degraded(data):
+    """True for responses that must not be cached as fresh results: served stale, or missing pages."""
+    return bool(data) and bool(data.get('stale') or data.get('partial'))
+
+def iter_brands(city_name, country_code, limit, signal_tags=None, signal_weight=1.0, page_size=None):
+    """Start a paginated brand fetch and return its EntityStream."""
+    return EntityStream("brand", city_name, country_code, limit, signal_tags, signal_weight, page_size)
+
+def iter_places(city_name, country_code, limit, signal_tags=None, signal_weight=1.0, page_size=None, max_retries=None):
+    """Start a paginated place fetch and return its EntityStream."""
+    return EntityStream("place", city_name, country_code, limit, signal_tags, signal_weight, page_size, max_retries)
+
+def get_brands(city_name, country_code, limit, signal_tags=None, signal_weight=1.0, paginate=None):
+    """
+    Helper function to make the API request.
+    Takes larger than PAGE_SIZE are fetched as concurrent pages unless `paginate` is False.
+    """
+    if paginate is None:
+        paginate = int(limit) > PAGE_SIZE
+    params = build_params("brand", city_name, country_code, limit, signal_tags, signal_weight)
+
+    print(f"[QLOO] 🔍 Fetching brands for: {city_name}, {country_code}, limit: {limit}")
+    print(f"[QLOO] 📡 API params: {params}")
+
+    if paginate:
+        data = assemble_response(iter_brands(city_name, country_code, limit, signal_tags, signal_weight))
+    else:
+        data = fetch_insights(params)
+
+    # Debug: Check what we got back
+    if data and 'results' in data and 'entities' in data['results']:
+        brand_names = [brand.get('name', 'Unknown') for brand in data['results']['entities'][:3]]
+        print(f"[QLOO] ✅ Brands API response: {len(data['results']['entities'])} brands")
+        print(f"[QLOO] 📊 First 3 brands: {brand_names}")
+    elif data is not None:
+        print(f"[QLOO] ⚠️ No valid brands in API response")
+        print(f"[QLOO] 📄 Raw response: {data}")
+
+    return data
+
+def get_places(city_name, country_code, limit, signal_tags=None, signal_weight=1.0, max_retries=None, paginate=None):
+    """
+    Helper function to make the Qloo API request.
+    Takes larger than PAGE_SIZE are fetched as concurrent pages unless `paginate` is False.
+    """
+    if paginate is None:
+        paginate = int(limit) > PAGE_SIZE
+    params = build_params("place", city_name, country_code, limit, signal_tags, signal_weight)
+
+    print(f"[QLOO] 🔍 Fetching places for: {city_name}, {country_code}, limit: {limit}")
+    print(f"[QLOO] 📡 API params: {params}")
+
+    if paginate:
+        data = assemble_response(iter_places(city_name, country_code, limit, signal_tags, signal_weight, max_retries=max_retries))
+    else:
+        data = fetch_insights(params, max_retries)
+
+    # Debug: Check what we got back
+    if data and 'results' in data and 'entities' in data['results']:
+        place_names = [place.get('name', 'Unknown') for place in data['results']['entities'][:3]]
+        print(f"[QLOO] ✅ Places API response: {len(data['results']['entities'])} places")
+        print(f"[QLOO] 🏢 First 3 places: {place_names}")
+    elif data is not None:
+        print(f"[QLOO] ⚠️ No valid places in API response")
+        print(f"[QLOO] 📄 Raw response: {data}")
+
+    return data
+    
+def format_brands_output(api_data):
+    """
+    Formats the JSON response from the get_brands function into a readable string.
+    This version is updated to handle the new API response structure.
+    Descriptions and image URLs are only present in responses fetched inside
+    projection.raw_responses().
+    """
+    if not api_data:
+        return "API response is empty."
+
+    # Safely get the list of entities from response['results']['entities']
+    # .get('results', {}) returns an empty dict if 'results' is not found
+    entities_list = api_data.get('results', {}).get('entities')
+
+    # Check if the entities list exists and is not empty
+    if not entities_list:
+        return "No brand data found in the API response."
+
+    output_parts = []
+    
+    # Try to create a header with the location name from the response
+    try:
+        # The location info is in the same place as before
+        location_info = api_data['query']['localities']['filter'][0]
+        location_name = location_info.get('name', 'Unknown Location')
+        header = f"===== Brand Recommendations for {location_name} ====="
+        output_parts.append(header)
+    except (KeyError, IndexError, TypeError):
+        output_parts.append("===== Brand Recommendations =====")
+
+    # Loop through each brand in the now correctly located entities_list
+    for i, brand in enumerate(entities_list):
+        name = brand.get('name', 'N/A')
+        
+        popularity_score = brand.get('popularity', 0)
+        popularity_percent = f"{popularity_score * 100:.2f}%"
+
+        properties = brand.get('properties', {})
+        description = properties.get('short_description', 'No description available.')
+        image_url = properties.get('image', {}).get('url', 'No image URL.')
+
+        tags_list = brand.get('tags', [])
+        tag_names = [tag.get('name') for tag in tags_list if tag.get('name')]
+        tags_str = ", ".join(tag_names) if tag_names else "No tags"
+
+        brand_str = (
+            f"--- {i+1}. {name} ---\n"
+            f"  - Popularity: {popularity_percent}\n"
+            f"  - Description: {description}\n"
+            f"  - Tags: {tags_str}\n"
+            f"  - Image URL: {image_url}"
+        )
+        output_parts.append(brand_str)
+
+    return "\n\n".join(output_parts)
+
+def get_formatted_place_data(city_name, country_code, limit=20):
+    """
+    Makes a Qloo API call for general 'place' entities and formats their details
+    into a list of strings. Does NOT include per-place LLM insights.
+    """
+    print(f"\n--- Fetching Raw Places for {city_name}, {country_code} (Limit: {limit}) ---")
+
+    with raw_responses(): # Descriptions and ids are not kept by the default projection
+        data = get_places(city_name, country_code, limit) # Use the new get_places helper
+
+    formatted_outputs = []
+    all_places_raw_data = [] # To store raw data for general LLM call
+
+    if not data or 'results' not in data or 'entities' not in data['results']:
+        formatted_outputs.append(f"No entities found or error in API response for {city_name}, {country_code}. Please check QLOO_API_KEY and try again.")
+        return formatted_outputs, all_places_raw_data
+
+    for entity in data['results']['entities']:
+        all_places_raw_data.append(entity) # Store raw data
+        output_parts = []
+
+        output_parts.append(f"Name: {entity.get('name', 'N/A')}")
+        output_parts.append(f"ID: {entity.get('entity_id', 'N/A')}")
+
+        properties = entity.get('properties', {})
+
+        address = properties.get('address', 'N/A')
+        output_parts.append(f"Address: {address}")
+
+        rating = properties.get('business_rating', 'N/A')
+        output_parts.append(f"Rating: {rating}")
+
+        description = properties.get('description', 'N/A')
+        if description != 'N/A':
+            output_parts.append(f"Description: {description}")
+
+        tags = entity.get('tags', [])
+        if tags:
+            tag_names = [tag.get('name', 'N/A') for tag in tags]
+            tag_ids = [tag.get('id', 'N/A') for tag in tags]
+            output_parts.append(f"Tags (Names): {', '.join(tag_names)}")
+            output_parts.append(f"Tags (IDs): {', '.join(tag_ids)}")
+
+        keywords = properties.get('keywords', [])
+        if keywords:
+            keyword_names = [kw.get('name', 'N/A') for kw in keywords]
+            output_parts.append(f"Keywords: {', '.join(keyword_names)}")
+
+        formatted_outputs.append("\n".join(output_parts))
+        formatted_outputs.append("-" * 30) # Separator
+
+    return formatted_outputs, all_places_raw_data
+    
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    formatted_places, raw_places = get_formatted_place_data("los angeles", "US", limit=5)
+    for place_output in formatted_places:
+        print(place_output)
+
+    # Get brand data for Birmingham
+    # birmingham_data = get_brands("Beijing", "CN", limit=50)
+
+    # # Check if we got data back before trying to format it
+    # if birmingham_data:
+    #     # Use the corrected function to format the output
+    #     formatted_output = format_brands_output(birmingham_data)
+    #     print(formatted_output)
+    # else:
     #     print("Could not retrieve brand data.")
\ No newline at end of file
@@ -0,0 +1,243 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from collections import deque
+
+from retry_policy import remaining_budget
+
+# --- Rate Limit Configuration ---
+QLOO_RATE_LIMIT = float(os.getenv('QLOO_RATE_LIMIT', 5))          # tokens per second
+QLOO_RATE_BURST = float(os.getenv('QLOO_RATE_BURST', 10))         # bucket capacity
+QLOO_RATE_MAX_WAIT = float(os.getenv('QLOO_RATE_MAX_WAIT', 5))    # longest a caller queues
+QLOO_DAILY_QUOTA = int(os.getenv('QLOO_DAILY_QUOTA', 0))          # 0 = unlimited
+RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', os.path.join(tempfile.gettempdir(), 'geotaste_ratelimit.sqlite3'))
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a caller cannot get a token within its bounded wait."""
+
+    def __init__(self, name, retry_after, reason="rate limit"):
+        super().__init__(f"{name} {reason} exceeded, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket shared by all threads and worker processes on this machine.
+
+    The bucket state lives in a small SQLite file (`store_path`) and is updated
+    in an IMMEDIATE transaction, so every process draws from the same budget.
+    Within a process, callers queue in FIFO order; only the head of the queue
+    polls the bucket, outside the queue lock, and nobody waits longer than
+    `max_wait` (or the request deadline). An optional daily quota is accounted
+    in the same store. When the store fails (locked, busy, disk error), the
+    call falls back to a per-process bucket instead of failing the request.
+    """
+
+    def __init__(self, name, rate, capacity, store_path=RATE_LIMIT_STORE, max_wait=5.0, daily_quota=0):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.daily_quota = daily_quota
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._local = threading.local()
+        self._memory_state = {'tokens': capacity, 'updated': time.time(), 'day': None, 'used': 0}
+        self._stats = {'granted': 0, 'rejected': 0, 'wait_seconds': 0.0, 'store_errors': 0}
+
+        self.store_path = store_path
+        try:
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL, updated REAL, day TEXT, used INTEGER)"
+            )
+        except sqlite3.Error as e:
+            print(f"[RATE LIMIT] ⚠️ Shared store {store_path} unavailable ({e}); limiting per process only")
+            self.store_path = None
+
+    # --- Shared store ---
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.store_path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _execute(self, sql, args=()):
+        return self._connection().execute(sql, args)
+
+    def _store_failed(self, error):
+        """A locked, busy or broken store must not fail the request: fall back to this process's bucket."""
+        with self._cond:
+            self._stats['store_errors'] += 1
+        print(f"[RATE LIMIT] ⚠️ Shared store error ({error}); limiting per process for this call")
+
+    def _update_state(self, update):
+        """
+        Run `update(state) -> result` atomically against the shared bucket
+        state, or against the per-process state when the store fails.
+        """
+        if self.store_path is not None:
+            try:
+                return self._update_store(update)
+            except sqlite3.Error as e:
+                self._store_failed(e)
+        with self._cond:
+            return update(self._memory_state)
+
+    def _update_store(self, update):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated, day, used FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            if row is None:
+                state = {'tokens': self.capacity, 'updated': time.time(), 'day': None, 'used': 0}
+            else:
+                state = {'tokens': row[0], 'updated': row[1], 'day': row[2], 'used': row[3]}
+            result = update(state)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated, day, used) VALUES (?, ?, ?, ?, ?)",
+                (self.name, state['tokens'], state['updated'], state['day'], state['used'])
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            raise
+
+    def _read_state(self):
+        """Current bucket state without taking a write lock on the store."""
+        if self.store_path is not None:
+            try:
+                row = self._execute("SELECT tokens, updated, day, used FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            except sqlite3.Error as e:
+                self._store_failed(e)
+            else:
+                if row is None:
+                    return {'tokens': self.capacity, 'updated': time.time(), 'day': None, 'used': 0}
+                return {'tokens': row[0], 'updated': row[1], 'day': row[2], 'used': row[3]}
+        with self._cond:
+            return dict(self._memory_state)
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state['updated'])
+        state['tokens'] = min(self.capacity, state['tokens'] + elapsed * self.rate)
+        state['updated'] = now
+        today = time.strftime('%Y-%m-%d', time.gmtime(now))
+        if state['day'] != today:
+            state['day'] = today
+            state['used'] = 0
+
+    def _try_take(self):
+        """Take a token if available. Returns (wait_seconds, quota_exhausted)."""
+        def take(state):
+            now = time.time()
+            self._refill(state, now)
+            if self.daily_quota and state['used'] >= self.daily_quota:
+                return None, True
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                state['used'] += 1
+                return 0.0, False
+            return (1 - state['tokens']) / self.rate, False
+        return self._update_state(take)
+
+    # --- Public API ---
+    def acquire(self, max_wait=None):
+        """
+        Wait in line for a token. Returns the seconds spent waiting, or raises
+        RateLimitExceeded if no token is available within the bounded wait.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        remaining = remaining_budget()
+        if remaining is not None:
+            max_wait = max(0.0, min(max_wait, remaining))
+
+        started = time.monotonic()
+        give_up_at = started + max_wait
+        ticket = object()
+        with self._cond:
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    while self._queue[0] is not ticket:
+                        now = time.monotonic()
+                        if now >= give_up_at:
+                            self._stats['rejected'] += 1
+                            raise RateLimitExceeded(self.name, 1 / self.rate)
+                        self._cond.wait(give_up_at - now)
+
+                # Head of the line: poll the shared store without holding the
+                # queue lock, so a slow SQLite transaction never blocks the queue
+                wait, quota_exhausted = self._try_take()
+                now = time.monotonic()
+                with self._cond:
+                    if quota_exhausted:
+                        self._stats['rejected'] += 1
+                        raise RateLimitExceeded(self.name, _seconds_until_utc_midnight(), "daily quota")
+                    if wait == 0:
+                        waited = now - started
+                        self._stats['granted'] += 1
+                        self._stats['wait_seconds'] += waited
+                        return waited
+                    if now + wait > give_up_at:
+                        self._stats['rejected'] += 1
+                        raise RateLimitExceeded(self.name, wait)
+                    self._cond.wait(wait)
+        finally:
+            with self._cond:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def drain(self):
+        """Empty the shared bucket, e.g. after the upstream answered 429."""
+        def empty(state):
+            self._refill(state, time.time())
+            state['tokens'] = 0.0
+        self._update_state(empty)
+
+    def snapshot(self):
+        """Remaining budget and queue metrics (read-only: never writes the store)."""
+        state = self._read_state()
+        self._refill(state, time.time())
+        with self._cond:
+            stats = dict(self._stats)
+            waiting = len(self._queue)
+        granted = stats['granted']
+        return {
+            'tokens_remaining': round(state['tokens'], 2),
+            'capacity': self.capacity,
+            'rate_per_second': self.rate,
+            'daily_quota': self.daily_quota or None,
+            'daily_used': state['used'],
+            'daily_remaining': max(0, self.daily_quota - state['used']) if self.daily_quota else None,
+            'waiting': waiting,
+            'granted': granted,
+            'rejected': stats['rejected'],
+            'avg_wait_seconds': round(stats['wait_seconds'] / granted, 3) if granted else 0.0,
+            'store_errors': stats['store_errors'],
+            'shared_store': self.store_path,
+        }
+
+
+def _seconds_until_utc_midnight():
+    now = time.time()
+    return 86400 - (now % 86400)
+
+
+QLOO_LIMITER = TokenBucketLimiter(
+    'qloo',
+    rate=QLOO_RATE_LIMIT,
+    capacity=QLOO_RATE_BURST,
+    max_wait=QLOO_RATE_MAX_WAIT,
+    daily_quota=QLOO_DAILY_QUOTA,
+)
@@ -0,0 +1,75 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# --- Cache Configuration ---
+QLOO_CACHE_TTL = float(os.getenv('QLOO_CACHE_TTL', 900))
+ANALYSIS_CACHE_TTL = float(os.getenv('ANALYSIS_CACHE_TTL', 3600))
+# How long expired entries are kept around to be served while an upstream is down
+STALE_CACHE_TTL = float(os.getenv('STALE_CACHE_TTL', 86400))
+
+
+def make_key(*parts):
+    """Build a stable cache key from JSON-serializable parts."""
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+def visualization_key(city_name, country_code, limit, output='figure'):
+    """Cache key for a city's charts; data-only specs are cached apart from figures."""
+    if output != 'figure':
+        return make_key(city_name, country_code, limit, output)
+    return make_key(city_name, country_code, limit)
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache with a freshness TTL and a longer stale retention.
+
+    get() only returns fresh entries. get_stale() also returns entries past
+    their TTL (up to `stale_ttl`), for serving while an upstream is failing.
+    """
+
+    def __init__(self, name, ttl, stale_ttl=STALE_CACHE_TTL, max_entries=512):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, max_age):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > max_age:
+                if max_age >= self.stale_ttl:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get(self, key):
+        return self._lookup(key, self.ttl)
+
+    def get_stale(self, key):
+        return self._lookup(key, self.stale_ttl)
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+qloo_cache = ResponseCache('qloo', QLOO_CACHE_TTL, max_entries=int(os.getenv('QLOO_CACHE_SIZE', 512)))
+visualization_cache = ResponseCache('visualizations', QLOO_CACHE_TTL, max_entries=int(os.getenv('VISUALIZATION_CACHE_SIZE', 128)))
+analysis_cache = ResponseCache('analysis', ANALYSIS_CACHE_TTL, max_entries=int(os.getenv('ANALYSIS_CACHE_SIZE', 256)))
@@ -0,0 +1,195 @@
+import os
+import time
+import random
+import contextvars
+import email.utils
+from contextlib import contextmanager
+
+import requests
+
+try:
+    import openai
+    _OPENAI_TRANSIENT_ERRORS = (openai.APIConnectionError,)
+    _OPENAI_TIMEOUT_ERRORS = (openai.APITimeoutError,)
+except ImportError:
+    openai = None
+    _OPENAI_TRANSIENT_ERRORS = ()
+    _OPENAI_TIMEOUT_ERRORS = ()
+
+# --- Retry Configuration ---
+# Total time budget for one incoming request. Retries (and the per-attempt
+# timeouts) are clipped so that a request never outlives the gateway timeout.
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', 60))
+
+# Status codes worth retrying; everything else (auth errors, bad requests) fails immediately
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+_TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.JSONDecodeError,
+) + _OPENAI_TRANSIENT_ERRORS
+
+_TIMEOUT_ERRORS = (requests.exceptions.Timeout, TimeoutError) + _OPENAI_TIMEOUT_ERRORS
+
+# A timeout within this long of a soft deadline is taken to be caused by it
+_SOFT_DEADLINE_SLACK = 0.1
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)  # (monotonic deadline, soft)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request deadline leaves no time for another attempt."""
+
+
+def start_deadline(seconds=None, soft=False):
+    """
+    Start a deadline for the current request context and return a token for
+    clear_deadline(). An already running (outer) deadline is never extended.
+    A `soft` deadline is the caller's own latency budget (the model router's
+    budget for a primary model): attempts it cuts short are not upstream
+    failures, see cut_short_by_caller().
+    """
+    seconds = REQUEST_DEADLINE_SECONDS if seconds is None else seconds
+    deadline = (time.monotonic() + seconds, soft)
+    current = _deadline.get()
+    if current is not None and current[0] <= deadline[0]:
+        deadline = current
+    return _deadline.set(deadline)
+
+
+def clear_deadline(token):
+    """Restore the deadline that was active before start_deadline()."""
+    _deadline.reset(token)
+
+
+@contextmanager
+def deadline_scope(seconds=None, soft=False):
+    """Context manager form of start_deadline()/clear_deadline()."""
+    token = start_deadline(seconds, soft)
+    try:
+        yield
+    finally:
+        clear_deadline(token)
+
+
+def remaining_budget():
+    """Seconds left before the current deadline, or None if no deadline is set."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline[0] - time.monotonic()
+
+
+def cut_short_by_caller(exc):
+    """
+    True when `exc` is a timeout on an attempt clipped to a soft deadline that
+    has run out: the caller stopped waiting, the upstream was not shown to fail.
+    """
+    deadline = _deadline.get()
+    if deadline is None or not deadline[1] or not isinstance(exc, _TIMEOUT_ERRORS):
+        return False
+    return time.monotonic() >= deadline[0] - _SOFT_DEADLINE_SLACK
+
+
+def _status_and_headers(exc):
+    """Extract (status_code, headers) from a requests or OpenAI error."""
+    response = getattr(exc, 'response', None)
+    status = getattr(exc, 'status_code', None)
+    if status is None and response is not None:
+        status = getattr(response, 'status_code', None)
+    headers = getattr(response, 'headers', None) or {}
+    return status, headers
+
+
+def parse_retry_after(headers):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc):
+    """Return (retryable, retry_after_seconds) for an upstream exception."""
+    status, headers = _status_and_headers(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES, parse_retry_after(headers)
+    return isinstance(exc, _TRANSIENT_ERRORS), None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, Retry-After awareness and a
+    per-request deadline budget. Shared by every upstream call (Qloo, OpenAI).
+    """
+
+    def __init__(self, name, max_attempts=3, base_delay=0.5, max_delay=10.0, attempt_timeout=30.0):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+
+    def classify(self, exc):
+        """Return (retryable, retry_after_seconds) for an exception."""
+        return classify_error(exc)
+
+    def compute_delay(self, attempt, retry_after=None):
+        """Backoff before the next attempt (attempt is 0-based)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, operation, max_attempts=None):
+        """
+        Run `operation(timeout)` until it succeeds, retrying transient errors.
+        `timeout` is the time the attempt may take, clipped to the deadline.
+        The last error is re-raised when retries are exhausted.
+        """
+        max_attempts = max_attempts or self.max_attempts
+        for attempt in range(max_attempts):
+            remaining = remaining_budget()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded(f"{self.name}: request deadline exceeded before attempt {attempt+1}")
+            timeout = self.attempt_timeout if remaining is None else min(self.attempt_timeout, remaining)
+
+            try:
+                return operation(timeout)
+            except Exception as exc:
+                retryable, retry_after = self.classify(exc)
+                if not retryable or attempt >= max_attempts - 1:
+                    raise
+
+                delay = self.compute_delay(attempt, retry_after)
+                remaining = remaining_budget()
+                if remaining is not None and delay >= remaining:
+                    print(f"[RETRY] ⌛ {self.name}: no budget left for a retry ({remaining:.1f}s remaining, backoff {delay:.1f}s)")
+                    raise
+
+                print(f"[RETRY] ⏳ {self.name} attempt {attempt+1}/{max_attempts} failed: {exc}. Retrying in {delay:.2f} seconds...")
+                time.sleep(delay)
+
+
+QLOO_RETRY = RetryPolicy(
+    'qloo',
+    max_attempts=int(os.getenv('QLOO_MAX_RETRIES', 3)),
+    attempt_timeout=float(os.getenv('QLOO_TIMEOUT_SECONDS', 15)),
+)
+
+OPENAI_RETRY = RetryPolicy(
+    'openai',
+    max_attempts=int(os.getenv('OPENAI_MAX_RETRIES', 3)),
+    base_delay=1.0,
+    max_delay=20.0,
+    attempt_timeout=float(os.getenv('OPENAI_TIMEOUT_SECONDS', 60)),
+)
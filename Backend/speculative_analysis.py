@@ -0,0 +1,233 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from bulkhead import LLM_BULKHEAD, BulkheadFull
+from circuit_breaker import OPENAI_BREAKER
+from response_cache import analysis_cache, make_key
+from retry_policy import deadline_scope
+
+# --- Speculative Analysis Configuration ---
+SPECULATIVE_ANALYSIS = os.getenv('SPECULATIVE_ANALYSIS', 'false').lower() == 'true'
+SPECULATIVE_WORKERS = int(os.getenv('SPECULATIVE_WORKERS', 1))
+SPECULATIVE_QUEUE_SIZE = int(os.getenv('SPECULATIVE_QUEUE_SIZE', 8))
+# Limit the analysis panel requests, so the speculative result is a cache hit
+SPECULATIVE_ANALYSIS_LIMIT = int(os.getenv('SPECULATIVE_ANALYSIS_LIMIT', 30))
+# Speculative work only starts while fewer interactive LLM requests are running
+SPECULATIVE_MAX_INTERACTIVE = int(os.getenv('SPECULATIVE_MAX_INTERACTIVE', 2))
+SPECULATIVE_DEADLINE_SECONDS = float(os.getenv('SPECULATIVE_DEADLINE_SECONDS', 90))
+# Longest an interactive request waits for a running speculative analysis, and
+# the part of its own budget it keeps for generating the analysis itself
+SPECULATIVE_WAIT_MAX = float(os.getenv('SPECULATIVE_WAIT_MAX', 20))
+SPECULATIVE_WAIT_HEADROOM = float(os.getenv('SPECULATIVE_WAIT_HEADROOM', 15))
+# How long a worker backs off when the LLM bulkhead has no free slot for it
+SPECULATIVE_BUSY_BACKOFF = float(os.getenv('SPECULATIVE_BUSY_BACKOFF', 1))
+
+
+class _Task:
+    def __init__(self, city_name, country_code, limit):
+        self.city_name = city_name
+        self.country_code = country_code
+        self.limit = limit
+        self.cancelled = False
+        self.done = threading.Event()
+
+
+class SpeculativeAnalyzer:
+    """
+    Low-priority background generation of business analyses.
+
+    /api/visualizations submits the city it just served; a small worker pool
+    runs analyze_business_environment so the result lands in the analysis
+    cache before the user opens the analysis panel. The queue is bounded
+    (oldest entries are dropped), work is skipped when already cached or the
+    OpenAI circuit is open, and a task only starts while interactive LLM
+    requests are below SPECULATIVE_MAX_INTERACTIVE. Tasks run inside the
+    shared LLM bulkhead but never queue for it: without a free slot, the task
+    goes back to the front of the queue and the worker backs off.
+
+    Cancelling a running task only detaches it: waiters are released at once,
+    but the LLM call already in flight is not interrupted, and its result
+    still lands in the analysis cache.
+    """
+
+    def __init__(self, enabled=SPECULATIVE_ANALYSIS, workers=SPECULATIVE_WORKERS, queue_size=SPECULATIVE_QUEUE_SIZE,
+                 limit=SPECULATIVE_ANALYSIS_LIMIT, max_interactive=SPECULATIVE_MAX_INTERACTIVE):
+        self.enabled = enabled
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.limit = limit
+        self.max_interactive = max_interactive
+
+        self._cond = threading.Condition()
+        self._queue = OrderedDict()  # key -> _Task, oldest first
+        self._running = {}           # key -> _Task
+        self._interactive = 0
+        self._threads = []
+        self._stats = {'submitted': 0, 'completed': 0, 'dropped': 0, 'cancelled': 0, 'skipped': 0, 'deferred': 0}
+
+    def _key(self, city_name, country_code, limit):
+        return make_key(city_name, country_code, limit)
+
+    def _ensure_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"speculative-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def submit(self, city_name, country_code, limit=None):
+        """Queue a speculative analysis. Returns False if disabled, cached or already queued."""
+        if not self.enabled or not city_name or not country_code:
+            return False
+        limit = self.limit if limit is None else limit
+        key = self._key(city_name, country_code, limit)
+        if analysis_cache.get(key) is not None:
+            return False
+
+        with self._cond:
+            if key in self._queue or key in self._running:
+                return False
+            while len(self._queue) >= self.queue_size:
+                _, dropped = self._queue.popitem(last=False)
+                dropped.cancelled = True
+                dropped.done.set()
+                self._stats['dropped'] += 1
+            self._queue[key] = _Task(city_name, country_code, limit)
+            self._stats['submitted'] += 1
+            self._ensure_workers()
+            self._cond.notify_all()
+        print(f"[SPECULATIVE] 🔮 Queued analysis for {city_name}, {country_code}")
+        return True
+
+    def cancel(self, city_name, country_code, limit=None):
+        """
+        Cancel a queued speculative analysis, or detach a running one (its
+        LLM call finishes in the background; see the class docstring).
+        """
+        limit = self.limit if limit is None else limit
+        key = self._key(city_name, country_code, limit)
+        with self._cond:
+            task = self._queue.pop(key, None) or self._running.get(key)
+            if task is None:
+                return False
+            task.cancelled = True
+            task.done.set()
+            self._stats['cancelled'] += 1
+        print(f"[SPECULATIVE] 🛑 Cancelled analysis for {city_name}, {country_code}")
+        return True
+
+    def cancel_all(self):
+        with self._cond:
+            tasks = list(self._queue.values()) + list(self._running.values())
+            self._queue.clear()
+            for task in tasks:
+                task.cancelled = True
+                task.done.set()
+            self._stats['cancelled'] += len(tasks)
+        return len(tasks)
+
+    def wait_for(self, city_name, country_code, limit, budget=None):
+        """
+        If a speculative analysis for this key is running, wait for it instead
+        of starting a duplicate LLM call. `budget` is the time left for the
+        whole request (None when unbounded); the wait is capped at
+        SPECULATIVE_WAIT_MAX and leaves SPECULATIVE_WAIT_HEADROOM of the budget
+        for the request's own analysis. A queued one is cancelled, since the
+        interactive request will do the work.
+        """
+        timeout = SPECULATIVE_WAIT_MAX
+        if budget is not None:
+            timeout = min(timeout, budget - SPECULATIVE_WAIT_HEADROOM)
+        key = self._key(city_name, country_code, limit)
+        with self._cond:
+            queued = self._queue.pop(key, None)
+            if queued is not None:
+                queued.cancelled = True
+                queued.done.set()
+            task = self._running.get(key)
+        if task is not None and timeout > 0:
+            task.done.wait(timeout)
+
+    @contextmanager
+    def interactive(self):
+        """Mark an interactive LLM request as in flight for the duration of the block."""
+        with self._cond:
+            self._interactive += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._interactive -= 1
+                self._cond.notify_all()
+
+    def _next_task(self):
+        with self._cond:
+            while True:
+                if self._queue and self._interactive < self.max_interactive:
+                    key, task = self._queue.popitem(last=False)
+                    self._running[key] = task
+                    return key, task
+                self._cond.wait()
+
+    def _defer(self, key, task):
+        """
+        Put a running task back at the front of the queue (the LLM bulkhead is
+        busy) and back off. Returns False if it was cancelled meanwhile.
+        """
+        with self._cond:
+            self._running.pop(key, None)
+            if task.cancelled or key in self._queue:
+                return False
+            self._queue[key] = task
+            self._queue.move_to_end(key, last=False)
+            self._stats['deferred'] += 1
+            self._cond.wait(SPECULATIVE_BUSY_BACKOFF)
+        return True
+
+    def _work(self):
+        import chatgpt_analysis
+
+        while True:
+            key, task = self._next_task()
+            deferred = False
+            try:
+                if task.cancelled or analysis_cache.get(key) is not None or OPENAI_BREAKER.is_open():
+                    with self._cond:
+                        self._stats['skipped'] += 1
+                    continue
+                try:
+                    # Yield to interactive traffic: take a free LLM slot or try again later
+                    with LLM_BULKHEAD.slot(blocking=False), deadline_scope(SPECULATIVE_DEADLINE_SECONDS):
+                        print(f"[SPECULATIVE] 🤖 Generating analysis for {task.city_name}, {task.country_code}")
+                        result = chatgpt_analysis.analyze_business_environment(
+                            task.city_name, task.country_code, task.limit
+                        )
+                except BulkheadFull:
+                    deferred = self._defer(key, task)
+                    continue
+                if result.get("error"):
+                    print(f"[SPECULATIVE] ⚠️ Analysis failed for {task.city_name}: {result['error']}")
+                else:
+                    with self._cond:
+                        self._stats['completed'] += 1
+            except Exception as e:
+                print(f"[SPECULATIVE] 💥 Exception for {task.city_name}: {e}")
+            finally:
+                if not deferred:
+                    with self._cond:
+                        self._running.pop(key, None)
+                    task.done.set()
+
+    def snapshot(self):
+        with self._cond:
+            return dict(
+                self._stats,
+                enabled=self.enabled,
+                queued=len(self._queue),
+                running=len(self._running),
+                interactive=self._interactive,
+            )
+
+
+speculative_analyzer = SpeculativeAnalyzer()
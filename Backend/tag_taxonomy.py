@@ -0,0 +1,97 @@
+"""
+Tag taxonomy: classifies Qloo tags into business families as bitmasks.
+
+All keyword families are compiled into one regex that finds every keyword
+occurrence in a single scan of the tag name (substring semantics, so "bar"
+still matches "wine bar" and "barbecue"). Each tag is classified once and the
+mask is cached by tag id for the life of the process; a place's classes are
+the OR of its tags' masks.
+"""
+import os
+import re
+import enum
+import threading
+
+from projection import declare_fields
+
+
+class TagClass(enum.IntFlag):
+    NONE = 0
+    FOOD = enum.auto()      # restaurant, cafe, bar, food
+    DINING = enum.auto()    # restaurant, cafe, bar
+    RETAIL = enum.auto()
+    OFFICE = enum.auto()
+    LUXURY = enum.auto()
+    HOTEL = enum.auto()
+    OUTDOOR = enum.auto()
+
+
+# Keyword families, matched as lowercase substrings of tag names
+TAXONOMY = {
+    TagClass.FOOD: ['restaurant', 'cafe', 'bar', 'food'],
+    TagClass.DINING: ['restaurant', 'cafe', 'bar'],
+    TagClass.RETAIL: ['shop', 'store', 'retail'],
+    TagClass.OFFICE: ['office', 'business', 'professional'],
+    TagClass.LUXURY: ['luxury', 'premium', 'high-end'],
+    TagClass.HOTEL: ['hotel', 'accommodation'],
+    TagClass.OUTDOOR: ['outdoor', 'park', 'beach'],
+}
+
+# Tag fields read by the classifier; see projection.py
+declare_fields('brand', 'tag_taxonomy', ['tags.tag_id', 'tags.id', 'tags.name'])
+declare_fields('place', 'tag_taxonomy', ['tags.tag_id', 'tags.id', 'tags.name'])
+
+TAG_CLASS_CACHE_SIZE = int(os.getenv('TAG_CLASS_CACHE_SIZE', 100000))
+
+
+class TagClassifier:
+    """Compiled keyword automaton plus a per-tag-id cache of class masks."""
+
+    def __init__(self, taxonomy=TAXONOMY, cache_size=TAG_CLASS_CACHE_SIZE):
+        self.keyword_masks = {}
+        for tag_class, keywords in taxonomy.items():
+            for keyword in keywords:
+                self.keyword_masks[keyword] = self.keyword_masks.get(keyword, 0) | int(tag_class)
+        # Zero-width lookahead so overlapping keywords are all found; longest first at each position
+        alternatives = '|'.join(re.escape(keyword) for keyword in sorted(self.keyword_masks, key=len, reverse=True))
+        self.pattern = re.compile(f'(?=({alternatives}))')
+        self.cache_size = cache_size
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def classify_name(self, name):
+        """Class mask (an int of TagClass bits) of one tag name, uncached."""
+        mask = 0
+        for match in self.pattern.finditer((name or '').lower()):
+            mask |= self.keyword_masks[match.group(1)]
+        return mask
+
+    def classify_tag(self, tag):
+        """Class mask of a Qloo tag dict, cached by tag id (or name when there is no id)."""
+        key = tag.get('tag_id') or tag.get('id') or tag.get('name')
+        mask = self._cache.get(key)
+        if mask is not None:
+            with self._lock:
+                self._stats['hits'] += 1
+            return mask
+        mask = self.classify_name(tag.get('name', ''))
+        with self._lock:
+            self._stats['misses'] += 1
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = mask
+        return mask
+
+    def classify_entity(self, entity):
+        """OR of the class masks of an entity's tags."""
+        mask = 0
+        for tag in entity.get('tags', []):
+            mask |= self.classify_tag(tag)
+        return mask
+
+    def snapshot(self):
+        return dict(self._stats, cached_tags=len(self._cache))
+
+
+tag_classifier = TagClassifier()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test cost-based admission control and load shedding, the cache discount
+under the key each endpoint uses, and that client identity ignores a raw
+X-Forwarded-For header
+"""
+import os
+import sys
+import time
+import threading
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+from admission import AdmissionController, AdmissionRejected, estimate_cost
+from response_cache import visualization_cache, visualization_key
+
+
+def expect_rejection(controller, cost, client, status):
+    try:
+        controller.acquire(cost, client)
+    except AdmissionRejected as e:
+        print(f"🚦 Rejected cost {cost} with {e.status}: {e}")
+        assert e.status == status
+        return e
+    assert False, f"Request of cost {cost} was admitted"
+
+
+def test_admission_budget():
+    """Expensive requests are refused, excess work queues and then is shed"""
+    print("🧪 Testing admission control...")
+    assert estimate_cost('visualizations', 'Nowhere', 'XX', 2000) > 10 * estimate_cost('visualizations', 'Nowhere', 'XX', 20)
+
+    controller = AdmissionController(budget=10, max_request_cost=6, client_share=0.6, max_queue=1, queue_timeout=0.3)
+    expect_rejection(controller, 8, 'a', 429)  # too expensive on its own
+
+    first = controller.acquire(5, 'a')
+    expect_rejection(controller, 2, 'a', 429)  # client 'a' already holds half the budget
+    second = controller.acquire(4, 'b')
+
+    # 'c' queues for capacity and is admitted once 'a' finishes
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(controller.acquire(3, 'c')))
+    waiter.start()
+    time.sleep(0.05)
+    assert controller.snapshot()['queue_depth'] == 1
+    rejection = expect_rejection(controller, 1, 'd', 503)  # queue is full
+    assert rejection.retry_after >= 1
+    controller.release(first)
+    waiter.join()
+    assert admitted
+
+    # With the budget taken and nobody releasing, a queued request times out
+    expect_rejection(controller, 5, 'e', 503)
+
+    controller.release(second)
+    controller.release(admitted[0])
+    gauges = controller.snapshot()
+    print(f"📊 Gauges: {gauges}")
+    assert gauges['in_flight'] == 0 and gauges['queue_depth'] == 0
+    assert gauges['shed_429'] == 2 and gauges['shed_503'] == 2
+    print("✅ Admission control test passed!")
+    return True
+
+
+def test_cost_and_client_identity():
+    """Cached data-only charts are discounted; spoofed forwarding headers are not trusted"""
+    print("🧪 Testing cost estimates and client identity...")
+    city = f'Costville-{time.time_ns()}'
+    cold = estimate_cost('visualizations', city, 'ZZ', 20, 'data')
+    visualization_cache.set(visualization_key(city, 'ZZ', 20, 'data'), {'charts': {}})
+    assert estimate_cost('visualizations', city, 'ZZ', 20, 'data') < cold
+    assert estimate_cost('visualizations', city, 'ZZ', 20) == cold  # figures are not cached yet
+
+    from app import app, client_id
+    with app.test_request_context('/', headers={'X-Forwarded-For': '6.6.6.6'}, environ_base={'REMOTE_ADDR': '10.0.0.7'}):
+        print(f"🪪 Client with a forged X-Forwarded-For: {client_id()}")
+        assert client_id() == '10.0.0.7'
+    print("✅ Cost and client identity test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_admission_budget() and test_cost_and_client_identity()
+    sys.exit(0 if success else 1)
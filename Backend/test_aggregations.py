@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Equivalence test: the NumPy aggregation kernels give the same results as the
+pure-Python chart statistics they replaced, on random inputs with ties,
+band boundaries and missing values; grids over zero-width ranges stay valid
+"""
+import sys
+import random
+
+import numpy as np
+
+import aggregations
+
+PRICE_BANDS = [2, 3.5, 4.5]
+
+
+def baseline_price_ranges(price_data):
+    """Price band counts as the price range chart computed them"""
+    return [
+        len([p for p in price_data if p <= 2]),
+        len([p for p in price_data if 2 < p <= 3.5]),
+        len([p for p in price_data if 3.5 < p <= 4.5]),
+        len([p for p in price_data if p > 4.5]),
+    ]
+
+
+def baseline_top_rated(ratings, limit):
+    """Indices of the top rated places, as get_top_rated_places sorted them"""
+    places = [{'index': i, 'rating': rating} for i, rating in enumerate(ratings)]
+    return [p['index'] for p in sorted(places, key=lambda p: p['rating'], reverse=True)[:limit]]
+
+
+def baseline_category_stats(categories, ratings):
+    """Count and mean rating per category, as the competition chart computed them"""
+    category_stats = {}
+    for category, rating in zip(categories, ratings):
+        if category not in category_stats:
+            category_stats[category] = {'count': 0, 'ratings': [], 'avg_rating': 0}
+        category_stats[category]['count'] += 1
+        if rating is not None:
+            category_stats[category]['ratings'].append(float(rating))
+    for category in category_stats:
+        ratings = category_stats[category]['ratings']
+        category_stats[category]['avg_rating'] = sum(ratings) / len(ratings) if ratings else 0
+    keys = list(category_stats)
+    return keys, [category_stats[c]['count'] for c in keys], [category_stats[c]['avg_rating'] for c in keys]
+
+
+def baseline_histogram(values, edges):
+    """Fixed-width bin counts over `edges`, the last bin closed (as Plotly and NumPy bin)"""
+    counts = [0] * (len(edges) - 1)
+    for value in values:
+        for i in range(len(counts)):
+            if edges[i] <= value < edges[i + 1] or (i == len(counts) - 1 and value == edges[-1]):
+                counts[i] += 1
+                break
+    return counts
+
+
+def test_aggregations():
+    """Band counts, top-k, histogram and grouped means match the pure-Python code"""
+    print("🧪 Testing aggregation kernels...")
+    rng = random.Random(44)
+    for size in (0, 1, 7, 100, 2000):
+        # Ratings on a 0.1 grid give plenty of ties; prices hit the band bounds exactly
+        ratings = [round(rng.uniform(1, 5), 1) for _ in range(size)]
+        prices = [min(5, max(1, rng.choice([1, 2, 3, 4]) + (r - 3.0) * 0.5)) for r in ratings]
+        prices += [2.0, 3.5, 4.5][:size]
+        categories = [rng.choice(['Cafe', 'Bar', 'Park', 'Museum', 'Other']) for _ in range(size)]
+        with_missing = [None if rng.random() < 0.2 else r for r in ratings]
+
+        assert aggregations.band_counts(prices, PRICE_BANDS).tolist() == baseline_price_ranges(prices)
+
+        for limit in (0, 1, 5, 10, size + 3):
+            assert aggregations.top_k(ratings, limit) == baseline_top_rated(ratings, limit)
+        present = [i for i, r in enumerate(with_missing) if r is not None]
+        expected = [present[i] for i in baseline_top_rated([with_missing[i] for i in present], 10)]
+        assert aggregations.top_k(with_missing, 10) == expected
+
+        if ratings:
+            edges, counts = aggregations.histogram(with_missing, bins=10)
+            assert counts.tolist() == baseline_histogram([r for r in with_missing if r is not None], edges.tolist())
+            assert counts.sum() == len(present)
+
+        keys, counts, means = aggregations.group_count_mean(categories, with_missing)
+        expected_keys, expected_counts, expected_means = baseline_category_stats(categories, with_missing)
+        assert keys == expected_keys and counts.tolist() == expected_counts
+        assert np.allclose(means, expected_means)
+        print(f"✅ {size} values: kernels match")
+
+    # Categories without any rating average 0, as before
+    keys, counts, means = aggregations.group_count_mean(['A', 'B', 'A'], [None, 4.0, None])
+    assert keys == ['A', 'B'] and counts.tolist() == [2, 1] and means.tolist() == [0.0, 4.0]
+
+    # Grid edges always increase; a zero-width range is padded so its cell stays on the points
+    assert np.all(np.diff(aggregations.grid_edges(0.0, 1.0, 4)) > 0)
+    flat = aggregations.grid_edges(51.5, 51.5, 4)
+    assert np.all(np.diff(flat) > 0) and flat[0] < 51.5 < flat[-1]
+    x, y, counts, _ = aggregations.grid_bin([-0.1] * 5, [51.5] * 5, bins=[aggregations.grid_edges(-0.1, -0.1, 4), flat])
+    assert counts.tolist() == [5] and abs(x[0] + 0.1) < 1e-6 and abs(y[0] - 51.5) < 1e-6
+
+    print("✅ Aggregation kernels test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_aggregations()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Test that a saturated LLM bulkhead fails fast without blocking Qloo endpoints
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+import app as app_module
+from bulkhead import Bulkhead, BulkheadFull
+
+
+def test_llm_saturation_is_isolated():
+    """Chat requests get a fast 503 while visualizations keep working"""
+    print("🧪 Testing bulkhead isolation...")
+    llm = Bulkhead('openai-test', max_concurrent=1, max_queue=0, queue_timeout=0.1)
+
+    # Occupy the only LLM slot, as a slow OpenAI call would
+    llm.acquire()
+
+    try:
+        started = time.monotonic()
+        try:
+            with llm.slot():
+                pass
+            assert False, "Saturated bulkhead admitted a caller"
+        except BulkheadFull as e:
+            print(f"🚧 Rejected in {time.monotonic() - started:.3f}s: {e}")
+            assert time.monotonic() - started < 0.5
+            assert e.retry_after >= 1
+
+        # The endpoint wrapper turns the rejection into a 503 with Retry-After
+        guarded = app_module.guarded_by(llm)(lambda: ('unreachable', 200))
+        with app_module.app.test_request_context():
+            response, status = guarded()
+        print(f"📡 Guarded endpoint: {status}, Retry-After {response.headers.get('Retry-After')}")
+        assert status == 503 and response.headers.get('Retry-After')
+
+        # The Qloo bulkhead is untouched by LLM saturation
+        with app_module.QLOO_BULKHEAD.slot():
+            pass
+        print(f"📊 LLM bulkhead: {llm.snapshot()}")
+        print("✅ Bulkhead isolation test passed!")
+        return True
+    finally:
+        llm.release()
+
+
+if __name__ == '__main__':
+    success = test_llm_saturation_is_isolated()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test the cache warm-up job: hot cities are fetched with bounded concurrency
+under a per-city deadline, failures are recorded, and readiness follows the
+warmed fraction
+"""
+import os
+import sys
+import time
+import threading
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+import cache_warmup
+from cache_warmup import WarmupJob
+from circuit_breaker import CircuitOpenError
+from retry_policy import remaining_budget
+
+
+def fake_fetch(fetched, in_flight, peak, failing=(), raising=()):
+    """get_brands/get_places stand-in recording each call and the deadline it ran under"""
+    lock = threading.Lock()
+    def fetch(city, country, limit):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            fetched.append((city, limit, remaining_budget()))
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        if city in raising:
+            raise CircuitOpenError('qloo', 30)
+        if city in failing:
+            return None
+        return {'results': {'entities': [{'name': f'{city} entity'}]}}
+    return fetch
+
+
+def test_cache_warmup():
+    """Warm-up progress, failures and the readiness gate"""
+    print("🧪 Testing cache warm-up...")
+    original = cache_warmup.get_brands, cache_warmup.get_places, cache_warmup.WARMUP_CITIES
+    fetched, in_flight, peak = [], [0], [0]
+    fetch = fake_fetch(fetched, in_flight, peak, failing=('Paris',), raising=('Berlin',))
+    cache_warmup.get_brands = cache_warmup.get_places = fetch
+    try:
+        cache_warmup.WARMUP_CITIES = 'London:GB; Paris : FR;bad entry'
+        assert cache_warmup.load_warmup_cities() == [('London', 'GB'), ('Paris', 'FR')]
+
+        cities = [('London', 'GB'), ('Madrid', 'ES'), ('Rome', 'IT'), ('Paris', 'FR'), ('Berlin', 'DE')]
+        job = WarmupJob(cities, concurrency=2, render_visualizations=False, run_analysis=False,
+                        ready_threshold=0.6, interval_seconds=0)
+        assert not job.is_ready()
+
+        job.start()
+        job._thread.join(10)
+        progress = job.progress()
+        print(f"🔥 Warm-up progress: {progress}")
+        assert progress['warmed'] == 3 and sorted(progress['failed']) == ['Berlin, DE', 'Paris, FR']
+        assert progress['rounds'] == 1 and progress['finished_at'] >= progress['started_at']
+        assert job.is_ready()  # 3 of 5 warmed meets the 0.6 threshold
+
+        # Both limits are warmed, every fetch ran under the per-city deadline,
+        # and no more cities than the concurrency were in flight
+        limits = {limit for _, limit, _ in fetched}
+        assert limits == {cache_warmup.WARMUP_VISUALIZATION_LIMIT, cache_warmup.WARMUP_ANALYSIS_LIMIT}
+        assert all(0 < budget <= cache_warmup.WARMUP_CITY_DEADLINE_SECONDS for _, _, budget in fetched)
+        assert peak[0] <= 2
+
+        # A stricter threshold is not met; a job without cities is always ready
+        assert not WarmupJob(cities, render_visualizations=False, ready_threshold=0.8).is_ready()
+        assert WarmupJob([]).is_ready()
+    finally:
+        cache_warmup.get_brands, cache_warmup.get_places, cache_warmup.WARMUP_CITIES = original
+
+    print("✅ Cache warm-up test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_cache_warmup()
+    sys.exit(0 if success else 1)
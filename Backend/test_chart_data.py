@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Parity test: the data-only chart specs carry the same series as the figures
+they are reduced from, for the binned geographic chart (cell centres, bubble
+sizes, per-cell counts and ratings) and the pre-binned rating histogram
+"""
+import os
+import sys
+import json
+import base64
+import random
+
+import numpy as np
+
+import visualizations
+from visualizations import QlooVisualizer
+from chart_data import figure_data, encode
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'qloo_london.json')
+
+
+def decode_typed_arrays(value):
+    """Replace typed-array specs with plain float lists (reshaped when they carry a shape)"""
+    if isinstance(value, dict):
+        if 'bdata' in value and 'dtype' in value:
+            array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype']).astype(float)
+            if 'shape' in value:
+                array = array.reshape([int(n) for n in str(value['shape']).split(',')])
+            return array.tolist()
+        return {key: decode_typed_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_typed_arrays(item) for item in value]
+    return value
+
+
+def crowded_city(fixture, count, seed=43):
+    """The fixture's places repeated with jittered coordinates, enough to bin the geo chart"""
+    rng = random.Random(seed)
+    entities = fixture['places']['results']['entities']
+    places = []
+    for i in range(count):
+        place = json.loads(json.dumps(entities[i % len(entities)]))
+        place['location'] = {'lat': 51.5 + rng.uniform(-0.1, 0.1), 'lon': -0.12 + rng.uniform(-0.2, 0.2)}
+        places.append(place)
+    return {'results': {'entities': places}}
+
+
+def assert_parity(figure):
+    """Every data field of every trace survives into the encoded data-only spec"""
+    traces = decode_typed_arrays(json.loads(figure.to_json()))['data']
+    spec = decode_typed_arrays(json.loads(encode(figure_data(figure))[0]))
+    assert len(spec['series']) == len(traces)
+    for trace, series in zip(traces, spec['series']):
+        for field in ('name', 'mode', 'x', 'y', 'customdata', 'width'):
+            if field in trace:
+                assert series[field] == trace[field], (trace.get('name'), field)
+        if isinstance(trace.get('marker', {}).get('size'), list):
+            assert series['size'] == trace['marker']['size']
+    return traces, spec
+
+
+def test_chart_data_parity():
+    """Binned geo chart and rating histogram: data spec == figure data"""
+    print("🧪 Testing data-only chart spec parity...")
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+
+    visualizer = QlooVisualizer(figure_backend='fast')
+    visualizer.set_data(fixture['brands'], crowded_city(fixture, visualizations.SCATTER_POINT_THRESHOLD + 100))
+
+    geo = visualizer.create_geographic_distribution('London', 'GB')
+    traces, spec = assert_parity(geo)
+    cells = sum(len(series['x']) for series in spec['series'])
+    counted = sum(int(row[0]) for series in spec['series'] for row in series['customdata'])
+    print(f"🗺️ Binned geo chart: {len(traces)} traces, {cells} cells, {counted} places")
+    assert counted == visualizations.SCATTER_POINT_THRESHOLD + 100
+
+    ratings = visualizer.create_place_ratings_distribution('London', 'GB')
+    traces, spec = assert_parity(ratings)
+    print(f"📊 Rating histogram: bar width {spec['series'][0]['width']}, ranges {spec['series'][0]['customdata'][:2]}")
+    assert spec['series'][0]['width'] > 0 and len(spec['series'][0]['customdata']) == len(spec['series'][0]['x'])
+
+    print("✅ Data-only chart spec parity test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_chart_data_parity()
+    sys.exit(0 if success else 1)
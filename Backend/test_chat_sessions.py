@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test chat sessions: a first turn served from the LLM cache still gives the
+session a response id, so the second turn chains with previous_response_id
+instead of resending the analysis context
+"""
+import os
+import sys
+import time
+import tempfile
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+import chatgpt_analysis
+from llm_cache import LLMResponseCache
+
+
+class FakeUsage:
+    input_tokens = 100
+    output_tokens = 20
+    input_tokens_details = None
+
+
+class FakeResponse:
+    def __init__(self, id, output_text):
+        self.id = id
+        self.output_text = output_text
+        self.status = 'completed'
+        self.usage = FakeUsage()
+
+
+class FakeResponses:
+    """Records each upstream request and answers with a fresh response id"""
+
+    def __init__(self):
+        self.requests = []
+
+    def create(self, timeout=None, **kwargs):
+        self.requests.append(kwargs)
+        return FakeResponse(f'resp_{len(self.requests)}', f'reply {len(self.requests)}')
+
+
+class FakeClient:
+    def __init__(self):
+        self.responses = FakeResponses()
+
+
+def test_cached_first_turn_chains():
+    """Second turn after a cached first turn uses the cached response id"""
+    print("🧪 Testing chat chaining after a cached first turn...")
+    original = chatgpt_analysis.client, chatgpt_analysis.llm_cache, chatgpt_analysis.analyze_business_environment
+    fake = FakeClient()
+    city = f'Chatville-{time.time_ns()}'
+    with tempfile.TemporaryDirectory() as tmp:
+        chatgpt_analysis.client = fake
+        chatgpt_analysis.llm_cache = LLMResponseCache(path=os.path.join(tmp, 'llm.sqlite3'), ttl=60, enabled=True)
+        chatgpt_analysis.analyze_business_environment = lambda city_name, country_code: {'analysis': 'Busy cafes.'}
+        try:
+            # A first session asks the question upstream; a second asking the same is a cache hit
+            first = chatgpt_analysis.get_chat_response('Where should I open a cafe?', city, 'ZZ')
+            second = chatgpt_analysis.get_chat_response('Where should I open a cafe?', city, 'ZZ')
+            assert first['success'] and second['success'] and first['session_id'] != second['session_id']
+            assert len(fake.responses.requests) == 1 and second['response'] == 'reply 1'
+
+            # The follow-up chains to the cached response instead of rebuilding the context
+            follow_up = chatgpt_analysis.get_chat_response('And for a bakery?', city, 'ZZ', second['session_id'])
+            request = fake.responses.requests[-1]
+            print(f"🔗 Follow-up chained to {request.get('previous_response_id')}: {request['input']!r}")
+            assert follow_up['success'] and len(fake.responses.requests) == 2
+            assert request['previous_response_id'] == 'resp_1' and 'Busy cafes.' not in request['input']
+        finally:
+            chatgpt_analysis.client, chatgpt_analysis.llm_cache, chatgpt_analysis.analyze_business_environment = original
+
+    print("✅ Cached first turn chaining test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_cached_first_turn_chains()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test the circuit breaker through closed -> open -> half-open, and that an open
+Qloo circuit with nothing cached is a 503 with Retry-After, not an empty result
+"""
+import os
+import sys
+import time
+import json
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, QLOO_BREAKER
+from rate_limiter import QLOO_LIMITER
+from app import app
+
+
+def fail():
+    raise ConnectionError("upstream down")
+
+
+def test_breaker_states():
+    """A failing upstream opens the circuit; one probe decides whether it closes"""
+    print("🧪 Testing circuit breaker states...")
+    breaker = CircuitBreaker('test', failure_threshold=0.5, minimum_calls=4, open_seconds=0.2)
+
+    # CLOSED: failures pass through until the window has enough of them
+    for _ in range(4):
+        assert breaker.snapshot()['state'] == CircuitBreaker.CLOSED
+        try:
+            breaker.call(fail)
+        except ConnectionError:
+            pass
+    assert breaker.snapshot()['state'] == CircuitBreaker.OPEN
+
+    # OPEN: calls fail fast with the time left before a probe
+    try:
+        breaker.call(lambda: 'ok')
+        assert False, "Open circuit let a call through"
+    except CircuitOpenError as e:
+        print(f"🔴 {e}")
+        assert 0 < e.retry_after <= 0.2
+
+    # HALF_OPEN: one probe at a time; a failed probe re-opens the circuit
+    time.sleep(0.25)
+    assert breaker.allow_request() and not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.snapshot()['state'] == CircuitBreaker.OPEN
+
+    # A probe that never reached the upstream frees its slot without deciding
+    time.sleep(0.25)
+    assert breaker.allow_request()
+    breaker.record_neutral()
+    assert breaker.snapshot()['state'] == CircuitBreaker.HALF_OPEN and breaker.allow_request()
+    breaker.record_failure()
+
+    # ...and a successful one closes it
+    time.sleep(0.25)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.snapshot()['state'] == CircuitBreaker.CLOSED
+    print("✅ Circuit breaker states test passed!")
+    return True
+
+
+def test_qloo_circuit_open_endpoints():
+    """With the Qloo circuit open and an empty cache, endpoints answer 503 + Retry-After"""
+    print("🧪 Testing endpoints while the Qloo circuit is open...")
+    body = {'city': f'Nowhere-{time.time_ns()}', 'country': 'ZZ', 'limit': 5}
+    with QLOO_BREAKER._lock:
+        QLOO_BREAKER._open(time.monotonic())
+    granted = QLOO_LIMITER.snapshot()['granted']
+    try:
+        with app.test_client() as client:
+            for path in ('/api/visualizations', '/api/geo', '/api/chatgpt-analysis'):
+                response = client.post(path, json=body)
+                print(f"📡 {path}: {response.status_code}, Retry-After {response.headers.get('Retry-After')}")
+                assert response.status_code == 503 and int(response.headers['Retry-After']) >= 1
+                response.close()
+
+            response = client.post('/api/visualizations/stream', json=body)
+            events = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+            response.close()
+            print(f"🌊 Stream ended with: {events[-1]}")
+            assert events[-1]['type'] == 'complete' and events[-1]['error'] and events[-1]['retry_after'] >= 1
+
+            # The bundle stream reports the failure, then still ends with `done`
+            response = client.post('/api/city-bundle', json=body)
+            events = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+            response.close()
+            print(f"📦 Bundle events: {[event['type'] for event in events]}")
+            assert [event['type'] for event in events] == ['error', 'done'] and events[0]['retry_after'] >= 1
+
+            # Failing fast on the open circuit spent no rate limit tokens
+            assert QLOO_LIMITER.snapshot()['granted'] == granted
+    finally:
+        with QLOO_BREAKER._lock:
+            QLOO_BREAKER._state = CircuitBreaker.CLOSED
+            QLOO_BREAKER._outcomes.clear()
+    print("✅ Open circuit endpoint test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_breaker_states() and test_qloo_circuit_open_endpoints()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test shared city snapshots: one fetch for concurrent requests, LRU eviction
+under the memory budget, stale or partial fetches never stored, and
+read-only use by the charts and the summary
+"""
+import os
+import sys
+import copy
+import json
+import time
+import threading
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+import qloo_analysis
+from qloo_analysis import EntityStream, assemble_response
+from city_snapshot import CitySnapshot, CitySnapshotStore
+from chatgpt_analysis import prepare_data_summary
+from visualizations import QlooVisualizer
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'qloo_london.json')
+
+
+def test_city_snapshots():
+    """Concurrent builds are shared, the budget is enforced, the data is never mutated"""
+    print("🧪 Testing city snapshots...")
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+    original = copy.deepcopy(fixture)
+
+    size = CitySnapshot('London', 'GB', 20, fixture['brands'], fixture['places']).nbytes
+    store = CitySnapshotStore(max_bytes=size * 2.5)
+
+    # Eight concurrent requests for a cold city share one fetch and one snapshot
+    fetches = []
+    def fetch():
+        fetches.append(1)
+        time.sleep(0.2)
+        return fixture['brands'], fixture['places']
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get_or_build('London', 'GB', 20, fetch)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"📊 Store after concurrent builds: {store.snapshot()}")
+    assert len(fetches) == 1 and len(results) == 8
+    assert all(snapshot is results[0] for snapshot in results)
+
+    snapshot = results[0]
+    try:
+        snapshot.places = ()
+        assert False, "Snapshot attribute was reassigned"
+    except AttributeError:
+        pass
+
+    # Charts and the analysis summary read the snapshot without modifying it
+    visualizer = QlooVisualizer()
+    visualizer.set_snapshot(snapshot)
+    charts = visualizer.generate_all_visualizations('London', 'GB')
+    prepare_data_summary(snapshot.brands, snapshot.places, 'London', 'GB')
+    assert fixture == original, "Snapshot data was mutated"
+
+    fresh = QlooVisualizer()
+    fresh.set_data(copy.deepcopy(fixture['brands']), copy.deepcopy(fixture['places']))
+    assert fresh.generate_all_visualizations('London', 'GB') == charts
+
+    # Stale data is served but never stored
+    stale_places = dict(fixture['places'], stale=True)
+    assert store.publish('Paris', 'FR', 20, fixture['brands'], stale_places).stale
+    assert store.get('Paris', 'FR', 20) is None
+
+    # A fetch that lost a page is served as partial but never stored: the next request fetches again
+    def fetch_page(params, max_retries=None):
+        page = params.get('page', 1)
+        if page == 2:
+            return None
+        entities = fixture['places']['results']['entities'][page - 1:page]
+        return {'query': fixture['places'].get('query', {}), 'results': {'entities': entities}}
+    original_fetch = qloo_analysis.fetch_insights
+    qloo_analysis.fetch_insights = fetch_page
+    try:
+        lossy_fetches = []
+        def lossy_fetch():
+            lossy_fetches.append(1)
+            return fixture['brands'], assemble_response(EntityStream('place', 'Lisbon', 'PT', 4, page_size=1))
+        partial = store.get_or_build('Lisbon', 'PT', 20, lossy_fetch)
+        assert partial.partial and len(partial.places) == 3
+        assert store.get('Lisbon', 'PT', 20) is None
+        assert store.get_or_build('Lisbon', 'PT', 20, lossy_fetch).partial and len(lossy_fetches) == 2
+    finally:
+        qloo_analysis.fetch_insights = original_fetch
+
+    # The least recently used city is evicted once the budget is exceeded
+    store.publish('Rome', 'IT', 20, fixture['brands'], fixture['places'])
+    assert store.get('London', 'GB', 20) is snapshot
+    store.publish('Oslo', 'NO', 20, fixture['brands'], fixture['places'])
+    print(f"📊 Store after eviction: {store.snapshot()}")
+    assert store.get('Rome', 'IT', 20) is None
+    assert store.get('London', 'GB', 20) is snapshot
+    assert store.snapshot()['bytes'] <= store.max_bytes
+
+    print("✅ City snapshot test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_city_snapshots()
+    sys.exit(0 if success else 1)
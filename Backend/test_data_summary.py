@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test the token-budgeted data summary against the original implementation:
+with room for every line it selects the same categories, top rated places
+and popular brands; with a tight budget it keeps the strongest lines of each
+section without ever exceeding it, and its size does not grow with the
+number of entities
+"""
+import os
+import sys
+import json
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+from chatgpt_analysis import prepare_data_summary, create_analysis_input, estimate_tokens
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'qloo_london.json')
+
+
+def baseline_prepare_data_summary(brands, places, city_name, country_code):
+    """The summary before token budgeting (categories of the first 20 entities, full sorts), as the oracle"""
+    summary = {"city": city_name, "country": country_code, "brands": [], "places": [],
+               "brand_categories": {}, "place_categories": {}, "top_rated_places": [], "popular_brands": []}
+    for brand in brands[:20]:
+        categories = [tag.get('name', '') for tag in brand.get('tags', [])]
+        summary["brands"].append(brand.get('name', 'Unknown'))
+        for category in categories:
+            if category:
+                summary["brand_categories"][category] = summary["brand_categories"].get(category, 0) + 1
+    for place in places[:20]:
+        categories = [tag.get('name', '') for tag in place.get('tags', [])]
+        summary["places"].append(place.get('name', 'Unknown'))
+        for category in categories:
+            if category:
+                summary["place_categories"][category] = summary["place_categories"].get(category, 0) + 1
+    rated_places = [p for p in places if p.get('properties', {}).get('business_rating') and p['properties']['business_rating'] != 'N/A']
+    rated_places.sort(key=lambda x: float(x['properties']['business_rating']), reverse=True)
+    for place in rated_places[:5]:
+        summary["top_rated_places"].append({
+            "name": place.get('name', 'Unknown'),
+            "rating": place.get('properties', {}).get('business_rating', 'N/A'),
+            "categories": [tag.get('name', '') for tag in place.get('tags', [])]
+        })
+    for brand in sorted(brands, key=lambda x: x.get('popularity', 0), reverse=True)[:5]:
+        summary["popular_brands"].append({
+            "name": brand.get('name', 'Unknown'),
+            "popularity": brand.get('popularity', 0),
+            "categories": [tag.get('name', '') for tag in brand.get('tags', [])]
+        })
+    return summary
+
+
+def ranked(categories, n):
+    """Categories by count, as the original prompt formatter ordered them"""
+    return sorted(categories.items(), key=lambda x: x[1], reverse=True)[:n]
+
+
+def test_data_summary():
+    """Same selections as the original summary; compaction keeps the top lines"""
+    print("🧪 Testing data summary compaction...")
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+    brands = fixture['brands']['results']['entities']
+    places = fixture['places']['results']['entities']
+
+    # With room for every line, the selections match the original summary
+    expected = baseline_prepare_data_summary(brands, places, 'London', 'GB')
+    summary = prepare_data_summary(brands, places, 'London', 'GB', token_budget=100000)
+    assert summary['top_rated_places'] == expected['top_rated_places']
+    assert summary['popular_brands'] == expected['popular_brands']
+    assert list(summary['brand_categories'].items()) == ranked(expected['brand_categories'], len(summary['brand_categories']))
+    assert list(summary['place_categories'].items()) == ranked(expected['place_categories'], len(summary['place_categories']))
+    assert summary['brand_count'] == len(brands) and summary['place_count'] == len(places)
+
+    # A tight budget keeps the strongest lines of every section, within the budget
+    tight = prepare_data_summary(brands, places, 'London', 'GB', token_budget=60)
+    print(f"📏 Full summary ~{summary['estimated_tokens']} tokens, budgeted ~{tight['estimated_tokens']} tokens")
+    assert tight['estimated_tokens'] <= 60 < summary['estimated_tokens']
+    for section in ('top_rated_places', 'popular_brands'):
+        assert tight[section] == summary[section][:len(tight[section])]
+    for section in ('brand_categories', 'place_categories'):
+        assert list(tight[section].items()) == list(summary[section].items())[:len(tight[section])]
+    assert any(tight[section] for section in ('top_rated_places', 'popular_brands', 'brand_categories', 'place_categories'))
+
+    # A budget smaller than any single line leaves the sections out rather than overrunning
+    tiny = prepare_data_summary(brands, places, 'London', 'GB', token_budget=3)
+    print(f"🤏 Tiny budget: ~{tiny['estimated_tokens']} tokens")
+    assert tiny['estimated_tokens'] <= 3
+    assert not any(tiny[section] for section in ('top_rated_places', 'popular_brands', 'brand_categories', 'place_categories'))
+    assert 'London' in create_analysis_input(tiny, 'London', 'GB')
+
+    # 100x the entities: the brief stays the same size
+    many_brands, many_places = brands * 100, places * 100
+    large = prepare_data_summary(many_brands, many_places, 'London', 'GB')
+    small = prepare_data_summary(brands, places, 'London', 'GB')
+    large_brief = estimate_tokens(create_analysis_input(large, 'London', 'GB'))
+    small_brief = estimate_tokens(create_analysis_input(small, 'London', 'GB'))
+    print(f"📐 Brief: ~{small_brief} tokens for {len(places)} places, ~{large_brief} tokens for {len(many_places)}")
+    assert large_brief <= small_brief + 20
+
+    print("✅ Data summary compaction test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_data_summary()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test paginated Qloo fetches: entities are handed on as their page arrives,
+a lost page marks the response partial, and a failed first page cancels the
+page requests still queued
+"""
+import os
+import sys
+import threading
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+import qloo_analysis
+from qloo_analysis import EntityStream, assemble_response, is_degraded
+
+
+def fake_page(failing_pages=(), raising_pages=(), gate=None, calls=None):
+    """fetch_insights stand-in returning one entity per page"""
+    def fetch(params, max_retries=None):
+        page = params.get('page', 1)
+        if calls is not None:
+            calls.append(page)
+        if gate is not None and page > 1:
+            gate.wait(5)
+        if page in raising_pages:
+            raise ConnectionError(f"page {page} unreachable")
+        if page in failing_pages:
+            return None
+        return {'query': {'page': page}, 'results': {'entities': [{'entity_id': f'E{page}', 'name': f'Place {page}'}]}}
+    return fetch
+
+
+def test_entity_stream():
+    """Lost pages are flagged, first-page failures stop the remaining requests"""
+    print("🧪 Testing paginated entity streams...")
+    original = qloo_analysis.fetch_insights
+    try:
+        # Complete fetch
+        qloo_analysis.fetch_insights = fake_page()
+        data = assemble_response(EntityStream('place', 'London', 'GB', 4, page_size=1))
+        assert len(data['results']['entities']) == 4 and not is_degraded(data)
+
+        # Entities reach on_entity while later pages are still in flight
+        gate, first_seen = threading.Event(), threading.Event()
+        qloo_analysis.fetch_insights = fake_page(gate=gate)
+        stream = EntityStream('place', 'London', 'GB', 3, page_size=1)
+        seen = []
+        def on_entity(entity):
+            seen.append(entity['entity_id'])
+            first_seen.set()
+        worker = threading.Thread(target=lambda: assemble_response(stream, on_entity))
+        worker.start()
+        assert first_seen.wait(5) and seen == ['E1'] and not stream._futures[1].done()
+        gate.set()
+        worker.join(5)
+        assert seen == ['E1', 'E2', 'E3']
+
+        # Page 2 returns nothing, page 3 raises: both are lost, the rest is served as partial
+        qloo_analysis.fetch_insights = fake_page(failing_pages=(2,), raising_pages=(3,))
+        stream = EntityStream('place', 'London', 'GB', 4, page_size=1)
+        data = assemble_response(stream)
+        print(f"📄 Partial fetch: {[e['entity_id'] for e in data['results']['entities']]}")
+        assert stream.ok and stream.partial and not stream.stale
+        assert [e['entity_id'] for e in data['results']['entities']] == ['E1', 'E4']
+        assert data['partial'] and is_degraded(data)
+
+        # Page 1 fails: no response, and queued pages are cancelled instead of fetched
+        gate = threading.Event()
+        calls = []
+        qloo_analysis.fetch_insights = fake_page(failing_pages=(1,), gate=gate, calls=calls)
+        stream = EntityStream('place', 'London', 'GB', 40, page_size=1)
+        assert assemble_response(stream) is None
+        gate.set()
+        cancelled = sum(future.cancelled() for future in stream._futures)
+        for future in stream._futures:
+            if not future.cancelled():
+                future.result()
+        print(f"🛑 First page failed: {cancelled} of 40 page requests cancelled, {len(calls)} fetched")
+        assert cancelled > 0 and len(calls) < 40
+    finally:
+        qloo_analysis.fetch_insights = original
+
+    print("✅ Entity stream test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_entity_stream()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Conformance test: the fast dict figure backend emits the same chart JSON as
+plotly graph_objects for the Qloo fixtures (synthetic London responses
+shaped like the insights API, with placeholder names, addresses and ids)
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+
+import numpy as np
+
+from visualizations import QlooVisualizer
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'qloo_london.json')
+
+
+def decode_typed_arrays(value):
+    """Replace plotly typed-array specs with plain float lists, so 2 (int8) == 2.0 (float64)"""
+    if isinstance(value, dict):
+        if 'bdata' in value and 'dtype' in value:
+            return np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype']).astype(float).tolist()
+        return {key: decode_typed_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_typed_arrays(item) for item in value]
+    return value
+
+
+def render(backend, fixture):
+    """Build every chart with one backend"""
+    visualizer = QlooVisualizer(figure_backend=backend)
+    visualizer.set_data(fixture['brands'], fixture['places'])
+    started = time.perf_counter()
+    charts = visualizer.generate_all_visualizations(fixture['city'], fixture['country'])
+    return charts, time.perf_counter() - started
+
+
+def test_fast_backend_matches_plotly():
+    """Every chart from the fast backend decodes to the same figure as plotly's"""
+    print("🧪 Testing fast figure backend conformance...")
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+
+    expected, plotly_seconds = render('plotly', fixture)
+    actual, fast_seconds = render('fast', fixture)
+    print(f"⏱️ plotly: {plotly_seconds * 1000:.1f}ms, fast: {fast_seconds * 1000:.1f}ms")
+
+    assert sorted(actual) == sorted(expected), f"Chart keys differ: {sorted(actual)} vs {sorted(expected)}"
+    for key in expected:
+        assert decode_typed_arrays(json.loads(actual[key])) == decode_typed_arrays(json.loads(expected[key])), \
+            f"Chart '{key}' differs between backends"
+        print(f"✅ {key} matches")
+
+    # Charts are seeded per city, not from the global random state, so they are cacheable
+    random.seed()
+    np.random.seed()
+    again, _ = render('fast', fixture)
+    assert again == actual, "Charts differ between identical builds"
+    print("✅ Identical builds give byte-identical charts")
+    print("✅ Fast figure backend conformance test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_fast_backend_matches_plotly()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test the spatial grid index: viewport queries match a brute-force scan,
+crowded viewports come back as cell aggregates, and duplicate or collinear
+coordinates bin without degenerate grids
+"""
+import os
+import sys
+import json
+import random
+
+import numpy as np
+
+from geo_index import GeoGridIndex, extract_coordinates
+import visualizations
+from visualizations import QlooVisualizer
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'qloo_london.json')
+
+
+def synthetic_places(count, seed=7):
+    rng = random.Random(seed)
+    places = []
+    for i in range(count):
+        place = {'name': f'Place {i}', 'tags': [{'name': rng.choice(['Bar', 'Cafe', 'Park'])}],
+                 'properties': {'business_rating': round(rng.uniform(1, 5), 1)}}
+        if i % 10:  # Every tenth place has no location
+            place['location'] = {'lat': 51.5 + rng.uniform(-0.1, 0.1), 'lon': -0.12 + rng.uniform(-0.2, 0.2)}
+        places.append(place)
+    return places
+
+
+def test_geo_index():
+    """Viewport queries, aggregation and real chart coordinates"""
+    print("🧪 Testing geo index...")
+    assert extract_coordinates({'location': {'lat': '51.5', 'lon': '-0.1'}}) == (51.5, -0.1)
+    assert extract_coordinates({'location': {'lat': 95, 'lon': 0}}) is None
+    assert extract_coordinates({'name': 'No location'}) is None
+
+    places = synthetic_places(3000)
+    index = GeoGridIndex(places)
+    print(f"📊 Index: {index.snapshot()}")
+    assert len(index) == 2700 and index.unlocated == 300
+
+    # Viewport results equal a brute-force scan
+    south, west, north, east = 51.47, -0.2, 51.53, -0.05
+    expected = np.flatnonzero((index.lat >= south) & (index.lat <= north) & (index.lon >= west) & (index.lon <= east))
+    assert index.viewport(south, west, north, east).tolist() == expected.tolist()
+
+    sparse = index.query(south, west, north, east, max_points=len(expected))
+    assert sparse['mode'] == 'points' and len(sparse['points']) == sparse['count'] == len(expected)
+
+    dense = index.query(max_points=100, bins=16)
+    print(f"🗺️ Whole city: {dense['count']} places in {len(dense['cells'])} cells")
+    assert dense['mode'] == 'cells' and len(dense['cells']) <= 16 * 16
+    assert sum(cell['count'] for cell in dense['cells']) == dense['count'] == len(index)
+
+    # Viewports crossing the antimeridian
+    pacific = GeoGridIndex([{'name': 'A', 'location': {'lat': 0, 'lon': 179.5}},
+                            {'name': 'B', 'location': {'lat': 0, 'lon': -179.5}},
+                            {'name': 'C', 'location': {'lat': 0, 'lon': 0}}])
+    assert pacific.viewport(-1, 179, 1, -179).tolist() == [0, 1]
+    cells = pacific.query(-1, 179, 1, -179, max_points=1, bins=2)['cells']
+    assert sorted(cell['lon'] for cell in cells) == [-179.5, 179.5]
+
+    # The geographic chart plots the (synthetic) London fixture coordinates
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+    visualizer = QlooVisualizer()
+    visualizer.set_data(fixture['brands'], fixture['places'])
+    figure = visualizer.create_geographic_distribution(fixture['city'], fixture['country'])
+    lats = [lat for trace in figure.data for lat in trace['y']]
+    assert len(lats) == len(fixture['places']['results']['entities'])
+    assert all(51.2 < lat < 51.8 for lat in lats)
+
+    # Duplicate coordinates (one spot) and collinear ones (one latitude) still bin
+    same_spot = GeoGridIndex([{'name': f'P{i}', 'location': {'lat': 51.5, 'lon': -0.1}} for i in range(50)])
+    cells = same_spot.query(max_points=10, bins=8)['cells']
+    assert len(cells) == 1 and cells[0]['count'] == 50 and cells[0]['lat'] == 51.5
+
+    rng = random.Random(46)
+    on_a_line = [{'name': f'P{i}', 'tags': [{'name': 'Cafe'}], 'properties': {'business_rating': 4.0},
+                  'location': {'lat': 51.5, 'lon': rng.uniform(-0.2, 0.0)}}
+                 for i in range(visualizations.SCATTER_POINT_THRESHOLD + 1)]
+    visualizer = QlooVisualizer()
+    visualizer.set_data(fixture['brands'], {'results': {'entities': on_a_line}})
+    figure = visualizer.create_geographic_distribution(fixture['city'], fixture['country'])
+    binned_lats = {lat for trace in figure.data for lat in trace['y']}
+    print(f"📏 Collinear places binned into {sum(len(trace['x']) for trace in figure.data)} cells")
+    assert len(binned_lats) == 1 and abs(binned_lats.pop() - 51.5) < 1e-5
+
+    print("✅ Geo index test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_geo_index()
+    sys.exit(0 if success else 1)
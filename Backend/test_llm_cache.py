@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test the persistent LLM response cache: hits and misses, TTL expiry,
+size-bound LRU eviction, that only completed responses are stored, and that
+cached responses keep the upstream response id
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+from llm_cache import LLMResponseCache
+
+
+class FakeUsage:
+    def __init__(self, input_tokens, output_tokens):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+
+class FakeResponse:
+    def __init__(self, output_text, status='completed', id=None):
+        self.id = id
+        self.output_text = output_text
+        self.status = status
+        self.usage = FakeUsage(100, 20)
+
+
+def test_llm_cache():
+    """Hit, miss, TTL and size-bound eviction"""
+    print("🧪 Testing LLM response cache...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'llm_cache.sqlite3')
+
+        # Miss, then a hit that reports the tokens and latency it saved
+        cache = LLMResponseCache(path=path, ttl=60, max_bytes=1000, enabled=True)
+        assert cache.get('gpt-test', 'prompt') is None
+        cache.set('gpt-test', 'prompt', FakeResponse('answer'), latency=2.0)
+        hit = cache.get('gpt-test', 'prompt')
+        assert hit.output_text == 'answer' and hit.cached and hit.usage.total_tokens == 120
+        assert cache.get('other-model', 'prompt') is None
+        stats = cache.snapshot()
+        print(f"📊 Stats: {stats}")
+        assert stats['hits'] == 1 and stats['misses'] == 2 and stats['input_tokens_saved'] == 100
+        assert stats['entries'] == 1 and stats['size_bytes'] == len('answer')
+
+        # The upstream response id is replayed, so a cached chat turn can be chained
+        cache.set('gpt-test', 'chat turn', FakeResponse('hello', id='resp_123'), latency=1.0)
+        assert cache.get('gpt-test', 'chat turn').id == 'resp_123' and hit.id is None
+
+        # Incomplete or failed responses are never replayed
+        cache.set('gpt-test', 'truncated', FakeResponse('half an answ', status='incomplete'), latency=1.0)
+        cache.set('gpt-test', 'failed', FakeResponse('error', status='failed'), latency=1.0)
+        assert cache.get('gpt-test', 'truncated') is None and cache.get('gpt-test', 'failed') is None
+
+        # Replacing an entry keeps the stored size exact; a second process sees it
+        cache.set('gpt-test', 'prompt', FakeResponse('a longer answer'), latency=2.0)
+        assert LLMResponseCache(path=path, enabled=True).snapshot()['size_bytes'] == len('a longer answer') + len('hello')
+
+        # A store from before response ids were cached gets the column added
+        legacy = os.path.join(tmp, 'legacy.sqlite3')
+        conn = sqlite3.connect(legacy)
+        conn.execute("CREATE TABLE llm_cache (key TEXT PRIMARY KEY, model TEXT, output_text TEXT, input_tokens INTEGER, "
+                     "output_tokens INTEGER, latency REAL, size INTEGER, created REAL, last_access REAL)")
+        conn.execute("INSERT INTO llm_cache VALUES ('gpt-test:old', 'gpt-test', 'old', 1, 1, 1.0, 3, ?, ?)",
+                     (time.time(), time.time()))
+        conn.commit()
+        conn.close()
+        migrated = LLMResponseCache(path=legacy, ttl=60, enabled=True)
+        migrated.set('gpt-test', 'new', FakeResponse('new', id='resp_new'), latency=1.0)
+        assert migrated.enabled and migrated.get('gpt-test', 'new').id == 'resp_new'
+        assert migrated.snapshot()['entries'] == 2
+
+        # TTL expiry
+        short = LLMResponseCache(path=os.path.join(tmp, 'ttl.sqlite3'), ttl=0.05, enabled=True)
+        short.set('gpt-test', 'prompt', FakeResponse('answer'), latency=1.0)
+        time.sleep(0.1)
+        assert short.get('gpt-test', 'prompt') is None
+
+        # Over max_bytes, the least recently used entries are evicted
+        small = LLMResponseCache(path=os.path.join(tmp, 'small.sqlite3'), ttl=60, max_bytes=130, enabled=True)
+        for name in ('a', 'b', 'c'):
+            small.set('gpt-test', name, FakeResponse(name * 40), latency=1.0)
+            time.sleep(0.01)
+        assert small.get('gpt-test', 'a') is not None  # 'a' is now more recent than 'b'
+        time.sleep(0.01)
+        small.set('gpt-test', 'd', FakeResponse('d' * 40), latency=1.0)
+        kept = [name for name in 'abcd' if small.get('gpt-test', name) is not None]
+        stats = small.snapshot()
+        print(f"🧹 Kept {kept}, {stats['size_bytes']} bytes, {stats['evictions']} evicted")
+        assert kept == ['a', 'c', 'd'] and stats['size_bytes'] == 120 and stats['evictions'] == 1
+
+    print("✅ LLM response cache test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_llm_cache()
+    sys.exit(0 if success else 1)
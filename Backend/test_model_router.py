@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test model routing for chat replies against a local fake OpenAI server:
+slow primaries fall back within the budget without tripping the OpenAI
+circuit breaker, and a skipped primary is retried once its failures age out
+"""
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+from openai import OpenAI
+import chatgpt_analysis
+from model_router import ModelRouter, ModelRoute
+from circuit_breaker import OPENAI_BREAKER
+from llm_metrics import llm_usage
+
+# Models the fake server answers slowly, in seconds
+SLOW_MODELS = {'slow-primary': 2.0}
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal /v1/responses endpoint that echoes the model name"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        model = body['model']
+        time.sleep(SLOW_MODELS.get(model, 0))
+        payload = {
+            'id': 'resp_test',
+            'object': 'response',
+            'created_at': int(time.time()),
+            'model': model,
+            'status': 'completed',
+            'output': [{
+                'type': 'message',
+                'id': 'msg_test',
+                'role': 'assistant',
+                'status': 'completed',
+                'content': [{'type': 'output_text', 'text': f'reply from {model}', 'annotations': []}],
+            }],
+            'usage': {
+                'input_tokens': 120,
+                'input_tokens_details': {'cached_tokens': 100},
+                'output_tokens': 30,
+                'output_tokens_details': {'reasoning_tokens': 0},
+                'total_tokens': 150,
+            },
+            'parallel_tool_calls': True,
+            'tool_choice': 'auto',
+            'tools': [],
+        }
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up on a slow model
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def routed_reply(router, purpose):
+    return router.call(
+        purpose,
+        chatgpt_analysis.create_response,
+        instructions=chatgpt_analysis.CHAT_INSTRUCTIONS,
+        input=f"**USER INQUIRY:** routing test {time.time()}"
+    )
+
+
+def test_chat_routing_with_latency_budget():
+    """Fast primary is used; a slow primary falls back within the budget"""
+    print("🧪 Testing model routing against a fake OpenAI server...")
+    server = start_fake_server()
+    original_client = chatgpt_analysis.client
+    original_cache = chatgpt_analysis.llm_cache.enabled
+    chatgpt_analysis.client = OpenAI(
+        api_key='test-key', base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0
+    )
+    chatgpt_analysis.llm_cache.enabled = False
+
+    try:
+        router = ModelRouter([
+            ModelRoute('chat', 'fast-primary', 'fast-fallback', latency_budget=5),
+            ModelRoute('slow', 'slow-primary', 'fast-fallback', latency_budget=0.5),
+        ], min_samples=2)
+
+        response = routed_reply(router, 'chat')
+        print(f"📄 Chat reply: {response.output_text}")
+        assert response.output_text == 'reply from fast-primary'
+
+        breaker_before = OPENAI_BREAKER.snapshot()
+        started = time.monotonic()
+        response = routed_reply(router, 'slow')
+        elapsed = time.monotonic() - started
+        print(f"📄 Slow-route reply: {response.output_text} in {elapsed:.2f}s")
+        assert response.output_text == 'reply from fast-fallback'
+        assert elapsed < SLOW_MODELS['slow-primary']
+
+        # The router's own timeout is not an OpenAI failure
+        breaker_after = OPENAI_BREAKER.snapshot()
+        print(f"🔌 OpenAI breaker before {breaker_before}, after {breaker_after}")
+        assert breaker_after['failures'] == breaker_before['failures']
+
+        # After repeated failures the slow primary is skipped entirely
+        routed_reply(router, 'slow')
+        assert router.models_for('slow') == ['fast-fallback']
+
+        metrics = llm_usage.snapshot()
+        print(f"📊 Metrics: {metrics}")
+        assert metrics['fast-fallback']['calls'] >= 2
+        assert metrics['slow-primary']['errors'] >= 1
+        assert metrics['fast-primary']['cached_input_tokens'] >= 100
+        print("✅ Model routing test passed!")
+        return True
+    finally:
+        chatgpt_analysis.client = original_client
+        chatgpt_analysis.llm_cache.enabled = original_cache
+        server.shutdown()
+
+
+def test_primary_recovers():
+    """Failures age out of the window, so a skipped primary gets traffic again"""
+    print("🧪 Testing primary model recovery...")
+    router = ModelRouter([ModelRoute('chat', 'primary', 'fallback', latency_budget=5)],
+                         min_samples=2, window_seconds=0.2)
+    for _ in range(3):
+        router._record('primary', 0.1, False)
+    assert router.models_for('chat') == ['fallback']
+    time.sleep(0.25)
+    assert router.models_for('chat') == ['primary', 'fallback']
+    assert router.snapshot()['chat']['primary_healthy']
+    print("✅ Primary model recovery test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_chat_routing_with_latency_budget() and test_primary_recovers()
+    sys.exit(0 if success else 1)
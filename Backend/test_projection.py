@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test ingest-time projection: projected Qloo responses are much smaller, yet
+every chart, the analysis summary and the spatial index are unchanged
+"""
+import os
+import sys
+import copy
+import json
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+from projection import project_response, raw_responses, declare_fields, field_tree, project
+from city_snapshot import estimate_size
+from chatgpt_analysis import prepare_data_summary
+from geo_index import build_index
+from visualizations import QlooVisualizer
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'qloo_london.json')
+
+
+def with_raw_fields(response):
+    """The fixture plus the bulky fields real insights responses carry"""
+    response = copy.deepcopy(response)
+    response['query'] = {'localities': {'filter': [{'name': 'London', 'entity_id': 'L1', 'geohash': 'gcpvj'}]},
+                         'signal': {'demographics': {'age': '35_and_younger'}}}
+    for entity in response['results']['entities']:
+        entity.setdefault('properties', {}).update({
+            'description': 'A long description of the venue. ' * 20,
+            'short_description': 'Short description.',
+            'image': {'url': 'https://images.example.com/' + 'x' * 80},
+            'hours': {day: [{'opens': 'T09:00', 'closes': 'T22:00'}] for day in ('Monday', 'Tuesday', 'Sunday')},
+            'phone': '+44 20 0000 0000',
+            'websites': ['https://example.com'],
+        })
+        for tag in entity['tags']:
+            tag.update({'type': 'urn:tag:category', 'value': tag.get('tag_id')})
+        entity['external'] = {'tripadvisor': [{'id': '123', 'rating': 4.5, 'review_count': 1000}]}
+    return response
+
+
+def charts_and_summary(brands, places):
+    visualizer = QlooVisualizer()
+    visualizer.set_data(brands, places)
+    charts = visualizer.generate_all_visualizations('London', 'GB')
+    summary = prepare_data_summary(brands['results']['entities'], places['results']['entities'], 'London', 'GB')
+    return charts, summary, build_index(places).query()
+
+
+def test_projection():
+    """Projection keeps every declared field and drops the rest"""
+    print("🧪 Testing field projection...")
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+    raw_brands = with_raw_fields(fixture['brands'])
+    raw_places = with_raw_fields(fixture['places'])
+
+    brands = project_response(raw_brands, 'brand')
+    places = project_response(raw_places, 'place')
+    raw_size = estimate_size(raw_brands) + estimate_size(raw_places)
+    projected_size = estimate_size(brands) + estimate_size(places)
+    print(f"📏 Retained size: raw {raw_size // 1024} KB, projected {projected_size // 1024} KB")
+    assert projected_size * 2 < raw_size
+
+    assert 'description' not in places['results']['entities'][0]['properties']
+    assert places['query'] == {'localities': {'filter': [{'name': 'London'}]}}
+    assert places['results']['entities'][0]['location'] == raw_places['results']['entities'][0]['location']
+    assert charts_and_summary(brands, places) == charts_and_summary(raw_brands, raw_places)
+
+    # Raw fallback for debugging
+    with raw_responses():
+        assert project_response(raw_places, 'place') is raw_places
+
+    # A whole-field declaration wins over narrower ones
+    declare_fields('test', 'a', ['properties.hours.Monday'])
+    declare_fields('test', 'b', ['properties.hours'])
+    entity = raw_places['results']['entities'][0]
+    assert project(entity, field_tree('test')) == {'properties': {'hours': entity['properties']['hours']}}
+
+    print("✅ Field projection test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_projection()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the shared token bucket: two processes drawing from the same SQLite
+store stay within one bucket's rate, snapshot() never writes the store, and
+a failing store falls back to the per-process bucket
+"""
+import os
+import sys
+import time
+import tempfile
+import sqlite3
+import multiprocessing
+
+from rate_limiter import TokenBucketLimiter, RateLimitExceeded
+
+RATE = 5.0
+CAPACITY = 5.0
+DURATION = 1.5
+
+
+def draw_tokens(store_path, start, results):
+    """Take every token this process can get for DURATION seconds"""
+    limiter = TokenBucketLimiter('shared', rate=RATE, capacity=CAPACITY, store_path=store_path, max_wait=0.05)
+    start.wait()
+    began = time.time()
+    granted = 0
+    while time.time() - began < DURATION:
+        try:
+            limiter.acquire()
+            granted += 1
+        except RateLimitExceeded:
+            pass
+    results.put((granted, began, time.time()))
+
+
+def test_rate_limiter():
+    """Two processes on one store share a single bucket"""
+    print("🧪 Testing shared rate limiter...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, 'ratelimit.sqlite3')
+        TokenBucketLimiter('shared', rate=RATE, capacity=CAPACITY, store_path=store_path)
+
+        start = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=draw_tokens, args=(store_path, start, results)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        start.set()
+        outcomes = [results.get(timeout=30) for _ in workers]
+        for worker in workers:
+            worker.join(10)
+
+        granted = sum(count for count, _, _ in outcomes)
+        elapsed = max(end for _, _, end in outcomes) - min(began for _, began, _ in outcomes)
+        allowed = CAPACITY + RATE * elapsed
+        print(f"🪣 Granted {granted} tokens across 2 processes in {elapsed:.2f}s (bucket allows {allowed:.1f})")
+        assert all(count > 0 for count, _, _ in outcomes)
+        assert granted <= allowed + 1
+
+        # snapshot() reads the shared state without changing it
+        limiter = TokenBucketLimiter('shared', rate=RATE, capacity=CAPACITY, store_path=store_path)
+        before = limiter._read_state()
+        limiter.snapshot()
+        assert limiter._read_state() == before
+
+        # A broken store falls back to the per-process bucket instead of raising
+        def broken_connection():
+            raise sqlite3.OperationalError("database is locked")
+        limiter._connection = broken_connection
+        assert limiter.acquire() >= 0
+        stats = limiter.snapshot()
+        print(f"🔒 Store unavailable: {stats['store_errors']} store errors, {stats['granted']} granted")
+        assert stats['store_errors'] >= 2 and stats['granted'] == 1
+
+    print("✅ Shared rate limiter test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_rate_limiter()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test the in-memory response cache (TTL expiry, LRU eviction, stale copies)
+and that charts are only cached when built from complete, fresh Qloo data
+"""
+import os
+import sys
+import copy
+import json
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+import response_cache
+from response_cache import ResponseCache, visualization_cache, make_key
+from visualizations import stream_city_visualizations, generate_city_visualizations
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'qloo_london.json')
+
+
+class FakeClock:
+    """Stands in for the `time` module inside response_cache"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_response_cache():
+    """TTL expiry, LRU eviction and stale-copy serving"""
+    print("🧪 Testing response cache...")
+    original_time = response_cache.time
+    clock = response_cache.time = FakeClock()
+    try:
+        cache = ResponseCache('test', ttl=10, stale_ttl=100, max_entries=2)
+
+        # Fresh within the TTL; past it only the stale copy is served
+        cache.set('a', 1)
+        clock.now += 5
+        assert cache.get('a') == 1 and cache.get_stale('a') == 1
+        clock.now += 10
+        assert cache.get('a') is None and cache.get_stale('a') == 1
+
+        # Past the stale retention the entry is gone
+        clock.now += 100
+        assert cache.get_stale('a') is None and len(cache) == 0
+
+        # LRU: a lookup refreshes an entry, the least recently used one is evicted
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+        assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+        print(f"🧹 Kept {len(cache)} of 3 entries after eviction")
+    finally:
+        response_cache.time = original_time
+
+    print("✅ Response cache test passed!")
+    return True
+
+
+def test_visualization_caching():
+    """Charts from partial or stale data are flagged and not cached"""
+    print("🧪 Testing visualization caching...")
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+    brands, places = fixture['brands'], fixture['places']
+
+    for flag in ('partial', 'stale'):
+        city = f'London-{flag}-{os.getpid()}'
+        degraded = dict(copy.deepcopy(places), **{flag: True})
+        events = list(stream_city_visualizations(city, 'GB', 20, city_data=(brands, degraded)))
+        complete = events[-1]
+        print(f"⚠️ {flag}: {len(complete['charts'])} charts, partial={complete['partial']}, stale={complete['stale']}")
+        assert complete['charts'] and complete[flag]
+        assert visualization_cache.get(make_key(city, 'GB', 20)) is None
+
+    city = f'London-complete-{os.getpid()}'
+    viz_data = generate_city_visualizations(city, 'GB', 20, city_data=(brands, places))
+    assert viz_data and 'partial' not in viz_data and 'stale' not in viz_data
+    assert visualization_cache.get(make_key(city, 'GB', 20)) == viz_data
+
+    print("✅ Visualization caching test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_response_cache() and test_visualization_caching()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test the shared retry policy on a fake clock: Retry-After is honoured,
+retryable 5xx are retried with bounded backoff, and the request deadline
+ends retries early
+"""
+import sys
+import email.utils
+
+import requests
+
+import retry_policy
+from retry_policy import RetryPolicy, DeadlineExceeded, deadline_scope, parse_retry_after, cut_short_by_caller
+
+
+class FakeClock:
+    """Stands in for the `time` module inside retry_policy; sleep() advances the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1_700_000_000.0 + self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_error(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return requests.exceptions.HTTPError(f"{status} error", response=response)
+
+
+def failing(errors, result='ok', clock=None, duration=0.0):
+    """Operation raising `errors` in turn, then returning `result`; records its timeouts"""
+    calls = []
+    def operation(timeout):
+        calls.append(timeout)
+        if clock is not None:
+            clock.now += duration
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return operation, calls
+
+
+def test_retry_policy():
+    """Backoff, Retry-After parsing and deadline expiry"""
+    print("🧪 Testing retry policy...")
+    original_time = retry_policy.time
+    clock = retry_policy.time = FakeClock()
+    try:
+        # Retry-After as seconds or as an HTTP date
+        assert parse_retry_after({'Retry-After': '7'}) == 7.0
+        date = email.utils.formatdate(clock.time() + 30, usegmt=True)
+        assert abs(parse_retry_after({'Retry-After': date}) - 30) <= 1
+        assert parse_retry_after({'Retry-After': 'soon'}) is None
+        assert parse_retry_after({}) is None
+
+        policy = RetryPolicy('test', max_attempts=3, base_delay=0.5, max_delay=10.0, attempt_timeout=30.0)
+
+        # 429 with Retry-After: wait at least as long as the upstream asked
+        operation, calls = failing([http_error(429, '7')])
+        assert policy.call(operation) == 'ok'
+        print(f"⏳ 429 retried after {clock.sleeps[-1]:.2f}s")
+        assert len(calls) == 2 and clock.sleeps[-1] >= 7.0
+
+        # Retryable 5xx: jittered exponential backoff within its bounds
+        clock.sleeps.clear()
+        operation, calls = failing([http_error(503), http_error(502)])
+        assert policy.call(operation) == 'ok'
+        print(f"⏳ 5xx backoffs: {[round(s, 2) for s in clock.sleeps]}")
+        assert len(calls) == 3 and 0 <= clock.sleeps[0] <= 0.5 and 0 <= clock.sleeps[1] <= 1.0
+
+        # Exhausted retries re-raise the last error; non-retryable errors are not retried
+        operation, calls = failing([http_error(500)] * 3)
+        try:
+            policy.call(operation)
+            assert False, "Exhausted retries did not raise"
+        except requests.exceptions.HTTPError as e:
+            assert e.response.status_code == 500 and len(calls) == 3
+        operation, calls = failing([http_error(401)])
+        try:
+            policy.call(operation)
+            assert False, "401 did not raise"
+        except requests.exceptions.HTTPError:
+            assert len(calls) == 1
+
+        # Deadline: attempts get the remaining budget as their timeout, and a
+        # Retry-After longer than the budget ends the retries without sleeping
+        clock.sleeps.clear()
+        with deadline_scope(5):
+            operation, calls = failing([http_error(429, '10')])
+            try:
+                policy.call(operation)
+                assert False, "Retry past the deadline"
+            except requests.exceptions.HTTPError:
+                pass
+            assert calls == [5.0] and clock.sleeps == []
+
+        # Slow attempts use up the budget: the next attempt is refused
+        with deadline_scope(5):
+            operation, calls = failing([http_error(503)] * 3, clock=clock, duration=6.0)
+            try:
+                policy.call(operation)
+                assert False, "Attempt started after the deadline"
+            except requests.exceptions.HTTPError:
+                print(f"⌛ Deadline ended retries after {len(calls)} attempt(s)")
+            assert len(calls) == 1
+
+        # An expired deadline refuses the first attempt outright
+        with deadline_scope(5):
+            clock.now += 6
+            operation, calls = failing([])
+            try:
+                policy.call(operation)
+                assert False, "Attempt started after the deadline"
+            except DeadlineExceeded as e:
+                print(f"⌛ {e}")
+            assert calls == []
+
+        # Timeouts are the caller's only when a soft deadline set the attempt's limit and ran out
+        timeout = requests.exceptions.Timeout("read timed out")
+        with deadline_scope(5, soft=True):
+            assert not cut_short_by_caller(timeout)
+            clock.now += 5
+            assert cut_short_by_caller(timeout) and not cut_short_by_caller(http_error(503))
+        with deadline_scope(5):
+            clock.now += 5
+            assert not cut_short_by_caller(timeout)
+        with deadline_scope(5):
+            with deadline_scope(10, soft=True):  # The outer request deadline stays in charge
+                clock.now += 5
+                assert not cut_short_by_caller(timeout)
+    finally:
+        retry_policy.time = original_time
+
+    print("✅ Retry policy test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_retry_policy()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test speculative analysis: background generation runs inside the shared LLM
+bulkhead, and while the bulkhead is full it yields to interactive requests
+instead of queueing for a slot
+"""
+import os
+import sys
+import time
+import threading
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+import chatgpt_analysis
+import speculative_analysis
+from speculative_analysis import SpeculativeAnalyzer
+from bulkhead import LLM_BULKHEAD
+
+
+def test_speculative_analysis():
+    """Speculative work waits for a free LLM slot and never exceeds the cap"""
+    print("🧪 Testing speculative analysis...")
+    original = chatgpt_analysis.analyze_business_environment, speculative_analysis.SPECULATIVE_BUSY_BACKOFF
+    active_during_call = []
+    called = threading.Event()
+    def fake_analysis(city_name, country_code, limit):
+        active_during_call.append(LLM_BULKHEAD.snapshot()['active'])
+        called.set()
+        return {'success': True, 'analysis': 'text'}
+    chatgpt_analysis.analyze_business_environment = fake_analysis
+    speculative_analysis.SPECULATIVE_BUSY_BACKOFF = 0.05
+
+    held = 0
+    try:
+        # Interactive requests hold every LLM slot
+        for _ in range(LLM_BULKHEAD.max_concurrent):
+            LLM_BULKHEAD.acquire()
+            held += 1
+        analyzer = SpeculativeAnalyzer(enabled=True, workers=1)
+        assert analyzer.submit(f'Speculopolis-{time.time_ns()}', 'ZZ')
+        time.sleep(0.3)
+        stats = analyzer.snapshot()
+        print(f"⏸️ Bulkhead full: {stats}")
+        assert not called.is_set() and stats['deferred'] > 0 and stats['queued'] == 1
+
+        # A free slot lets the deferred task run, inside the bulkhead
+        LLM_BULKHEAD.release()
+        held -= 1
+        assert called.wait(5)
+        time.sleep(0.1)
+        stats = analyzer.snapshot()
+        print(f"▶️ Slot freed: {stats}, active during the call: {active_during_call}")
+        assert stats['completed'] == 1 and active_during_call == [LLM_BULKHEAD.max_concurrent]
+    finally:
+        for _ in range(held):
+            LLM_BULKHEAD.release()
+        chatgpt_analysis.analyze_business_environment, speculative_analysis.SPECULATIVE_BUSY_BACKOFF = original
+
+    print("✅ Speculative analysis test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_speculative_analysis()
+    sys.exit(0 if success else 1)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
-Test script to verify Flask app startup
+Test script to verify Flask app startup, and that a chart stream that
+yields nothing ends cleanly
 """
 import os
 import sys
@@ -26,6 +27,24 @@ def test_app_startup():
             print("❌ Health check failed!")
             return False
 
+def test_empty_stream():
+    """A visualization stream with no events closes without an error"""
+    print("🧪 Testing an empty visualization stream...")
+    app_module = sys.modules['app']
+    original = app_module.stream_city_visualizations
+    app_module.stream_city_visualizations = lambda *args, **kwargs: iter(())
+    try:
+        with app.test_client() as client:
+            response = client.post('/api/visualizations/stream', json={'city': 'Emptyville', 'country': 'ZZ'})
+            body = response.get_data(as_text=True)
+            response.close()
+    finally:
+        app_module.stream_city_visualizations = original
+    print(f"🌊 Empty stream: {response.status_code}, {body!r}")
+    assert response.status_code == 200 and body == ''
+    print("✅ Empty stream test passed!")
+    return True
+
 if __name__ == '__main__':
-    success = test_app_startup()
+    success = test_app_startup() and test_empty_stream()
     sys.exit(0 if success else 1) 
\ No newline at end of file
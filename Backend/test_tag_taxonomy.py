@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Equivalence test: the compiled tag classifier assigns every place the same
+families as the substring checks the charts used to run on the joined tag
+names, for random tags with overlapping keywords, mixed case and no names
+"""
+import sys
+import random
+
+from tag_taxonomy import TagClassifier, TagClass, TAXONOMY
+
+FRAGMENTS = ['Wine Bar', 'barbecue', 'Cafeteria', 'Restaurant', 'street food', 'Coffee Shop', 'department store',
+             'RETAIL', 'Office Supplies', 'Business Hotel', 'professional services', 'Luxury', 'premium brands',
+             'High-End', 'accommodation', 'outdoor', 'Park', 'beach club', 'museum', 'gallery', 'Foodhall',
+             'bar-restaurant', 'Barista', 'Hotel Bar', 'spark', '']
+
+
+def baseline_has(place, keywords):
+    """The check the hours, price range and seasonal charts ran for each keyword family"""
+    tag_names = [tag.get('name', '').lower() for tag in place.get('tags', [])]
+    return any(word in ' '.join(tag_names) for word in keywords)
+
+
+def random_place(rng, index):
+    tags = []
+    for _ in range(rng.randint(0, 4)):
+        name = ' '.join(rng.sample(FRAGMENTS, rng.randint(1, 2))).strip()
+        tag = {'tag_id': f'urn:tag:test:{name.lower()}'}
+        if name or rng.random() < 0.5:
+            tag['name'] = name
+        tags.append(tag)
+    return {'name': f'Place {index}', 'tags': tags}
+
+
+def test_tag_taxonomy():
+    """Classifier bits match the original substring checks"""
+    print("🧪 Testing tag classifier...")
+    rng = random.Random(45)
+    classifier = TagClassifier()
+    places = [random_place(rng, i) for i in range(2000)]
+    places.append({'name': 'No tags'})
+
+    for _ in range(2):  # The second round is served from the per-tag cache
+        for place in places:
+            classes = classifier.classify_entity(place)
+            for tag_class, keywords in TAXONOMY.items():
+                assert bool(classes & tag_class) == baseline_has(place, keywords), (place, tag_class)
+
+    stats = classifier.snapshot()
+    print(f"🏷️ {len(places)} places classified twice: {stats}")
+    assert stats['hits'] > stats['misses']
+
+    # Overlapping keywords all count: "bar-restaurant" and "Hotel Bar"
+    assert classifier.classify_name('bar-restaurant') == TagClass.FOOD | TagClass.DINING
+    assert classifier.classify_name('Hotel Bar') == TagClass.FOOD | TagClass.DINING | TagClass.HOTEL
+    assert classifier.classify_name('museum') == TagClass.NONE
+
+    print("✅ Tag classifier test passed!")
+    return True
+
+
+if __name__ == '__main__':
+    success = test_tag_taxonomy()
+    sys.exit(0 if success else 1)
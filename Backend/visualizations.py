@@ -3,19 +3,64 @@ import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import os
 import json
-import time
-import random
+import hashlib
 from collections import Counter
 import numpy as np
-from qloo_analysis import get_brands, get_places, format_brands_output, get_formatted_place_data
+import fast_figures
+import chart_data
+import aggregations
+from tag_taxonomy import TagClass, tag_classifier
+from geo_index import build_index, geo_index_cache
+from city_snapshot import CitySnapshot, city_snapshots
+from projection import declare_fields
+from qloo_analysis import get_brands, iter_brands, iter_places, assemble_response, is_degraded
+from response_cache import visualization_cache, make_key, visualization_key
+
+# "fast" builds figures as plain dicts (fast_figures); "plotly" uses graph_objects
+FIGURE_BACKEND = os.getenv('FIGURE_BACKEND', 'fast')
+FIGURE_BACKENDS = {'fast': fast_figures, 'plotly': go}
+
+# Above this many points, scatter charts are binned on a grid instead of
+# sending one marker per entity, so payloads stay bounded at any limit
+SCATTER_POINT_THRESHOLD = int(os.getenv('SCATTER_POINT_THRESHOLD', 500))
+SCATTER_GRID_BINS = int(os.getenv('SCATTER_GRID_BINS', 40))
+# Categories beyond this are folded into "Other" in the competition chart
+MAX_CATEGORY_BUBBLES = int(os.getenv('MAX_CATEGORY_BUBBLES', 30))
+
+# Entity fields read by the chart builders; see projection.py
+declare_fields('brand', 'visualizations', ['name', 'popularity', 'tags.name'])
+declare_fields('place', 'visualizations', [
+    'name', 'tags.name', 'properties.business_rating', 'properties.address', 'properties.keywords.name'
+])
+
+def _bubble_sizes(counts, smallest=6, largest=30):
+    """Marker sizes for binned cells, by area proportional to the count"""
+    counts = np.asarray(counts, dtype=float)
+    if counts.size == 0:
+        return []
+    return (smallest + (largest - smallest) * np.sqrt(counts / counts.max())).round(1).tolist()
+
+# Salt for the chart RNG; change it to reshuffle every city's layout
+CHART_RNG_SEED = int(os.getenv('CHART_RNG_SEED', 0))
+
+def stable_seed(*parts):
+    """64-bit seed from a key that is the same in every process (unlike hash())"""
+    key = '|'.join(str(part).strip().lower() for part in parts)
+    return int.from_bytes(hashlib.sha256(key.encode('utf-8')).digest()[:8], 'little')
 
 # Set style for better-looking plots
 plt.style.use('seaborn-v0_8')
 sns.set_palette("husl")
 
 class QlooVisualizer:
-    def __init__(self):
+    def __init__(self, figure_backend=None, seed=None):
+        # Figure API used by the chart builders: fast dict specs or plotly graph_objects
+        self.go = FIGURE_BACKENDS[figure_backend or FIGURE_BACKEND]
+        # Salt of the per-chart generators (see rng)
+        self.seed = CHART_RNG_SEED if seed is None else seed
+        
         # Beautiful color palettes
         self.colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', 
                       '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9']
@@ -25,11 +70,15 @@ class QlooVisualizer:
         # Store pre-fetched data
         self.brands_data = None
         self.places_data = None
+        self._place_classes = None
+        self._geo_index = None
     
     def set_data(self, brands_data, places_data):
         """Set the pre-fetched data for visualization"""
         self.brands_data = brands_data
         self.places_data = places_data
+        self._place_classes = None
+        self._geo_index = None
         
         # Debug: Check what data we're setting
         brands_count = len(brands_data.get('results', {}).get('entities', [])) if brands_data else 0
@@ -48,6 +97,54 @@ class QlooVisualizer:
         else:
             print(f"[Visualizer] ⚠️ Set places data: {places_count} places (no valid data)")
     
+    def set_entity_streams(self, brand_stream, place_stream):
+        """
+        Consume paginated entity streams (see qloo_analysis.EntityStream) and set
+        them as the visualization data. The pages of both streams are already
+        in flight; places are consumed first and each place's tags are
+        classified as its page arrives, while later pages are still being
+        fetched. Stale and partial streams are flagged as in assemble_response.
+        """
+        place_classes = []
+        try:
+            places_data = assemble_response(
+                place_stream, lambda place: place_classes.append(tag_classifier.classify_entity(place))
+            )
+        except Exception:
+            brand_stream.cancel()
+            raise
+        brands_data = assemble_response(brand_stream)
+        self.set_data(brands_data, places_data)
+        if places_data is not None:
+            self._place_classes = place_classes
+        return brands_data, places_data
+
+    def set_snapshot(self, snapshot):
+        """Read from a shared CitySnapshot, reusing its parsed tag classes and spatial index"""
+        self.set_data(snapshot.brands_data, snapshot.places_data)
+        self._place_classes = snapshot.place_classes
+        self._geo_index = snapshot.geo_index
+
+    def place_classes(self):
+        """TagClass bitmask of every place, classified once per visualizer"""
+        if self._place_classes is None:
+            self._place_classes = [tag_classifier.classify_entity(place) for place in self.places_data['results']['entities']]
+        return self._place_classes
+
+    def rng(self, chart, city_name, country_code=''):
+        """
+        Private generator for one chart of one city, seeded from a stable key:
+        identical inputs give identical charts in any process and build order,
+        and no global random state is shared between threads.
+        """
+        return np.random.default_rng(stable_seed(self.seed, chart, city_name, country_code))
+
+    def geo_index(self):
+        """Spatial index of the located places, built once per visualizer"""
+        if self._geo_index is None:
+            self._geo_index = build_index(self.places_data)
+        return self._geo_index
+
     def get_top_rated_places(self, limit=5):
         """Extract and sort the top N places by rating."""
         print(f"[Visualizer]  extracting top {limit} rated places")
@@ -68,9 +165,9 @@ class QlooVisualizer:
                 except (ValueError, TypeError, IndexError):
                     continue
         
-        # Sort by rating descending and return top N
-        sorted_places = sorted(places_with_ratings, key=lambda p: p['rating'], reverse=True)
-        return sorted_places[:limit]
+        # Top N by rating, without sorting every place
+        top = aggregations.top_k([p['rating'] for p in places_with_ratings], limit)
+        return [places_with_ratings[i] for i in top]
 
     def create_keyword_word_cloud(self, city_name):
         """Create a word cloud from place tags and keywords."""
@@ -94,12 +191,13 @@ class QlooVisualizer:
         word_counts = Counter(words)
         top_words = dict(word_counts.most_common(40))
 
-        # Generate random colors for the words
-        colors = [f'hsl({np.random.randint(0, 360)}, 70%, 50%)' for _ in range(len(top_words))]
+        # Generate random colors and positions for the words
+        rng = self.rng('keyword_word_cloud', city_name)
+        colors = [f'hsl({hue}, 70%, 50%)' for hue in rng.integers(0, 360, len(top_words))]
 
-        fig = go.Figure(go.Scatter(
-            x=np.random.rand(len(top_words)),
-            y=np.random.rand(len(top_words)),
+        fig = self.go.Figure(self.go.Scatter(
+            x=rng.random(len(top_words)),
+            y=rng.random(len(top_words)),
             mode='text',
             text=list(top_words.keys()),
             textfont=dict(
@@ -147,9 +245,9 @@ class QlooVisualizer:
         }).sort_values('Popularity (%)', ascending=True)
         
         # Create beautiful horizontal bar chart
-        fig = go.Figure()
+        fig = self.go.Figure()
         
-        fig.add_trace(go.Bar(
+        fig.add_trace(self.go.Bar(
             x=df['Popularity (%)'],
             y=df['Brand'],
             orientation='h',
@@ -222,9 +320,9 @@ class QlooVisualizer:
         print(f"[Visualizer] Top tags for {city_name}: {list(top_tags.keys())}")
         
         # Create beautiful pie chart
-        fig = go.Figure()
+        fig = self.go.Figure()
         
-        fig.add_trace(go.Pie(
+        fig.add_trace(self.go.Pie(
             values=list(top_tags.values()),
             labels=list(top_tags.keys()),
             hole=0.4,  # Donut chart
@@ -287,18 +385,23 @@ class QlooVisualizer:
         
         print(f"[Visualizer] Found {len(ratings)} valid ratings for {city_name}")
         
-        # Create beautiful histogram
-        fig = go.Figure()
+        # Bin on the server so the payload carries 10 counts, not every rating
+        edges, counts = aggregations.histogram(ratings, bins=10)
+        
+        # Create beautiful histogram (pre-binned bars)
+        fig = self.go.Figure()
         
-        fig.add_trace(go.Histogram(
-            x=ratings,
-            nbinsx=10,
+        fig.add_trace(self.go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=float(edges[1] - edges[0]),
+            customdata=[f'{low:.2f} - {high:.2f}' for low, high in zip(edges[:-1], edges[1:])],
             marker=dict(
                 color='#4ECDC4',
                 line=dict(color='white', width=1)
             ),
             opacity=0.8,
-            hovertemplate='<b>Rating Range</b><br>Count: %{y}<br>Rating: %{x}<extra></extra>'
+            hovertemplate='<b>Rating Range</b><br>Count: %{y}<br>Rating: %{customdata}<extra></extra>'
         ))
         
         fig.update_layout(
@@ -359,9 +462,9 @@ class QlooVisualizer:
         }).sort_values('Count', ascending=True)
         
         # Create beautiful horizontal bar chart
-        fig = go.Figure()
+        fig = self.go.Figure()
         
-        fig.add_trace(go.Bar(
+        fig.add_trace(self.go.Bar(
             x=df['Count'],
             y=df['Category'],
             orientation='h',
@@ -452,27 +555,48 @@ class QlooVisualizer:
         print(f"[Visualizer] Found {len(valid_businesses)} businesses with valid ratings for {city_name}")
         
         # Create scatter plot
-        fig = go.Figure()
+        fig = self.go.Figure()
         
         # Group by tag count for different colors
         tag_counts = [b['tag_count'] for b in valid_businesses]
         ratings = [b['rating'] for b in valid_businesses]
         names = [b['name'] for b in valid_businesses]
         
-        fig.add_trace(go.Scatter(
-            x=tag_counts,
-            y=ratings,
-            mode='markers',
-            marker=dict(
-                size=12,
-                color=ratings,
-                colorscale='Viridis',
-                showscale=True,
-                colorbar=dict(title="Rating", thickness=15, len=0.5, x=1.02)
-            ),
-            text=names,
-            hovertemplate='<b>%{text}</b><br>Rating: %{y}<br>Categories: %{x}<extra></extra>'
-        ))
+        if len(valid_businesses) > SCATTER_POINT_THRESHOLD:
+            # Too many markers: bin into (category count, rating) cells sized by business count
+            x_edges = np.arange(min(tag_counts) - 0.5, max(tag_counts) + 1.5)
+            cell_x, cell_y, cell_counts, _ = aggregations.grid_bin(
+                tag_counts, ratings, bins=[x_edges, SCATTER_GRID_BINS]
+            )
+            fig.add_trace(self.go.Scatter(
+                x=cell_x,
+                y=cell_y,
+                mode='markers',
+                marker=dict(
+                    size=_bubble_sizes(cell_counts),
+                    color=cell_y,
+                    colorscale='Viridis',
+                    showscale=True,
+                    colorbar=dict(title="Rating", thickness=15, len=0.5, x=1.02)
+                ),
+                text=[f'{count} businesses' for count in cell_counts],
+                hovertemplate='<b>%{text}</b><br>Rating: %{y:.2f}<br>Categories: %{x}<extra></extra>'
+            ))
+        else:
+            fig.add_trace(self.go.Scatter(
+                x=tag_counts,
+                y=ratings,
+                mode='markers',
+                marker=dict(
+                    size=12,
+                    color=ratings,
+                    colorscale='Viridis',
+                    showscale=True,
+                    colorbar=dict(title="Rating", thickness=15, len=0.5, x=1.02)
+                ),
+                text=names,
+                hovertemplate='<b>%{text}</b><br>Rating: %{y}<br>Categories: %{x}<extra></extra>'
+            ))
         
         fig.update_layout(
             title=dict(
@@ -511,20 +635,16 @@ class QlooVisualizer:
         # Simulate business hours data (since Qloo API doesn't provide this)
         # In a real implementation, you'd extract this from the API response
         hours_data = []
-        for place in self.places_data['results']['entities']:
-            properties = place.get('properties', {})
+        for classes in self.place_classes():
             # Simulate business hours based on place type
-            tags = place.get('tags', [])
-            tag_names = [tag.get('name', '').lower() for tag in tags]
-            
             # Assign typical hours based on business type
-            if any(word in ' '.join(tag_names) for word in ['restaurant', 'cafe', 'bar', 'food']):
+            if classes & TagClass.FOOD:
                 # Food establishments: 6 AM - 11 PM
                 hours = list(range(6, 23))
-            elif any(word in ' '.join(tag_names) for word in ['shop', 'store', 'retail']):
+            elif classes & TagClass.RETAIL:
                 # Retail: 9 AM - 8 PM
                 hours = list(range(9, 20))
-            elif any(word in ' '.join(tag_names) for word in ['office', 'business', 'professional']):
+            elif classes & TagClass.OFFICE:
                 # Offices: 8 AM - 6 PM
                 hours = list(range(8, 18))
             else:
@@ -545,9 +665,9 @@ class QlooVisualizer:
         counts = [hour_counts.get(hour, 0) for hour in hours]
         
         # Create bar chart (heatmap alternative)
-        fig = go.Figure()
+        fig = self.go.Figure()
         
-        fig.add_trace(go.Bar(
+        fig.add_trace(self.go.Bar(
             x=hours,
             y=counts,
             marker=dict(
@@ -597,12 +717,11 @@ class QlooVisualizer:
             return None
         
         # Simulate price ranges based on business type and rating
-        price_data = []
-        for place in self.places_data['results']['entities']:
+        base_prices = []
+        ratings = []
+        for place, classes in zip(self.places_data['results']['entities'], self.place_classes()):
             properties = place.get('properties', {})
             rating = properties.get('business_rating', 'N/A')
-            tags = place.get('tags', [])
-            tag_names = [tag.get('name', '').lower() for tag in tags]
             
             # Assign price range based on business type and rating
             try:
@@ -611,35 +730,34 @@ class QlooVisualizer:
                 rating_float = 3.0
             
             # Base price on business type
-            if any(word in ' '.join(tag_names) for word in ['luxury', 'premium', 'high-end']):
+            if classes & TagClass.LUXURY:
                 base_price = 4
-            elif any(word in ' '.join(tag_names) for word in ['restaurant', 'cafe', 'bar']):
+            elif classes & TagClass.DINING:
                 base_price = 3
-            elif any(word in ' '.join(tag_names) for word in ['shop', 'store', 'retail']):
+            elif classes & TagClass.RETAIL:
                 base_price = 2
             else:
                 base_price = 2
             
-            # Adjust based on rating
-            price_level = min(5, max(1, base_price + (rating_float - 3.0) * 0.5))
-            price_data.append(price_level)
+            base_prices.append(base_price)
+            ratings.append(rating_float)
         
-        if not price_data:
+        if not base_prices:
             print(f"[Visualizer] No price data generated for {city_name}")
             return None
         
-        # Create price range categories
-        price_ranges = {
-            'Budget ($)': len([p for p in price_data if p <= 2]),
-            'Moderate ($$)': len([p for p in price_data if 2 < p <= 3.5]),
-            'Premium ($$$)': len([p for p in price_data if 3.5 < p <= 4.5]),
-            'Luxury ($$$$)': len([p for p in price_data if p > 4.5])
-        }
+        # Adjust based on rating, then count price bands in one pass
+        price_data = np.clip(np.array(base_prices) + (np.array(ratings) - 3.0) * 0.5, 1, 5)
+        band_counts = aggregations.band_counts(price_data, [2, 3.5, 4.5])
+        price_ranges = dict(zip(
+            ['Budget ($)', 'Moderate ($$)', 'Premium ($$$)', 'Luxury ($$$$)'],
+            band_counts.tolist()
+        ))
         
         # Create pie chart
-        fig = go.Figure()
+        fig = self.go.Figure()
         
-        fig.add_trace(go.Pie(
+        fig.add_trace(self.go.Pie(
             values=list(price_ranges.values()),
             labels=list(price_ranges.keys()),
             hole=0.4,
@@ -707,7 +825,7 @@ class QlooVisualizer:
             categories.append(category)
         
         # Create trend analysis with category grouping
-        fig = go.Figure()
+        fig = self.go.Figure()
         
         # Group by category
         category_data = {}
@@ -727,7 +845,7 @@ class QlooVisualizer:
         
         # Add traces for each category
         for category, data in category_data.items():
-            fig.add_trace(go.Scatter(
+            fig.add_trace(self.go.Scatter(
                 x=data['names'][:10],  # Top 10 per category
                 y=data['popularities'][:10],
                 mode='lines+markers',
@@ -782,36 +900,44 @@ class QlooVisualizer:
         entities = self.places_data['results']['entities']
         print(f"[Visualizer] Processing {len(entities)} place entities for geographic distribution")
         
-        # Simulate geographic coordinates around the city center
-        random.seed(hash(city_name))  # Consistent results for same city
-        
-        places = []
-        for place in self.places_data['results']['entities']:
-            properties = place.get('properties', {})
-            rating = properties.get('business_rating', 'N/A')
-            tags = place.get('tags', [])
-            # Safely get category - handle empty tags list
-            category = 'Other'
-            if tags and len(tags) > 0:
-                category = tags[0].get('name', 'Other')
-            
-            # Simulate coordinates within city bounds
-            lat_offset = random.uniform(-0.01, 0.01)
-            lng_offset = random.uniform(-0.01, 0.01)
-            
-            places.append({
-                'name': place.get('name', 'Unknown'),
-                'rating': float(rating) if rating != 'N/A' else 3.0,
-                'category': category,
-                'lat': 40.7128 + lat_offset,  # NYC coordinates as base
-                'lng': -74.0060 + lng_offset
-            })
+        # Real coordinates from the Qloo location payload; unlocated places are left out
+        index = self.geo_index()
+        if not len(index):
+            print(f"[Visualizer] No place coordinates for geographic distribution in {city_name}")
+            return None
+        if index.unlocated:
+            print(f"[Visualizer] Skipping {index.unlocated} places without coordinates in {city_name}")
+        
+        places = [
+            {
+                'name': point['name'],
+                'rating': point['rating'] if point['rating'] is not None else 3.0,
+                'category': point['category'],
+                'lat': point['lat'],
+                'lng': point['lon']
+            }
+            for point in index.points(range(len(index)))
+        ]
         
         # Create scatter map
-        fig = go.Figure()
-        
-        # Group by category for different colors
-        categories = list(set([p['category'] for p in places]))
+        fig = self.go.Figure()
+        
+        # One trace per category is capped at the palette size; the smallest
+        # categories share an "Other" trace instead of being dropped
+        labels = aggregations.top_n_labels([p['category'] for p in places], len(self.colors))
+        for place, label in zip(places, labels):
+            place['category'] = label
+        
+        # Above the point threshold every category is binned on one shared grid
+        binned = len(places) > SCATTER_POINT_THRESHOLD
+        if binned:
+            lngs = [p['lng'] for p in places]
+            lats = [p['lat'] for p in places]
+            grid = [aggregations.grid_edges(min(lngs), max(lngs), SCATTER_GRID_BINS),
+                    aggregations.grid_edges(min(lats), max(lats), SCATTER_GRID_BINS)]
+        
+        # Group by category for different colors (first-seen order, so colors are stable across processes)
+        categories = list(dict.fromkeys(p['category'] for p in places))
         colors = self.colors[:len(categories)]
         
         # Check if we have enough data
@@ -825,7 +951,28 @@ class QlooVisualizer:
             if i < len(colors):  # Safety check for colors
                 category_places = [p for p in places if p['category'] == category]
                 
-                fig.add_trace(go.Scatter(
+                if binned:
+                    cell_x, cell_y, cell_counts, cell_ratings = aggregations.grid_bin(
+                        [p['lng'] for p in category_places], [p['lat'] for p in category_places],
+                        bins=grid, weights=[p['rating'] for p in category_places]
+                    )
+                    fig.add_trace(self.go.Scatter(
+                        x=cell_x,
+                        y=cell_y,
+                        mode='markers',
+                        name=category,
+                        marker=dict(
+                            size=_bubble_sizes(cell_counts),
+                            color=colors[i],
+                            opacity=0.7,
+                            line=dict(color='white', width=1)
+                        ),
+                        customdata=np.column_stack([cell_counts, cell_ratings.round(2)]),
+                        hovertemplate='<b>%{customdata[0]} businesses</b><br>Avg Rating: %{customdata[1]:.1f}<br>Category: ' + category + '<extra></extra>'
+                    ))
+                    continue
+                
+                fig.add_trace(self.go.Scatter(
                     x=[p['lng'] for p in category_places],
                     y=[p['lat'] for p in category_places],
                     mode='markers',
@@ -886,7 +1033,8 @@ class QlooVisualizer:
             return None
         
         # Analyze competition by category
-        category_stats = {}
+        place_categories = []
+        place_ratings = []
         for place in self.places_data['results']['entities']:
             tags = place.get('tags', [])
             # Safely get category - handle empty tags list
@@ -896,33 +1044,23 @@ class QlooVisualizer:
             properties = place.get('properties', {})
             rating = properties.get('business_rating', 'N/A')
             
-            if category not in category_stats:
-                category_stats[category] = {
-                    'count': 0,
-                    'ratings': [],
-                    'avg_rating': 0
-                }
-            
-            category_stats[category]['count'] += 1
-            if rating != 'N/A':
-                try:
-                    category_stats[category]['ratings'].append(float(rating))
-                except (ValueError, TypeError):
-                    pass
-        
-        # Calculate average ratings
-        for category in category_stats:
-            ratings = category_stats[category]['ratings']
-            category_stats[category]['avg_rating'] = sum(ratings) / len(ratings) if ratings else 0
+            try:
+                rating_float = float(rating) if rating != 'N/A' else None
+            except (ValueError, TypeError):
+                rating_float = None
+            place_categories.append(category)
+            place_ratings.append(rating_float)
         
-        # Create bubble chart
-        categories = list(category_stats.keys())
-        counts = [category_stats[cat]['count'] for cat in categories]
-        avg_ratings = [category_stats[cat]['avg_rating'] for cat in categories]
+        # Count and average rating per category in one grouped pass, with the
+        # long tail of categories folded into "Other" to bound the bubble count
+        place_categories = aggregations.top_n_labels(place_categories, MAX_CATEGORY_BUBBLES)
+        categories, counts, avg_ratings = aggregations.group_count_mean(place_categories, place_ratings)
+        counts = counts.tolist()
+        avg_ratings = avg_ratings.tolist()
         
-        fig = go.Figure()
+        fig = self.go.Figure()
         
-        fig.add_trace(go.Scatter(
+        fig.add_trace(self.go.Scatter(
             x=counts,
             y=avg_ratings,
             mode='markers+text',
@@ -981,37 +1119,33 @@ class QlooVisualizer:
             'Winter': []
         }
         
-        for place in self.places_data['results']['entities']:
-            tags = place.get('tags', [])
-            tag_names = [tag.get('name', '').lower() for tag in tags]
-            properties = place.get('properties', {})
-            rating = properties.get('business_rating', 'N/A')
-            
+        rng = self.rng('seasonal_analysis', city_name, country_code)
+        for classes in self.place_classes():
             # Assign seasonal activity based on business type
             activity_score = 0
-            if any(word in ' '.join(tag_names) for word in ['restaurant', 'cafe', 'bar']):
+            if classes & TagClass.DINING:
                 activity_score = 0.8  # High year-round activity
-            elif any(word in ' '.join(tag_names) for word in ['hotel', 'accommodation']):
+            elif classes & TagClass.HOTEL:
                 activity_score = 0.9  # High year-round activity
-            elif any(word in ' '.join(tag_names) for word in ['outdoor', 'park', 'beach']):
+            elif classes & TagClass.OUTDOOR:
                 activity_score = 0.6  # Seasonal variation
             else:
                 activity_score = 0.7  # Moderate year-round activity
             
             # Add some seasonal variation
-            seasonal_data['Spring'].append(activity_score * (0.9 + 0.2 * random.random()))
-            seasonal_data['Summer'].append(activity_score * (1.0 + 0.3 * random.random()))
-            seasonal_data['Fall'].append(activity_score * (0.8 + 0.2 * random.random()))
-            seasonal_data['Winter'].append(activity_score * (0.7 + 0.2 * random.random()))
+            seasonal_data['Spring'].append(activity_score * (0.9 + 0.2 * rng.random()))
+            seasonal_data['Summer'].append(activity_score * (1.0 + 0.3 * rng.random()))
+            seasonal_data['Fall'].append(activity_score * (0.8 + 0.2 * rng.random()))
+            seasonal_data['Winter'].append(activity_score * (0.7 + 0.2 * rng.random()))
         
         # Calculate averages
         seasons = list(seasonal_data.keys())
         avg_activity = [sum(seasonal_data[season]) / len(seasonal_data[season]) for season in seasons]
         
         # Create seasonal chart
-        fig = go.Figure()
+        fig = self.go.Figure()
         
-        fig.add_trace(go.Scatter(
+        fig.add_trace(self.go.Scatter(
             x=seasons,
             y=avg_activity,
             mode='lines+markers',
@@ -1071,9 +1205,9 @@ class QlooVisualizer:
         
         df = pd.DataFrame(all_data)
         
-        fig = go.Figure()
+        fig = self.go.Figure()
         
-        fig.add_trace(go.Bar(
+        fig.add_trace(self.go.Bar(
             x=df['City'],
             y=df['Average Brand Popularity (%)'],
             marker=dict(
@@ -1113,88 +1247,224 @@ class QlooVisualizer:
         
         return fig
 
+    def chart_builders(self, city_name, country_code, limit=50):
+        """
+        (key, builder) pairs in delivery order: cheap summaries first, map and
+        multi-trace charts last, so a streaming client can paint early.
+        """
+        return [
+            ('top_rated_places', lambda: self.get_top_rated_places()),  # Data, not a chart
+            ('brand_popularity', lambda: self.create_brand_popularity_chart(city_name, country_code, limit)),
+            ('brand_categories', lambda: self.create_brand_categories_pie(city_name, country_code, limit)),
+            ('place_ratings', lambda: self.create_place_ratings_distribution(city_name, country_code, limit)),
+            ('place_categories', lambda: self.create_place_categories_chart(city_name, country_code, limit)),
+            ('price_range', lambda: self.create_price_range_analysis(city_name, country_code, limit)),
+            ('business_hours', lambda: self.create_business_hours_analysis(city_name, country_code, limit)),
+            ('keyword_word_cloud', lambda: self.create_keyword_word_cloud(city_name)),
+            ('business_density', lambda: self.create_business_density_analysis(city_name, country_code, limit)),
+            ('brand_trend_analysis', lambda: self.create_brand_trend_analysis(city_name, country_code, limit)),
+            ('competition_analysis', lambda: self.create_competition_analysis(city_name, country_code, limit)),
+            ('seasonal_analysis', lambda: self.create_seasonal_analysis(city_name, country_code, limit)),
+            ('geographic_distribution', lambda: self.create_geographic_distribution(city_name, country_code, limit)),
+        ]
+
+    def iter_visualizations(self, city_name, country_code, limit=50, output='figure'):
+        """
+        Build the charts one at a time, yielding (key, payload, error) as each
+        finishes. `payload` is the chart JSON, or with output='data' (fast
+        backend only) the data-only spec from chart_data; it is None if there
+        was nothing to plot or the builder failed. `error` is the failure
+        message, if any.
+        """
+        for key, build in self.chart_builders(city_name, country_code, limit):
+            try:
+                result = build()
+            except Exception as e:
+                print(f"[Visualizer] Error creating {key}: {e}")
+                yield key, None, str(e)
+                continue
+            if not result:
+                yield key, None, None
+            elif output == 'data':
+                yield key, chart_data.figure_data(result) if hasattr(result, 'layout') else {'rows': result}, None
+            elif hasattr(result, 'to_json'):
+                yield key, result.to_json(), None
+            else:
+                yield key, json.dumps(result), None
+
     def generate_all_visualizations(self, city_name, country_code, limit=50):
         """Generate all visualizations for a city and return as JSON-serializable data"""
-        visualizations = {}
-        
-        # Brand popularity chart
-        brand_pop_chart = self.create_brand_popularity_chart(city_name, country_code, limit)
-        if brand_pop_chart:
-            visualizations['brand_popularity'] = brand_pop_chart.to_json()
-        
-        # Brand categories pie chart
-        brand_cat_chart = self.create_brand_categories_pie(city_name, country_code, limit)
-        if brand_cat_chart:
-            visualizations['brand_categories'] = brand_cat_chart.to_json()
-        
-        # Place ratings distribution
-        place_ratings_chart = self.create_place_ratings_distribution(city_name, country_code, limit)
-        if place_ratings_chart:
-            visualizations['place_ratings'] = place_ratings_chart.to_json()
-        
-        # Place categories chart
-        place_cat_chart = self.create_place_categories_chart(city_name, country_code, limit)
-        if place_cat_chart:
-            visualizations['place_categories'] = place_cat_chart.to_json()
-        
-        # Business density analysis
-        business_density_chart = self.create_business_density_analysis(city_name, country_code, limit)
-        if business_density_chart:
-            visualizations['business_density'] = business_density_chart.to_json()
-        
-        # Business hours analysis
-        business_hours_chart = self.create_business_hours_analysis(city_name, country_code, limit)
-        if business_hours_chart:
-            visualizations['business_hours'] = business_hours_chart.to_json()
-        
-        # Price range analysis
-        price_range_chart = self.create_price_range_analysis(city_name, country_code, limit)
-        if price_range_chart:
-            visualizations['price_range'] = price_range_chart.to_json()
-        
-        # Keyword Word Cloud
-        word_cloud = self.create_keyword_word_cloud(city_name)
-        if word_cloud:
-            visualizations['keyword_word_cloud'] = word_cloud.to_json()
-            
-        # NEW: Brand trend analysis
-        try:
-            brand_trend_chart = self.create_brand_trend_analysis(city_name, country_code, limit)
-            if brand_trend_chart:
-                visualizations['brand_trend_analysis'] = brand_trend_chart.to_json()
-        except Exception as e:
-            print(f"[Visualizer] Error creating brand trend analysis: {e}")
-        
-        # NEW: Geographic distribution
-        try:
-            geo_dist_chart = self.create_geographic_distribution(city_name, country_code, limit)
-            if geo_dist_chart:
-                visualizations['geographic_distribution'] = geo_dist_chart.to_json()
-        except Exception as e:
-            print(f"[Visualizer] Error creating geographic distribution: {e}")
-        
-        # NEW: Competition analysis
-        try:
-            competition_chart = self.create_competition_analysis(city_name, country_code, limit)
-            if competition_chart:
-                visualizations['competition_analysis'] = competition_chart.to_json()
-        except Exception as e:
-            print(f"[Visualizer] Error creating competition analysis: {e}")
-        
-        # NEW: Seasonal analysis
-        try:
-            seasonal_chart = self.create_seasonal_analysis(city_name, country_code, limit)
-            if seasonal_chart:
-                visualizations['seasonal_analysis'] = seasonal_chart.to_json()
-        except Exception as e:
-            print(f"[Visualizer] Error creating seasonal analysis: {e}")
-            
-        # Top Rated Places (Data, not a chart)
-        top_places = self.get_top_rated_places()
-        if top_places:
-            visualizations['top_rated_places'] = json.dumps(top_places)
+        return {
+            key: payload
+            for key, payload, _ in self.iter_visualizations(city_name, country_code, limit)
+            if payload is not None
+        }
+
+def _log_city_data(raw_brands, raw_places, log_prefix):
+    # Debug: Check brands data content
+    if raw_brands and 'results' in raw_brands and 'entities' in raw_brands['results']:
+        brand_names = [brand.get('name', 'Unknown') for brand in raw_brands['results']['entities'][:3]]
+        print(f"{log_prefix} 📊 Brands data received: {len(raw_brands['results']['entities'])} brands")
+        print(f"{log_prefix} 📊 First 3 brands: {brand_names}")
+    else:
+        print(f"{log_prefix} ⚠️ No valid brands data received")
+
+    # Debug: Check places data content
+    if raw_places and 'results' in raw_places and 'entities' in raw_places['results']:
+        place_names = [place.get('name', 'Unknown') for place in raw_places['results']['entities'][:3]]
+        print(f"{log_prefix} 🏢 Places data received: {len(raw_places['results']['entities'])} places")
+        print(f"{log_prefix} 🏢 First 3 places: {place_names}")
+    else:
+        print(f"{log_prefix} ⚠️ No valid places data received")
+
+    if is_degraded(raw_brands) or is_degraded(raw_places):
+        print(f"{log_prefix} ⚠️ Qloo data is stale or incomplete; results built from it are not cached")
+
+def fetch_city_data(city_name, country_code, limit=20, log_prefix="[Visualizer]"):
+    """
+    Fetch brands and places for a city once, with both queries in flight together.
+    Returns (raw_brands, raw_places); either may be None if its fetch failed.
+    Raises one of QLOO_UNAVAILABLE_ERRORS when Qloo is unavailable and nothing is cached.
+    Responses served from the stale cache carry `stale: True`, responses
+    missing a page `partial: True`; neither may be cached as fresh results.
+    """
+    print(f"{log_prefix} 📡 Fetching brands and places data for {city_name}, {country_code}...")
+    brand_stream = iter_brands(city_name, country_code, limit)
+    place_stream = iter_places(city_name, country_code, limit)
+    try:
+        raw_brands = assemble_response(brand_stream)
+    except Exception:
+        place_stream.cancel()  # Qloo is unavailable; don't wait for the other query
+        raise
+    raw_places = assemble_response(place_stream)
+    _log_city_data(raw_brands, raw_places, log_prefix)
+    return raw_brands, raw_places
+
+def get_city_snapshot(city_name, country_code, limit=20, log_prefix="[Visualizer]"):
+    """Shared CitySnapshot of a city, fetching its Qloo data once when it is not loaded"""
+    return city_snapshots.get_or_build(city_name, country_code, limit,
+                                       lambda: fetch_city_data(city_name, country_code, limit, log_prefix))
+
+def stream_city_visualizations(city_name, country_code, limit=20, log_prefix="[Visualizer]", city_data=None,
+                               output='figure'):
+    """
+    Build the visualizations for a city one chart at a time, from `city_data`
+    (a CitySnapshot, or a (raw_brands, raw_places) pair from fetch_city_data),
+    else the city's shared snapshot, else freshly fetched Qloo data. Yields `chart` events
+    ({'type': 'chart', 'key', 'data'}) as each chart is built, cheapest first,
+    then one `complete` event listing the delivered and failed charts.
+    With output='data', chart payloads are data-only specs (see chart_data).
+    Results are cached per (city, country, limit, output); charts built from
+    stale upstream data are flagged with `stale`, charts built from data that
+    lost pages with `partial`, and neither is cached.
+    """
+    cache_key = visualization_key(city_name, country_code, limit, output)
+    cached = visualization_cache.get(cache_key)
+    if cached is not None:
+        print(f"{log_prefix} ♻️ Serving cached visualizations for {city_name}, {country_code}")
+        charts = [key for key in cached if key != 'stale']
+        for key in charts:
+            yield {'type': 'chart', 'key': key, 'data': cached[key]}
+        yield {'type': 'complete', 'charts': charts, 'failed': [], 'stale': bool(cached.get('stale')), 'partial': False}
+        return
+
+    # Create a FRESH instance for each build; the parsed city data it reads is
+    # a shared read-only snapshot (data-only specs come from the plain dict figures)
+    visualizer = QlooVisualizer(figure_backend='fast' if output == 'data' else None)
+    print(f"{log_prefix} ✅ Created fresh QlooVisualizer instance")
 
-        return visualizations
+    if city_data is None:
+        city_data = city_snapshots.get(city_name, country_code, limit)
+        if city_data is not None:
+            print(f"{log_prefix} ♻️ Using shared snapshot for {city_name}, {country_code}")
+
+    if isinstance(city_data, CitySnapshot):
+        snapshot = city_data
+    elif city_data is not None:
+        snapshot = city_snapshots.publish(city_name, country_code, limit, *city_data)
+    else:
+        # Fetch Qloo API data ONCE - brand and place pages are requested concurrently
+        print(f"{log_prefix} 📡 Fetching brands and places data for {city_name}, {country_code}...")
+        brand_stream = iter_brands(city_name, country_code, limit)
+        place_stream = iter_places(city_name, country_code, limit)
+
+        # Collect the entities while the pages arrive
+        print(f"{log_prefix} 🔄 Setting data in visualizer...")
+        raw_brands, raw_places = visualizer.set_entity_streams(brand_stream, place_stream)
+        _log_city_data(raw_brands, raw_places, log_prefix)
+        place_classes = visualizer.place_classes() if raw_places else None
+        snapshot = city_snapshots.publish(city_name, country_code, limit, raw_brands, raw_places, place_classes)
+
+    visualizer.set_snapshot(snapshot)
+    raw_brands, raw_places = snapshot.city_data
+
+    # Flag data served from the stale cache while Qloo is unavailable, or missing pages
+    stale = snapshot.stale
+    partial = snapshot.partial
+
+    # Now generate the visualizations using the pre-fetched data
+    print(f"{log_prefix} 🎨 Generating visualizations...")
+    viz_data = {}
+    failed = []
+    for key, payload, error in visualizer.iter_visualizations(city_name, country_code, limit, output):
+        if error is not None:
+            failed.append({'key': key, 'error': error})
+        elif payload is not None:
+            viz_data[key] = payload
+            yield {'type': 'chart', 'key': key, 'data': payload}
+    print(f"{log_prefix} ✅ Generated visualizations for {city_name}, {country_code}")
+
+    if stale:
+        print(f"{log_prefix} 🕰️ Visualizations built from stale cached data")
+    elif partial:
+        print(f"{log_prefix} ⚠️ Visualizations built from incomplete data, not caching")
+    elif raw_brands and raw_places:
+        visualization_cache.set(cache_key, viz_data)
+        # The map viewport endpoint can reuse the spatial index built for the chart
+        geo_index_cache.set(make_key(city_name, country_code, limit), visualizer.geo_index())
+
+    yield {'type': 'complete', 'charts': list(viz_data), 'failed': failed, 'stale': stale, 'partial': partial}
+
+def get_city_geo_index(city_name, country_code, limit=20, log_prefix="[Visualizer]"):
+    """
+    Spatial index of a city's places, cached per (city, country, limit) for
+    as long as the Qloo data it was built from. Returns (index, stale), where
+    `stale` means the index was built from stale or incomplete data.
+    """
+    snapshot = city_snapshots.get(city_name, country_code, limit)
+    if snapshot is not None:
+        return snapshot.geo_index, False
+
+    cache_key = make_key(city_name, country_code, limit)
+    index = geo_index_cache.get(cache_key)
+    if index is not None:
+        return index, False
+
+    print(f"{log_prefix} 🗺️ Building spatial index for {city_name}, {country_code}...")
+    raw_places = assemble_response(iter_places(city_name, country_code, limit))
+    index = build_index(raw_places)
+    stale = is_degraded(raw_places)
+    if raw_places and not stale:
+        geo_index_cache.set(cache_key, index)
+    print(f"{log_prefix} 🗺️ Indexed {len(index)} located places ({index.unlocated} without coordinates)")
+    return index, stale
+
+def generate_city_visualizations(city_name, country_code, limit=20, log_prefix="[Visualizer]", city_data=None,
+                                 output='figure'):
+    """
+    Build all visualizations for a city and return them as one dict
+    (see stream_city_visualizations).
+    """
+    viz_data = {}
+    for event in stream_city_visualizations(city_name, country_code, limit, log_prefix, city_data, output):
+        if event['type'] == 'chart':
+            viz_data[event['key']] = event['data']
+        else:
+            if event['stale']:
+                viz_data['stale'] = True
+            if event.get('partial'):
+                viz_data['partial'] = True
+    return viz_data
 
 # Example usage and testing
 if __name__ == "__main__":